@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# annealer.py
+import time
+import numpy as np
+
+
+def _split_qubo(Q):
+    """
+    Split a Q matrix into its diagonal and the off-diagonal part in CSR arrays.
+
+    :param Q: Dense numpy array, scipy.sparse matrix or GraphColoringQUBOOperator.
+    :return: Tuple (diagonal, indptr, indices, data).
+    """
+    if hasattr(Q, 'to_sparse'):
+        Q = Q.to_sparse()
+    if hasattr(Q, 'tocsr'):
+        Q = Q.tocsr().copy()
+        Q.sum_duplicates()
+        diagonal = Q.diagonal().astype(np.float64)
+        Q.setdiag(0)
+        Q.eliminate_zeros()
+        return diagonal, Q.indptr.astype(np.int64), Q.indices.astype(np.int64), Q.data.astype(np.float64)
+
+    Q = np.asarray(Q, dtype=np.float64)
+    diagonal = np.diag(Q).copy()
+    off_diagonal = Q.copy()
+    np.fill_diagonal(off_diagonal, 0.0)
+    rows, cols = np.nonzero(off_diagonal)
+    indptr = np.zeros(Q.shape[0] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=Q.shape[0]), out=indptr[1:])
+    return diagonal, indptr, cols.astype(np.int64), off_diagonal[rows, cols]
+
+
+class AnnealingQUBOSolver:
+    def __init__(self, Q):
+        """
+        Pure numpy QUBO solver running many replicas as one batched array. Local fields are
+        kept up to date incrementally, so a flip costs O(degree) instead of O(N).
+        After solve, cost, solution and time_to_solution mirror qtealeaves' QUBOSolver; trajectory
+        lists (step, best energy) pairs for every improvement of the best energy over all replicas.
+
+        :param Q: Symmetric Q matrix (dense, scipy.sparse or GraphColoringQUBOOperator).
+        """
+        self.diagonal, self.indptr, self.indices, self.data = _split_qubo(Q)
+        self.num_variables = self.diagonal.size
+        self.cost = []
+        self.solution = []
+        self.time_to_solution = None
+        self.trajectory = []
+
+    def _initial_state(self, rng, num_replicas, initial_states):
+        if initial_states is None:
+            return rng.integers(0, 2, size=(num_replicas, self.num_variables)).astype(np.int8)
+        X = np.atleast_2d(np.asarray(initial_states, dtype=np.int8))
+        return np.resize(X, (num_replicas, self.num_variables)).astype(np.int8)
+
+    def local_fields(self, X):
+        """
+        Energy change of setting each variable from 0 to 1: h_p = Q_pp + 2 * sum_{j != p} Q_pj x_j.
+
+        :param X: Binary states of shape (replicas, N).
+        :return: Local fields of shape (replicas, N).
+        """
+        rows = np.repeat(np.arange(self.num_variables), np.diff(self.indptr))
+        H = np.zeros(X.shape, dtype=np.float64)
+        np.add.at(H.T, rows, (X[:, self.indices] * self.data).T)
+        return self.diagonal + 2.0 * H
+
+    def energies(self, X):
+        """
+        :param X: Binary states of shape (replicas, N).
+        :return: x^T Q x for every replica.
+        """
+        H = self.local_fields(X)
+        # x^T Q x = sum_p x_p (Q_pp + sum_{j != p} Q_pj x_j) = sum_p x_p (h_p + Q_pp) / 2
+        return 0.5 * np.sum(X * (H + self.diagonal), axis=1)
+
+    def _flip(self, X, H, replicas, variables):
+        """
+        Flip one variable per listed replica and update the affected local fields.
+        """
+        change = (1 - 2 * X[replicas, variables]).astype(np.float64)
+        X[replicas, variables] ^= 1
+
+        starts = self.indptr[variables]
+        lengths = self.indptr[variables + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return
+        ends = np.cumsum(lengths)
+        positions = np.arange(total) - np.repeat(ends - lengths, lengths) + np.repeat(starts, lengths)
+        # Each replica flips at most one variable per call, so (replica, column) pairs are unique
+        H[np.repeat(replicas, lengths), self.indices[positions]] += (
+            2.0 * self.data[positions] * np.repeat(change, lengths))
+
+    def _temperature_range(self):
+        row_weight = np.zeros(self.num_variables)
+        np.add.at(row_weight, np.repeat(np.arange(self.num_variables), np.diff(self.indptr)), np.abs(self.data))
+        scale = np.abs(self.diagonal) + 2.0 * row_weight
+        nonzero = np.concatenate([np.abs(self.data), np.abs(self.diagonal)])
+        nonzero = nonzero[nonzero > 0]
+        t_start = 0.5 * float(scale.max()) if scale.size and scale.max() > 0 else 1.0
+        t_end = 0.05 * float(nonzero.min()) if nonzero.size else 1e-3
+        return t_start, min(t_end, t_start)
+
+    def solve_annealing(self, num_replicas=32, num_sweeps=200, t_start=None, t_end=None, seed=None,
+                        initial_states=None):
+        """
+        Simulated annealing with a geometric temperature schedule. Every sweep visits all variables
+        in a random order shared by the replicas; each replica accepts independently (Metropolis).
+
+        :return: Tuple (best states, best energies).
+        """
+        rng = np.random.default_rng(seed)
+        auto_start, auto_end = self._temperature_range()
+        t_start = auto_start if t_start is None else t_start
+        t_end = auto_end if t_end is None else t_end
+        temperatures = np.geomspace(t_start, t_end, num_sweeps) if num_sweeps > 0 else []
+
+        X = self._initial_state(rng, num_replicas, initial_states)
+        H = self.local_fields(X)
+        energy = self.energies(X)
+        best_X, best_energy = X.copy(), energy.copy()
+        all_replicas = np.arange(num_replicas)
+        self.trajectory = [(0, float(best_energy.min()))]
+
+        for sweep, temperature in enumerate(temperatures, start=1):
+            for p in rng.permutation(self.num_variables):
+                delta = (1 - 2 * X[:, p]) * H[:, p]
+                accept = (delta <= 0) | (rng.random(num_replicas) < np.exp(-np.maximum(delta, 0) / temperature))
+                if not accept.any():
+                    continue
+                replicas = all_replicas[accept]
+                energy[replicas] += delta[replicas]
+                self._flip(X, H, replicas, np.full(replicas.size, p))
+            improved = energy < best_energy
+            best_X[improved] = X[improved]
+            best_energy[improved] = energy[improved]
+            self._record_progress(sweep, best_energy)
+
+        return best_X, best_energy
+
+    def _record_progress(self, step, best_energy):
+        best = float(best_energy.min())
+        if best < self.trajectory[-1][1]:
+            self.trajectory.append((step, best))
+
+    def solve_tabu(self, num_replicas=32, num_iterations=None, tenure=None, seed=None, initial_states=None):
+        """
+        Tabu search: every iteration each replica makes the best non-tabu single flip; tabu moves
+        are allowed when they reach a new best energy (aspiration).
+
+        :return: Tuple (best states, best energies).
+        """
+        rng = np.random.default_rng(seed)
+        num_iterations = 20 * self.num_variables if num_iterations is None else num_iterations
+        tenure = max(1, min(20, self.num_variables // 4)) if tenure is None else tenure
+
+        X = self._initial_state(rng, num_replicas, initial_states)
+        H = self.local_fields(X)
+        energy = self.energies(X)
+        best_X, best_energy = X.copy(), energy.copy()
+        tabu_until = np.zeros(X.shape, dtype=np.int64)
+        replicas = np.arange(num_replicas)
+        self.trajectory = [(0, float(best_energy.min()))]
+
+        for iteration in range(num_iterations):
+            delta = (1 - 2 * X) * H
+            aspiration = (energy[:, None] + delta) < best_energy[:, None] - 1e-12
+            allowed = (tabu_until <= iteration) | aspiration
+            # Random tie-breaking between equally good moves
+            scores = np.where(allowed, delta, np.inf) + 1e-9 * rng.random(delta.shape)
+            variables = np.argmin(scores, axis=1)
+            movable = np.isfinite(scores[replicas, variables])
+            if not movable.any():
+                break
+            rows, cols = replicas[movable], variables[movable]
+            energy[rows] += delta[rows, cols]
+            self._flip(X, H, rows, cols)
+            tabu_until[rows, cols] = iteration + 1 + tenure
+
+            improved = energy < best_energy
+            best_X[improved] = X[improved]
+            best_energy[improved] = energy[improved]
+            self._record_progress(iteration + 1, best_energy)
+
+        return best_X, best_energy
+
+    def solve(self, mode='annealing', **kwargs):
+        """
+        Run the solver and store the results in cost, solution and time_to_solution.
+
+        :param mode: 'annealing' or 'tabu'.
+        :param kwargs: Options for solve_annealing or solve_tabu.
+        """
+        start = time.perf_counter()
+        if mode == 'annealing':
+            best_X, best_energy = self.solve_annealing(**kwargs)
+        elif mode == 'tabu':
+            best_X, best_energy = self.solve_tabu(**kwargs)
+        else:
+            raise ValueError(f"Unknown mode '{mode}', expected 'annealing' or 'tabu'.")
+        self.time_to_solution = time.perf_counter() - start
+
+        self.cost = [float(value) for value in best_energy]
+        self.solution = [state.astype(np.int64) for state in best_X]
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+# backends.py
+import abc
+import inspect
+import importlib
+import numpy as np
+
+# Sweeps of the tensor network solver
+TN_MAX_ITER = 30
+
+
+class SolverBackend(abc.ABC):
+    '''
+    A QUBO solver behind a common interface. setup builds the solver object, run solves it;
+    afterwards the solver exposes cost, solution and time_to_solution like qtealeaves' QUBOSolver.
+    Backends import their solver modules inside setup, so registering one costs nothing.
+    Subclasses must implement setup and run.
+    '''
+    name = None
+    description = ''
+    # Accepts the 'initial_states' option for warm starts
+    accepts_initial_states = False
+    # Deterministic and independent of the bond dimension, so one solve is enough
+    exact = False
+    # setup takes the ising.IsingModel of the graph instead of a Q matrix
+    accepts_ising = False
+
+    @abc.abstractmethod
+    def setup(self, qubo_matrix, max_bond_dimension, transverse_field_ratio, options):
+        '''
+        Build the solver object for a Q matrix (dense or scipy.sparse), or for an ising.IsingModel
+        if the backend accepts_ising.
+        '''
+
+    @abc.abstractmethod
+    def run(self, solver, max_bond_dimension, transverse_field_ratio, options):
+        '''
+        Solve in place; afterwards solver.cost, solver.solution and solver.time_to_solution are set.
+        '''
+
+    def settings(self, max_bond_dimension, transverse_field_ratio, options):
+        '''
+        Solver settings recorded in the trace.
+        '''
+        return {}
+
+    def warm_up(self):
+        '''
+        Import the solver modules ahead of the first solve (used by long-lived workers).
+        '''
+
+
+class TensorNetworkBackend(SolverBackend):
+    name = 'tn'
+    description = 'qtealeaves tensor network QUBOSolver'
+
+    def setup(self, qubo_matrix, max_bond_dimension, transverse_field_ratio, options):
+        from qtealeaves.optimization import QUBOSolver
+        from qubo_solver import to_dense_qubo
+
+        # Initialize solver (the tensor network solver expects a dense matrix)
+        return QUBOSolver(to_dense_qubo(qubo_matrix))
+
+    def run(self, solver, max_bond_dimension, transverse_field_ratio, options):
+        from qtealeaves.optimization import QUBOConvergenceParameter
+        from qtealeaves.tensors import TensorBackend
+
+        # Define convergence parameters
+        conv_params = QUBOConvergenceParameter(
+            max_bond_dimension=max_bond_dimension,
+            max_iter=TN_MAX_ITER,
+            enable_spacelink_expansion=True,
+            transverse_field_ratio=transverse_field_ratio,
+            data_type="D",
+            optimization_level=3,
+            device="cpu",
+        )
+
+        # Define tensor backend
+        tn_backend = TensorBackend(device="cpu", dtype=np.float64)
+        solver.solve(tn_convergence_parameters=conv_params, tensor_backend=tn_backend)
+
+    def settings(self, max_bond_dimension, transverse_field_ratio, options):
+        return {'max_bond_dimension': max_bond_dimension, 'transverse_field_ratio': transverse_field_ratio,
+                'max_iter': TN_MAX_ITER}
+
+    def warm_up(self):
+        import qtealeaves.optimization  # noqa: F401
+        import qtealeaves.tensors  # noqa: F401
+
+
+class AnnealingBackend(SolverBackend):
+    accepts_initial_states = True
+
+    def __init__(self, mode):
+        self.name = mode
+        self.description = f'numpy {mode} (annealer.AnnealingQUBOSolver)'
+
+    def setup(self, qubo_matrix, max_bond_dimension, transverse_field_ratio, options):
+        from annealer import AnnealingQUBOSolver
+        return AnnealingQUBOSolver(qubo_matrix)
+
+    def run(self, solver, max_bond_dimension, transverse_field_ratio, options):
+        solver.solve(mode=self.name, **options)
+
+    def settings(self, max_bond_dimension, transverse_field_ratio, options):
+        return {'backend_options': {key: value for key, value in options.items() if key != 'initial_states'}}
+
+    def warm_up(self):
+        import annealer  # noqa: F401
+
+
+class ExactBackend(SolverBackend):
+    name = 'exact'
+    description = 'Gray-code enumeration of all states (exact_solver.ExactQUBOEnumerator)'
+    exact = True
+    accepts_ising = True
+
+    def setup(self, qubo_matrix, max_bond_dimension, transverse_field_ratio, options):
+        from exact_solver import ExactQUBOEnumerator
+        return ExactQUBOEnumerator(qubo_matrix)
+
+    def run(self, solver, max_bond_dimension, transverse_field_ratio, options):
+        solver.solve(**options)
+
+    def settings(self, max_bond_dimension, transverse_field_ratio, options):
+        return {'backend_options': dict(options)}
+
+    def warm_up(self):
+        import exact_solver  # noqa: F401
+
+
+# name -> SolverBackend instance, factory, or 'module:attribute' string imported on first use
+_registry = {}
+
+
+def register_backend(name, backend):
+    '''
+    Register a solver backend under a name.
+
+    :param name: Name used as the backend argument of QUBOSimulation.run_simulation.
+    :param backend: SolverBackend instance, a callable returning one, or a 'module:attribute'
+                    string naming such a callable; strings are imported on first use.
+    '''
+    if inspect.isclass(backend) and issubclass(backend, SolverBackend) and inspect.isabstract(backend):
+        missing = ', '.join(sorted(backend.__abstractmethods__))
+        raise TypeError(f"Backend '{name}' ({backend.__name__}) does not implement {missing}.")
+    _registry[name] = backend
+
+
+def get_backend(name):
+    '''
+    Look up a backend, importing and instantiating it on first use.
+
+    :param name: Registered backend name.
+    :return: SolverBackend instance.
+    '''
+    if name not in _registry:
+        raise ValueError(f"Unknown backend '{name}', expected one of {', '.join(repr(key) for key in _registry)}.")
+    backend = _registry[name]
+    if isinstance(backend, str):
+        module_name, attribute = backend.split(':')
+        backend = getattr(importlib.import_module(module_name), attribute)
+    if not isinstance(backend, SolverBackend):
+        backend = backend()
+    _registry[name] = backend
+    return backend
+
+
+def available_backends():
+    '''
+    Registered backend names (without importing anything).
+    '''
+    return list(_registry)
+
+
+register_backend('tn', TensorNetworkBackend)
+register_backend('annealing', lambda: AnnealingBackend('annealing'))
+register_backend('tabu', lambda: AnnealingBackend('tabu'))
+register_backend('exact', ExactBackend)
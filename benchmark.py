@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+# benchmark.py
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import qubo_solver
+from qubo_solver import QUBOMatrix, BatchQUBOValidator
+from graph_generator import ErdosRenyiGraphGenerator
+from graph_store import PackedGraphStore, PackedGraphWriter, default_store_dir
+from tracing import peak_rss_bytes
+
+
+def measure(function, repeats=3, warmup=True):
+    """
+    Time a function, then record its peak traced memory in a separate call. tracemalloc slows
+    allocation-heavy code considerably, so it is never active while the timed calls run.
+
+    :param function: Callable without arguments; it is called repeats + 1 times.
+    :param repeats: Number of timed calls.
+    :param warmup: Make one untimed call first so lazy imports and caches do not skew the timings.
+    :return: Dictionary with median/min seconds and peak traced bytes.
+    """
+    if warmup:
+        function()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'seconds': float(np.median(timings)),
+        'min_seconds': float(min(timings)),
+        'peak_traced_bytes': int(peak),
+    }
+
+
+def instance_grid(graph_dir, n_values, c_fractions=(0.5,)):
+    """
+    Pick one stored instance per n and c, with c about c_fraction * n, as (n, c, edges) tuples.
+    """
+    loader = ErdosRenyiGraphGenerator(main_dir=graph_dir)
+    grid = []
+    for n in n_values:
+        for c in sorted({max(2, min(n, int(round(fraction * n)))) for fraction in c_fractions}):
+            path = os.path.join(graph_dir, f'n_{n}', f'c_{c}', f'n_{n}_c_{c}_0.pkl')
+            if os.path.exists(path):
+                grid.append((n, c, loader.load_graph(path)['edges']))
+    return grid
+
+
+def bench_qubo_construction(grid, repeats):
+    results = {}
+    for n, c, edges in grid:
+        for sparse in (False, True):
+            def build():
+                # Clear the component cache so every call measures a cold build
+                qubo_solver._component_cache.clear()
+                QUBOMatrix(n, c, edges, 0.5 * n, n, 0.5 * n, sparse=sparse)
+            results[f'qubo_construction/{"sparse" if sparse else "dense"}/n_{n}_c_{c}'] = measure(build, repeats)
+    return results
+
+
+def bench_validator(grid, repeats, num_samples=2000):
+    results = {}
+    rng = np.random.default_rng(0)
+    for n, c, edges in grid:
+        Q = QUBOMatrix(n, c, edges, 0.5 * n, n, 0.5 * n, sparse=True).Q
+        samples = rng.integers(0, 2, size=(num_samples, n * c + c))
+        validator = BatchQUBOValidator(n, c, edges, Q=Q)
+        result = measure(lambda: validator.validate(samples), repeats)
+        result['samples_per_second'] = num_samples / result['seconds']
+        results[f'validator/n_{n}_c_{c}'] = result
+    return results
+
+
+def bench_graph_load(graph_dir, n_values, repeats):
+    loader = ErdosRenyiGraphGenerator(main_dir=graph_dir)
+    paths = []
+    for n in n_values:
+        c_dir = os.path.join(graph_dir, f'n_{n}', f'c_{max(2, n // 2)}')
+        if os.path.isdir(c_dir):
+            paths.extend((n, max(2, n // 2), os.path.join(c_dir, name)) for name in sorted(os.listdir(c_dir)))
+    if not paths:
+        return {}
+
+    def load_pickles():
+        for _, _, path in paths:
+            loader.load_graph(path)
+
+    results = {'graph_load/pickle': measure(load_pickles, repeats)}
+    results['graph_load/pickle']['instances_per_second'] = len(paths) / results['graph_load/pickle']['seconds']
+
+    store_dir = default_store_dir(graph_dir)
+    temp_dir = None
+    if not PackedGraphStore.exists(store_dir):
+        temp_dir = tempfile.mkdtemp()
+        store_dir = temp_dir
+        with PackedGraphWriter(store_dir) as writer:
+            for n, c, path in paths:
+                instance = int(os.path.splitext(path)[0].rsplit('_', 1)[1])
+                writer.add(n, c, instance, loader.load_graph(path)['edges'])
+    keys = [(n, c, int(os.path.splitext(path)[0].rsplit('_', 1)[1])) for n, c, path in paths]
+
+    def load_packed():
+        store = PackedGraphStore(store_dir)
+        for key in keys:
+            np.asarray(store.get_edges(*key)).sum()
+
+    results['graph_load/packed'] = measure(load_packed, repeats)
+    results['graph_load/packed']['instances_per_second'] = len(keys) / results['graph_load/packed']['seconds']
+    if temp_dir is not None:
+        shutil.rmtree(temp_dir)
+    return results
+
+
+def bench_graph_generation(n_range, repeats):
+    results = {}
+    for store_format in ('packed', 'pickle'):
+        def generate():
+            temp_dir = tempfile.mkdtemp()
+            try:
+                ErdosRenyiGraphGenerator(main_dir=temp_dir, n_range=n_range, instances=20, seed=0,
+                                         store_format=store_format).generate_and_store_graphs()
+            finally:
+                shutil.rmtree(temp_dir)
+        results[f'graph_generation/{store_format}/n_{n_range[0]}_{n_range[1]}'] = measure(generate, repeats, warmup=False)
+    return results
+
+
+def bench_end_to_end(graph_dir, grid, bond_dimensions, backends):
+    from tn_simulation import QUBOSimulation
+    simulation = QUBOSimulation(graph_dir=graph_dir)
+    results = {}
+    for backend in backends:
+        if backend == 'tn':
+            try:
+                import qtealeaves  # noqa: F401
+            except ImportError:
+                print('Skipping tn end-to-end benchmarks: qtealeaves is not installed.')
+                continue
+        for n, c, edges in grid:
+            for bond_dimension in (bond_dimensions if backend == 'tn' else [None]):
+                name = f'end_to_end/{backend}/n_{n}_c_{c}' + (f'/bond_{bond_dimension}' if bond_dimension else '')
+                options = {'seed': 0} if backend in ('annealing', 'tabu') else None
+                results[name] = measure(lambda: simulation.run_simulation(
+                    n, c, edges, bond_dimension, 1e9, backend=backend, backend_options=options),
+                    repeats=1, warmup=False)
+    return results
+
+
+def bench_preprocessing(graph_dir, grid, max_variables):
+    """
+    Solve small instances exactly with and without preprocessing. The reduction must not change
+    the optimum, so every entry also records whether both objectives agree.
+    """
+    from tn_simulation import QUBOSimulation
+    results = {}
+    for n, c, edges in grid:
+        if n * c + c > max_variables:
+            continue
+        costs = {}
+        for preprocess in (False, True):
+            simulation = QUBOSimulation(graph_dir=graph_dir, preprocess=preprocess)
+            name = f'preprocessing/{"reduced" if preprocess else "full"}/n_{n}_c_{c}'
+            result = measure(lambda: costs.__setitem__(preprocess, simulation.run_simulation(
+                n, c, edges, None, 1e9, backend='exact')[:2]), repeats=1, warmup=False)
+            # run_simulation reports a zero cost as None
+            costs[preprocess] = (costs[preprocess][0] or 0.0, costs[preprocess][1])
+            result['cost'], result['chromatic_number'] = float(costs[preprocess][0]), int(costs[preprocess][1])
+            results[name] = result
+        results[name]['objective_match'] = bool(np.isclose(costs[False][0], costs[True][0]))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare timings with a baseline.
+
+    :param results: Current benchmark results.
+    :param baseline: Baseline benchmark results.
+    :param tolerance: Allowed relative slowdown (0.25 means 25 percent).
+    :return: List of (name, baseline seconds, current seconds, ratio) for regressed benchmarks.
+    """
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if reference is None or reference['seconds'] <= 0:
+            continue
+        ratio = current['seconds'] / reference['seconds']
+        if ratio > 1.0 + tolerance:
+            regressions.append((name, reference['seconds'], current['seconds'], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the graph coloring pipeline.')
+    parser.add_argument('--graph-dir', default='graph_instances')
+    parser.add_argument('--n-values', type=int, nargs='+', default=[4, 8, 16, 24, 32, 40, 50])
+    parser.add_argument('--c-fractions', type=float, nargs='+', default=[0.25, 0.5, 1.0])
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--stages', nargs='+',
+                        default=['construction', 'validator', 'load', 'generation', 'end_to_end', 'preprocessing'])
+    parser.add_argument('--bond-dimensions', type=int, nargs='+', default=[2, 4])
+    parser.add_argument('--backends', nargs='+', default=['tn', 'tabu'])
+    parser.add_argument('--end-to-end-max-n', type=int, default=16)
+    parser.add_argument('--preprocessing-max-variables', type=int, default=24,
+                        help='Largest full QUBO solved exactly in the preprocessing check.')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=None, help='Baseline JSON to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--save-baseline', action='store_true', help='Also write the results to --baseline.')
+    args = parser.parse_args()
+
+    grid = instance_grid(args.graph_dir, args.n_values, args.c_fractions)
+    results = {}
+    if 'construction' in args.stages:
+        results.update(bench_qubo_construction(grid, args.repeats))
+    if 'validator' in args.stages:
+        results.update(bench_validator(grid, args.repeats))
+    if 'load' in args.stages:
+        results.update(bench_graph_load(args.graph_dir, args.n_values, args.repeats))
+    if 'generation' in args.stages:
+        results.update(bench_graph_generation((min(args.n_values), max(args.n_values)), args.repeats))
+    if 'end_to_end' in args.stages:
+        small = [entry for entry in grid if entry[0] <= args.end_to_end_max_n]
+        results.update(bench_end_to_end(args.graph_dir, small, args.bond_dimensions, args.backends))
+    if 'preprocessing' in args.stages:
+        results.update(bench_preprocessing(args.graph_dir, grid, args.preprocessing_max_variables))
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            # High-water mark of the whole benchmark process, not of any single benchmark
+            'process_peak_rss_bytes': peak_rss_bytes(),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=4)
+    print(f'Benchmark results saved to {args.output}')
+
+    for name, result in sorted(results.items()):
+        print(f"{name:60s} {result['seconds'] * 1e3:10.2f} ms  peak {result['peak_traced_bytes'] / 2**20:8.2f} MiB")
+
+    mismatches = [name for name, result in sorted(results.items()) if result.get('objective_match') is False]
+    for name in mismatches:
+        print(f'OBJECTIVE MISMATCH {name}: preprocessing changed the optimum')
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(report, file, indent=4)
+        print(f'Baseline saved to {args.baseline}')
+    elif args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for name, before, after, ratio in regressions:
+            print(f'REGRESSION {name}: {before * 1e3:.2f} ms -> {after * 1e3:.2f} ms ({ratio:.2f}x)')
+        if regressions:
+            sys.exit(1)
+        print('No regressions against the baseline.')
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
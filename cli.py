@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+# cli.py
+"""
+Single entry point for the graph coloring tools:
+
+    python cli.py generate --n-min 4 --n-max 50 --instances 20
+    python cli.py load 10 5 --instance 0
+    python cli.py solve 10 5 --backend tabu
+    python cli.py kcolor 20 10 --backend tabu
+    python cli.py sweep --n-values 4 6 8 --bond-dimensions 4 8
+    python cli.py index
+    python cli.py serve --workers 4 --threads 2
+    python cli.py submit 10 5 --instances 0 1 2 --backend tabu
+    python cli.py collect 1 2 3
+    python cli.py backends
+
+Every command imports only what it needs, so generating or inspecting graphs never loads a
+solver stack.
+"""
+import os
+import sys
+import math
+import json
+import logging
+import argparse
+
+
+def generate(args):
+    from graph_generator import ErdosRenyiGraphGenerator
+    generator = ErdosRenyiGraphGenerator(main_dir=args.graph_dir, n_range=(args.n_min, args.n_max),
+                                         instances=args.instances, p=args.probability, seed=args.seed,
+                                         workers=args.workers, store_format=args.format)
+    generator.generate_and_store_graphs()
+    print(f'Graph instances stored in {args.graph_dir} (seed entropy {generator.seed})')
+
+
+def load(args):
+    from tn_simulation import QUBOSimulation
+    simulation = QUBOSimulation(graph_dir=args.graph_dir)
+    n, c, edges = simulation.load_graph_instance(args.n, args.c, args.instance)
+    num_edges = len(edges)
+    density = 2.0 * num_edges / (n * (n - 1)) if n > 1 else 0.0
+    print(f'n={n} c={c} instance={args.instance} edges={num_edges} density={density:.3f}')
+    if args.edges:
+        print(json.dumps([list(map(int, edge)) for edge in edges]))
+
+
+def solve(args):
+    from tn_simulation import QUBOSimulation
+    simulation = QUBOSimulation(graph_dir=args.graph_dir, color_budget=args.color_budget,
+                                preprocess=args.preprocess, adaptive_bond_dimension=args.adaptive,
+                                result_cache=None if args.no_cache else args.cache,
+                                fingerprint_index=args.fingerprints)
+    n, c, edges = simulation.load_graph_instance(args.n, args.c, args.instance)
+    lambdas = tuple(args.lambdas) if args.lambdas else None
+    options = {'seed': args.seed} if args.seed is not None and args.backend in ('annealing', 'tabu') else None
+    cost, chromatic_number, time_to_solution = simulation.run_simulation(
+        n, c, edges, args.bond_dimension, args.transverse_field_ratio, sparse=args.sparse, lambdas=lambdas,
+        backend=args.backend, backend_options=options)
+    print(json.dumps({
+        'n': n, 'c': c, 'instance': args.instance, 'backend': args.backend,
+        'cost': None if cost is None else float(cost),
+        'chromatic_number': None if chromatic_number is None else int(chromatic_number),
+        'time_to_solution': time_to_solution,
+        'color_count': simulation.last_color_count,
+        'bond_dimension': simulation.last_bond_dimension if args.adaptive else args.bond_dimension,
+        'cache_hit': simulation.last_cache_hit,
+    }))
+
+
+def kcolor(args):
+    from tn_simulation import QUBOSimulation
+    simulation = QUBOSimulation(graph_dir=args.graph_dir, repair=args.repair)
+    n, c, edges = simulation.load_graph_instance(args.n, args.c, args.instance)
+    options = {'seed': args.seed} if args.seed is not None and args.backend in ('annealing', 'tabu') else None
+    num_colors, coloring, time_to_solution = simulation.run_k_search(
+        n, edges, args.bond_dimension, args.transverse_field_ratio, strategy=args.strategy, sparse=args.sparse,
+        backend=args.backend, backend_options=options)
+    print(json.dumps({
+        'n': n, 'instance': args.instance, 'backend': args.backend, 'num_colors': num_colors,
+        'coloring': [int(color) for color in coloring], 'time_to_solution': time_to_solution,
+        'probes': simulation.last_k_probes,
+    }))
+
+
+def sweep(args):
+    from sweep import ParameterSweep, build_grid
+    if args.c_values:
+        c_values = args.c_values
+    else:
+        # Upper bound on colors, as in run_tn_simulation.py
+        c_values = lambda n: [math.ceil(args.c_fraction * n) + args.c_offset]
+    jobs = build_grid(n_values=args.n_values, c_values=c_values, instances=args.instances,
+                      max_bond_dimensions=args.bond_dimensions, transverse_field_ratios=args.transverse_field_ratios,
+                      backends=[None if backend == 'tn' else backend for backend in args.backends])
+    simulation_kwargs = {'graph_dir': args.graph_dir}
+    if not args.no_cache:
+        simulation_kwargs['result_cache'] = args.cache
+        simulation_kwargs['fingerprint_index'] = args.fingerprints
+    records = ParameterSweep(args.checkpoint, workers=args.workers, blas_threads=args.blas_threads,
+                             simulation_kwargs=simulation_kwargs, results_store=args.results).run(jobs)
+    failed = sum(record['status'] != 'ok' for record in records)
+    print(f'{len(records)} records in {args.checkpoint}, {failed} failed.')
+
+
+def index(args):
+    from fingerprint import build_index
+    fingerprint_index = build_index(args.graph_dir, args.path)
+    instances, distinct, classes = fingerprint_index.summary()
+    print(f'{instances} instances, {distinct} distinct edge sets, {classes} isomorphism classes')
+
+
+def serve(args):
+    from worker_pool import WorkerPool
+    simulation_kwargs = {'graph_dir': args.graph_dir}
+    if not args.no_cache:
+        simulation_kwargs['result_cache'] = args.cache
+    pool = WorkerPool(args.queue, workers=args.workers, threads_per_worker=args.threads,
+                      simulation_kwargs=simulation_kwargs, warm_backends=args.warm, pin_cores=args.pin_cores)
+    pool.serve(until_empty=args.until_empty)
+
+
+def submit(args):
+    from worker_pool import SolverClient
+    client = SolverClient(args.queue, owner=args.owner)
+    options = {'seed': args.seed} if args.seed is not None and args.backend in ('annealing', 'tabu') else None
+    ids = [client.submit(args.n, args.c, instance, args.bond_dimension, args.transverse_field_ratio,
+                         lambdas=args.lambdas, backend=None if args.backend == 'tn' else args.backend,
+                         backend_options=options)
+           for instance in args.instances]
+    print(' '.join(map(str, ids)))
+
+
+def status(args):
+    from worker_pool import SolverClient
+    client = SolverClient(args.queue, owner=args.owner)
+    print(json.dumps(client.status(args.ids or None)))
+
+
+def collect(args):
+    from worker_pool import SolverClient
+    client = SolverClient(args.queue, owner=args.owner)
+    for record in client.collect(args.ids, timeout=args.timeout):
+        print(json.dumps(record))
+
+
+def backends(args):
+    from backends import available_backends
+    for name in available_backends():
+        print(name)
+
+
+def build_parser():
+    from result_cache import DEFAULT_CACHE_PATH
+    from results_store import DEFAULT_RESULTS_DIR
+    from worker_pool import DEFAULT_QUEUE_PATH
+
+    parser = argparse.ArgumentParser(description='Graph coloring QUBO tools.')
+    parser.add_argument('--graph-dir', default='graph_instances')
+    parser.add_argument('--log-level', default='WARNING', help='Logging level, e.g. INFO or DEBUG.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('generate', help='Generate and store Erdos-Renyi graph instances.')
+    command.add_argument('--n-min', type=int, default=4)
+    command.add_argument('--n-max', type=int, default=50)
+    command.add_argument('--instances', type=int, default=20)
+    command.add_argument('--probability', type=float, default=0.5)
+    command.add_argument('--seed', type=int, default=None)
+    command.add_argument('--workers', type=int, default=None)
+    command.add_argument('--format', choices=['pickle', 'packed', 'both'], default='pickle')
+    command.set_defaults(handler=generate)
+
+    command = commands.add_parser('load', help='Show a stored graph instance.')
+    command.add_argument('n', type=int)
+    command.add_argument('c', type=int)
+    command.add_argument('--instance', type=int, default=0)
+    command.add_argument('--edges', action='store_true', help='Also print the edge list.')
+    command.set_defaults(handler=load)
+
+    command = commands.add_parser('solve', help='Solve one stored instance.')
+    command.add_argument('n', type=int)
+    command.add_argument('c', type=int)
+    command.add_argument('--instance', type=int, default=0)
+    command.add_argument('--backend', default='tn')
+    command.add_argument('--bond-dimension', type=int, default=8)
+    command.add_argument('--transverse-field-ratio', type=float, default=1e9)
+    command.add_argument('--lambdas', type=float, nargs=3, default=None)
+    command.add_argument('--sparse', action='store_true')
+    command.add_argument('--adaptive', action='store_true', help='Climb the bond dimension ladder up to --bond-dimension.')
+    command.add_argument('--preprocess', action='store_true')
+    command.add_argument('--color-budget', choices=['given', 'dsatur'], default='given')
+    command.add_argument('--seed', type=int, default=None, help='Seed for the annealing and tabu backends.')
+    command.add_argument('--cache', default=DEFAULT_CACHE_PATH)
+    command.add_argument('--no-cache', action='store_true')
+    command.add_argument('--fingerprints', default=None,
+                         help='Fingerprint index (cli.py index) for reusing results across isomorphic instances.')
+    command.set_defaults(handler=solve)
+
+    command = commands.add_parser('kcolor', help='Search the smallest k with the k-coloring decision QUBO.')
+    command.add_argument('n', type=int)
+    command.add_argument('c', type=int, help='Color directory of the stored instance.')
+    command.add_argument('--instance', type=int, default=0)
+    command.add_argument('--strategy', choices=['bisect', 'descend'], default='bisect')
+    command.add_argument('--backend', default='tn')
+    command.add_argument('--bond-dimension', type=int, default=8)
+    command.add_argument('--transverse-field-ratio', type=float, default=1e9)
+    command.add_argument('--sparse', action='store_true')
+    command.add_argument('--repair', action='store_true')
+    command.add_argument('--seed', type=int, default=None, help='Seed for the annealing and tabu backends.')
+    command.set_defaults(handler=kcolor)
+
+    command = commands.add_parser('sweep', help='Run a resumable parameter sweep.')
+    command.add_argument('--n-values', type=int, nargs='+', required=True)
+    command.add_argument('--c-values', type=int, nargs='+', default=None)
+    command.add_argument('--c-fraction', type=float, default=0.5)
+    command.add_argument('--c-offset', type=int, default=2)
+    command.add_argument('--instances', type=int, nargs='+', default=[0])
+    command.add_argument('--bond-dimensions', type=int, nargs='+', default=[8])
+    command.add_argument('--transverse-field-ratios', type=float, nargs='+', default=[1e9])
+    command.add_argument('--backends', nargs='+', default=['tn'])
+    command.add_argument('--checkpoint', default=os.path.join('plots', 'sweep_checkpoint.jsonl'))
+    command.add_argument('--workers', type=int, default=None)
+    command.add_argument('--blas-threads', type=int, default=1)
+    command.add_argument('--results', default=DEFAULT_RESULTS_DIR, help='Columnar results store directory.')
+    command.add_argument('--cache', default=DEFAULT_CACHE_PATH)
+    command.add_argument('--no-cache', action='store_true')
+    command.add_argument('--fingerprints', default=None,
+                         help='Fingerprint index (cli.py index) for reusing results across isomorphic instances.')
+    command.set_defaults(handler=sweep)
+
+    command = commands.add_parser('index', help='Fingerprint the stored instances to find isomorphic duplicates.')
+    command.add_argument('--path', default=None, help='Index database (default: fingerprints.sqlite in --graph-dir).')
+    command.set_defaults(handler=index)
+
+    command = commands.add_parser('serve', help='Run a pool of warm solver workers on the job queue.')
+    command.add_argument('--queue', default=DEFAULT_QUEUE_PATH)
+    command.add_argument('--workers', type=int, default=None)
+    command.add_argument('--threads', type=int, default=1, help='BLAS/OpenMP threads per worker.')
+    command.add_argument('--pin-cores', action='store_true', help='Bind every worker to its own cores (Linux).')
+    command.add_argument('--warm', nargs='*', default=['tn'], help='Backends imported when a worker starts.')
+    command.add_argument('--until-empty', action='store_true', help='Stop once the queue is drained.')
+    command.add_argument('--cache', default=DEFAULT_CACHE_PATH)
+    command.add_argument('--no-cache', action='store_true')
+    command.set_defaults(handler=serve)
+
+    command = commands.add_parser('submit', help='Queue stored instances for the worker pool.')
+    command.add_argument('n', type=int)
+    command.add_argument('c', type=int)
+    command.add_argument('--instances', type=int, nargs='+', default=[0])
+    command.add_argument('--backend', default='tn')
+    command.add_argument('--bond-dimension', type=int, default=8)
+    command.add_argument('--transverse-field-ratio', type=float, default=1e9)
+    command.add_argument('--lambdas', type=float, nargs=3, default=None)
+    command.add_argument('--seed', type=int, default=None, help='Seed for the annealing and tabu backends.')
+    command.add_argument('--queue', default=DEFAULT_QUEUE_PATH)
+    command.add_argument('--owner', default=None)
+    command.set_defaults(handler=submit)
+
+    command = commands.add_parser('status', help='Count queued, running and finished jobs.')
+    command.add_argument('ids', type=int, nargs='*', help='Job ids (default: all jobs of the owner).')
+    command.add_argument('--queue', default=DEFAULT_QUEUE_PATH)
+    command.add_argument('--owner', default=None)
+    command.set_defaults(handler=status)
+
+    command = commands.add_parser('collect', help='Wait for jobs and print their records.')
+    command.add_argument('ids', type=int, nargs='+')
+    command.add_argument('--timeout', type=float, default=None)
+    command.add_argument('--queue', default=DEFAULT_QUEUE_PATH)
+    command.add_argument('--owner', default=None)
+    command.set_defaults(handler=collect)
+
+    command = commands.add_parser('backends', help='List the registered solver backends.')
+    command.set_defaults(handler=backends)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format='%(message)s')
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
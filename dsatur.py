@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# dsatur.py
+import heapq
+import numpy as np
+
+
+def adjacency_lists(n, edges):
+    """
+    Build adjacency lists from an edge list, ignoring self-loops and duplicate edges.
+
+    :param n: Number of nodes.
+    :param edges: List of edges (i, j) or an (m, 2) array.
+    :return: List of neighbour sets, one per node.
+    """
+    neighbors = [set() for _ in range(n)]
+    for i, j in np.asarray(edges, dtype=np.int64).reshape(-1, 2).tolist():
+        if i != j:
+            neighbors[i].add(j)
+            neighbors[j].add(i)
+    return neighbors
+
+
+class DSatur:
+    def __init__(self, n, edges):
+        """
+        DSatur greedy coloring with a heap-based saturation queue, O((n + m) log n).
+
+        :param n: Number of nodes.
+        :param edges: List of edges (i, j) or an (m, 2) array, as stored in graph_instances.
+        """
+        self.n = n
+        self.neighbors = adjacency_lists(n, edges)
+        self.degrees = [len(nbrs) for nbrs in self.neighbors]
+        self.colors = np.full(n, -1, dtype=np.int64)
+
+    def color_graph(self):
+        """
+        Color the graph, always picking the uncolored vertex with the highest saturation
+        (number of distinct neighbour colors), breaking ties by degree and then by index.
+
+        :return: Array with the color of every node.
+        """
+        saturation = [set() for _ in range(self.n)]
+        heap = [(0, -self.degrees[v], v) for v in range(self.n)]
+        heapq.heapify(heap)
+
+        while heap:
+            neg_sat, _, v = heapq.heappop(heap)
+            # Skip entries that are stale because v was colored or its saturation grew
+            if self.colors[v] >= 0 or -neg_sat != len(saturation[v]):
+                continue
+
+            color = 0
+            while color in saturation[v]:
+                color += 1
+            self.colors[v] = color
+
+            for u in self.neighbors[v]:
+                if self.colors[u] < 0 and color not in saturation[u]:
+                    saturation[u].add(color)
+                    heapq.heappush(heap, (-len(saturation[u]), -self.degrees[u], u))
+
+        return self.colors
+
+    def num_colors(self):
+        """
+        :return: Number of colors used by the coloring.
+        """
+        if self.n == 0:
+            return 0
+        return int(self.colors.max()) + 1
+
+    def is_valid_coloring(self):
+        """
+        :return: True if every node is colored and no edge joins two nodes of the same color.
+        """
+        if np.any(self.colors < 0):
+            return False
+        return all(self.colors[v] != self.colors[u] for v in range(self.n) for u in self.neighbors[v])
+
+
+def dsatur_coloring(n, edges):
+    """
+    Convenience wrapper running DSatur on an edge list.
+
+    :param n: Number of nodes.
+    :param edges: List of edges (i, j) or an (m, 2) array.
+    :return: Tuple (colors, num_colors).
+    """
+    dsatur = DSatur(n, edges)
+    colors = dsatur.color_graph()
+    return colors, dsatur.num_colors()
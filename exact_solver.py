@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# exact_solver.py
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from qubo_solver import to_dense_qubo
+from ising import IsingModel
+
+
+def _low_block(Q_low):
+    """
+    Bit matrix and energies of every assignment of the low variables.
+    """
+    b = Q_low.shape[0]
+    states = np.arange(2 ** b, dtype=np.int64)
+    bits = ((states[:, None] >> np.arange(b)) & 1).astype(np.float64)
+    energies = np.einsum('si,ij,sj->s', bits, Q_low, bits) if b else np.zeros(1)
+    return bits, energies
+
+
+def _merge_top_k(energies, states, new_energies, new_states, k):
+    energies = np.concatenate([energies, new_energies])
+    states = np.concatenate([states, new_states])
+    if energies.size > k:
+        keep = np.argpartition(energies, k - 1)[:k]
+        energies, states = energies[keep], states[keep]
+    return energies, states
+
+
+def _enumerate_range(Q, low_bits, start, stop, k, tol):
+    """
+    Enumerate all low-bit assignments for the high-bit Gray codes g(t), start <= t < stop.
+    With k=None all ground states are collected, otherwise the k lowest energies.
+
+    :return: Tuple (energies, state integers).
+    """
+    N = Q.shape[0]
+    Q_low = Q[:low_bits, :low_bits]
+    Q_cross = Q[:low_bits, low_bits:]
+    Q_high = Q[low_bits:, low_bits:]
+    bits, low_energies = _low_block(Q_low)
+    low_states = np.arange(2 ** low_bits, dtype=np.int64)
+
+    gray = start ^ (start >> 1)
+    x_high = ((gray >> np.arange(N - low_bits)) & 1).astype(np.float64)
+    cross_field = Q_cross @ x_high
+    high_field = Q_high @ x_high
+    high_energy = float(x_high @ high_field)
+
+    best_energies = np.empty(0)
+    best_states = np.empty(0, dtype=np.int64)
+    best = np.inf
+
+    for t in range(start, stop):
+        if t > start:
+            # Gray code step: flip the bit at the position of the lowest set bit of t
+            j = (t & -t).bit_length() - 1
+            change = 1.0 - 2.0 * x_high[j]
+            high_energy += change * (Q_high[j, j] + 2.0 * (high_field[j] - Q_high[j, j] * x_high[j]))
+            x_high[j] += change
+            high_field += change * Q_high[:, j]
+            cross_field += change * Q_cross[:, j]
+            gray ^= 1 << j
+
+        energies = low_energies + high_energy + 2.0 * (bits @ cross_field)
+        states = low_states | (gray << low_bits)
+
+        if k is None:
+            chunk_min = energies.min()
+            if chunk_min < best - tol:
+                best = chunk_min
+                best_energies = np.empty(0)
+                best_states = np.empty(0, dtype=np.int64)
+            if chunk_min <= best + tol:
+                hits = energies <= best + tol
+                best_energies = np.concatenate([best_energies, energies[hits]])
+                best_states = np.concatenate([best_states, states[hits]])
+        else:
+            best_energies, best_states = _merge_top_k(best_energies, best_states, energies, states, k)
+
+    return best_energies, best_states
+
+
+class ExactQUBOEnumerator:
+    def __init__(self, Q, chunk_bits=16, tol=1e-9):
+        """
+        Exact minimization of x^T Q x by enumerating all 2^N bitstrings. The high variables are
+        walked in Gray-code order with O(N) incremental updates, the low chunk_bits variables
+        are evaluated for all their assignments at once with numpy.
+
+        :param Q: Q matrix (dense, scipy.sparse or GraphColoringQUBOOperator) or an ising.IsingModel,
+                  N up to about 34. The enumeration assumes a symmetric Q, so a non-symmetric Q is
+                  replaced by (Q + Q^T) / 2, which has the same energies. For an Ising model the reported energies are H(s), offset included,
+                  and the states are the bits x = (1 - s) / 2.
+        :param chunk_bits: Number of low variables evaluated per vectorized step.
+        :param tol: Energy tolerance for degenerate ground states.
+        """
+        self.offset = 0.0
+        if isinstance(Q, IsingModel):
+            Q, self.offset = Q.to_qubo()
+        Q = np.asarray(to_dense_qubo(Q), dtype=np.float64)
+        # The Gray-code updates and the low/high split read only one of the two cross blocks
+        self.Q = 0.5 * (Q + Q.T)
+        self.num_variables = self.Q.shape[0]
+        if self.num_variables > 62:
+            raise ValueError(f'Exact enumeration of {self.num_variables} variables is not feasible.')
+        self.low_bits = min(chunk_bits, self.num_variables)
+        self.tol = tol
+        self.cost = []
+        self.solution = []
+        self.time_to_solution = None
+
+    def to_bits(self, states):
+        """
+        Convert state integers to binary vectors (bit i is variable i).
+        """
+        states = np.asarray(states, dtype=np.int64)
+        return ((states[:, None] >> np.arange(self.num_variables)) & 1).astype(np.int8)
+
+    def _run(self, k, workers):
+        num_high = 2 ** (self.num_variables - self.low_bits)
+        workers = min(workers or os.cpu_count(), num_high)
+        bounds = np.linspace(0, num_high, workers + 1).astype(np.int64)
+        ranges = [(int(lo), int(hi)) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+        if workers == 1:
+            results = [_enumerate_range(self.Q, self.low_bits, lo, hi, k, self.tol) for lo, hi in ranges]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_enumerate_range, self.Q, self.low_bits, lo, hi, k, self.tol)
+                           for lo, hi in ranges]
+                results = [future.result() for future in futures]
+
+        energies = np.concatenate([result[0] for result in results])
+        states = np.concatenate([result[1] for result in results])
+        return energies, states
+
+    def ground_states(self, workers=1):
+        """
+        Find the ground energy and every degenerate ground state.
+
+        :param workers: Number of processes the enumeration is split across.
+        :return: Tuple (ground energy, binary states of shape (degeneracy, N)).
+        """
+        energies, states = self._run(None, workers)
+        ground = energies.min()
+        hits = energies <= ground + self.tol
+        return float(ground) + self.offset, self.to_bits(np.sort(states[hits]))
+
+    def top_k(self, k, workers=1):
+        """
+        Stream the k lowest-energy bitstrings.
+
+        :param k: Number of states to keep.
+        :param workers: Number of processes the enumeration is split across.
+        :return: Tuple (energies in ascending order, binary states of shape (k, N)).
+        """
+        energies, states = self._run(k, workers)
+        order = np.lexsort((states, energies))[:k]
+        return energies[order] + self.offset, self.to_bits(states[order])
+
+    def solve(self, k=None, workers=1):
+        """
+        Enumerate and store the results in cost, solution and time_to_solution like QUBOSolver.
+
+        :param k: If given, keep the k lowest states instead of all ground states.
+        :param workers: Number of processes the enumeration is split across.
+        """
+        start = time.perf_counter()
+        if k is None:
+            ground, states = self.ground_states(workers)
+            energies = np.full(len(states), ground)
+        else:
+            energies, states = self.top_k(k, workers)
+        self.time_to_solution = time.perf_counter() - start
+        self.cost = [float(value) for value in energies]
+        self.solution = [state.astype(np.int64) for state in states]
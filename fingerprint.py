@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+# fingerprint.py
+import os
+import time
+import hashlib
+import logging
+import sqlite3
+import numpy as np
+import networkx as nx
+from result_cache import canonical_edges
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.path.join('graph_instances', 'fingerprints.sqlite')
+# Stored as PRAGMA user_version; bumped whenever wl_hash values change
+INDEX_VERSION = 1
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS instances (
+    n INTEGER NOT NULL,
+    c INTEGER NOT NULL,
+    instance INTEGER NOT NULL,
+    num_edges INTEGER NOT NULL,
+    exact_hash TEXT NOT NULL,
+    wl_hash TEXT NOT NULL,
+    representative_c INTEGER NOT NULL,
+    representative_instance INTEGER NOT NULL,
+    mapping BLOB NOT NULL,
+    PRIMARY KEY (n, c, instance)
+)
+'''
+
+
+def exact_hash(n, edges):
+    """
+    Hash of the node count and the sorted, oriented edge list: equal for identical graphs.
+    """
+    digest = hashlib.blake2b(str(int(n)).encode(), digest_size=16)
+    digest.update(canonical_edges(edges).tobytes())
+    return digest.hexdigest()
+
+
+def adjacency_matrix(n, edges):
+    """
+    Boolean adjacency matrix without self-loops.
+    """
+    edge_array = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    edge_array = edge_array[edge_array[:, 0] != edge_array[:, 1]]
+    A = np.zeros((n, n), dtype=bool)
+    A[edge_array[:, 0], edge_array[:, 1]] = True
+    A[edge_array[:, 1], edge_array[:, 0]] = True
+    return A
+
+
+def _label_digest(label, neighbor_labels):
+    """
+    Stable 64-bit label of a node's own label and the sorted multiset of its neighbours' labels.
+    """
+    data = np.asarray([label] + neighbor_labels, dtype=np.int64).tobytes()
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little', signed=True)
+
+
+def wl_labels(A):
+    """
+    Weisfeiler-Lehman color refinement until the partition is stable. Labels are built from
+    the degree and the sorted neighbour labels only, so isomorphic graphs get the same labels
+    on corresponding nodes. Each label is a blake2b digest rather than a builtin hash(), so the
+    labels (and wl_hash values stored in an index) are the same on every interpreter and platform.
+
+    :param A: Boolean adjacency matrix.
+    :return: Tuple (node labels as a list of ints, number of refinement rounds).
+    """
+    n = A.shape[0]
+    neighbors = [np.flatnonzero(row).tolist() for row in A]
+    labels = [len(adjacent) for adjacent in neighbors]
+    classes = len(set(labels))
+    rounds = 0
+    while True:
+        refined = [_label_digest(labels[v], sorted(labels[u] for u in neighbors[v])) for v in range(n)]
+        rounds += 1
+        refined_classes = len(set(refined))
+        if refined_classes == classes:
+            return labels, rounds
+        labels, classes = refined, refined_classes
+
+
+def wl_hash(n, edges):
+    """
+    Weisfeiler-Lehman hash: equal for isomorphic graphs (but equal hashes still need confirming).
+    """
+    labels, rounds = wl_labels(adjacency_matrix(n, edges))
+    digest = hashlib.blake2b(f'{n}:{rounds}:'.encode(), digest_size=16)
+    digest.update(np.sort(np.asarray(labels, dtype=np.int64)).tobytes())
+    return digest.hexdigest()
+
+
+def find_isomorphism(A, B):
+    """
+    Search an isomorphism between two graphs with VF2++ (networkx), after rejecting pairs whose
+    WL label multisets differ.
+
+    :param A: Boolean adjacency matrix of the first graph.
+    :param B: Boolean adjacency matrix of the second graph.
+    :return: Array mapping every node of A to its node in B, or None if the graphs are not isomorphic.
+    """
+    n = A.shape[0]
+    if B.shape[0] != n or A.sum() != B.sum():
+        return None
+    if sorted(wl_labels(A)[0]) != sorted(wl_labels(B)[0]):
+        return None
+
+    found = nx.vf2pp_isomorphism(nx.from_numpy_array(A), nx.from_numpy_array(B))
+    if found is None:
+        return None
+    mapping = np.empty(n, dtype=np.int64)
+    mapping[list(found)] = list(found.values())
+    return mapping
+
+
+def relabel_solution(solution, n, c, mapping):
+    """
+    Move a QUBOMatrix solution vector from one graph to an isomorphic one.
+
+    :param solution: Solution vector (x and y variables) on the source graph.
+    :param mapping: Array mapping every source node to its target node.
+    :return: Solution vector on the target graph.
+    """
+    solution = np.asarray(solution)
+    relabeled = solution.copy()
+    X = solution[:n * c].reshape(n, c)
+    target = np.empty_like(X)
+    target[mapping] = X
+    relabeled[:n * c] = target.ravel()
+    return relabeled
+
+
+class FingerprintIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH, loader=None):
+        """
+        Persistent table from graph fingerprints to stored instances. Every instance points to the
+        representative of its isomorphism class together with the node mapping representative -> instance.
+
+        :param path: SQLite database file; parent directories are created.
+        :param loader: Callable (n, c, instance) -> edges, used to read class representatives.
+        """
+        self.path = path
+        self._loader = loader
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = None
+        self._representatives = {}
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=60.0)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(_SCHEMA)
+            self._connection.execute('CREATE INDEX IF NOT EXISTS instances_exact ON instances (exact_hash)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS instances_wl ON instances (n, num_edges, wl_hash)')
+            version = self._connection.execute('PRAGMA user_version').fetchone()[0]
+            if version != INDEX_VERSION:
+                if self._connection.execute('SELECT COUNT(*) FROM instances').fetchone()[0]:
+                    # WL hashes of an older version never match new ones; drop them so the index is rebuilt
+                    logger.warning('Fingerprint index %s has version %d, expected %d; clearing it.',
+                                   self.path, version, INDEX_VERSION)
+                    self._connection.execute('DELETE FROM instances')
+                self._connection.execute(f'PRAGMA user_version = {INDEX_VERSION}')
+            self._connection.commit()
+        return self._connection
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_connection'] = None
+        state['_representatives'] = {}
+        return state
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM instances').fetchone()[0]
+
+    def __contains__(self, key):
+        return self.connection.execute('SELECT 1 FROM instances WHERE n = ? AND c = ? AND instance = ?',
+                                       tuple(key)).fetchone() is not None
+
+    def _match(self, n, edges, digest, wl_digest=None):
+        """
+        Find the representative of the class of a graph.
+
+        :return: Tuple (representative c, representative instance, mapping representative -> graph), or None.
+        """
+        row = self.connection.execute(
+            'SELECT representative_c, representative_instance, mapping FROM instances WHERE exact_hash = ? LIMIT 1',
+            (digest,)).fetchone()
+        if row is not None:
+            # Identical edge sets share the mapping of the indexed copy
+            return row[0], row[1], np.frombuffer(row[2], dtype=np.int16).astype(np.int64)
+
+        A = None
+        rows = self.connection.execute(
+            'SELECT DISTINCT representative_c, representative_instance FROM instances '
+            'WHERE n = ? AND num_edges = ? AND wl_hash = ?',
+            (n, len(edges), wl_digest or wl_hash(n, edges))).fetchall()
+        for representative_c, representative_instance in rows:
+            if A is None:
+                A = adjacency_matrix(n, edges)
+            mapping = find_isomorphism(self._representative_adjacency(n, representative_c, representative_instance), A)
+            if mapping is not None:
+                return representative_c, representative_instance, mapping
+        return None
+
+    def _representative_adjacency(self, n, c, instance):
+        key = (n, c, instance)
+        if key not in self._representatives:
+            self._representatives[key] = adjacency_matrix(n, self._loader(n, c, instance))
+        return self._representatives[key]
+
+    def add(self, n, c, instance, edges, commit=True):
+        """
+        Index one instance.
+
+        :param commit: Commit immediately; build commits in batches instead.
+        :return: Key (n, c, instance) of the representative of its class.
+        """
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        digest = exact_hash(n, edges)
+        wl_digest = wl_hash(n, edges)
+        match = self._match(n, edges, digest, wl_digest)
+        if match is None:
+            representative_c, representative_instance, mapping = c, instance, np.arange(n)
+            self._representatives[(n, c, instance)] = adjacency_matrix(n, edges)
+        else:
+            representative_c, representative_instance, mapping = match
+        self.connection.execute(
+            'INSERT OR REPLACE INTO instances VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (n, c, instance, len(edges), digest, wl_digest, representative_c, representative_instance,
+             mapping.astype(np.int16).tobytes()))
+        if commit:
+            self.connection.commit()
+        return n, representative_c, representative_instance
+
+    def build(self, instances, loader):
+        """
+        Index a stream of instances.
+
+        :param instances: Iterable of (n, c, instance, edges) tuples, e.g. QUBOSimulation.iter_graph_instances().
+        :param loader: Callable (n, c, instance) -> edges, used to read class representatives.
+        :return: Number of indexed instances.
+        """
+        self._loader = loader
+        count = 0
+        start = time.perf_counter()
+        for n, c, instance, edges in instances:
+            if (n, c, instance) not in self:
+                self.add(n, c, instance, edges, commit=False)
+            count += 1
+            if count % 1000 == 0:
+                self.connection.commit()
+        self.connection.commit()
+        logger.info('Indexed %d instances in %.1f s', count, time.perf_counter() - start)
+        return count
+
+    def lookup(self, n, edges, loader=None):
+        """
+        Find the class of a graph that may not be indexed itself.
+
+        :param loader: Callable (n, c, instance) -> edges for reading representatives.
+        :return: Tuple (representative key, mapping representative -> graph), or None.
+        """
+        if loader is not None:
+            self._loader = loader
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        match = self._match(n, edges, exact_hash(n, edges))
+        if match is None:
+            return None
+        representative_c, representative_instance, mapping = match
+        return (n, representative_c, representative_instance), mapping
+
+    def representative(self, n, c, instance):
+        """
+        :return: Tuple (representative key, mapping representative -> instance), or None if not indexed.
+        """
+        row = self.connection.execute(
+            'SELECT representative_c, representative_instance, mapping FROM instances '
+            'WHERE n = ? AND c = ? AND instance = ?', (n, c, instance)).fetchone()
+        if row is None:
+            return None
+        return (n, row[0], row[1]), np.frombuffer(row[2], dtype=np.int16).astype(np.int64)
+
+    def equivalents(self, n, c, instance):
+        """
+        All indexed instances isomorphic to the given one (including itself).
+        """
+        found = self.representative(n, c, instance)
+        if found is None:
+            return []
+        (_, representative_c, representative_instance), _ = found
+        rows = self.connection.execute(
+            'SELECT c, instance FROM instances WHERE n = ? AND representative_c = ? AND representative_instance = ? '
+            'ORDER BY c, instance', (n, representative_c, representative_instance)).fetchall()
+        return [(n, row_c, row_instance) for row_c, row_instance in rows]
+
+    def map_coloring(self, colors, source, target):
+        """
+        Transfer a node coloring between two equivalent indexed instances.
+
+        :param colors: Color of every node of the source instance.
+        :param source: Key (n, c, instance) of the colored instance.
+        :param target: Key (n, c, instance) of an equivalent instance.
+        :return: Coloring of the target instance.
+        """
+        source_class, source_mapping = self.representative(*source)
+        target_class, target_mapping = self.representative(*target)
+        if source_class != target_class:
+            raise ValueError(f'Instances {source} and {target} are not equivalent.')
+        colors = np.asarray(colors)
+        mapped = np.empty_like(colors)
+        mapped[target_mapping] = colors[source_mapping]
+        return mapped
+
+    def summary(self):
+        """
+        :return: Tuple (number of instances, number of distinct edge sets, number of isomorphism classes).
+        """
+        instances, distinct = self.connection.execute(
+            'SELECT COUNT(*), COUNT(DISTINCT exact_hash) FROM instances').fetchone()
+        classes = self.connection.execute(
+            'SELECT COUNT(*) FROM (SELECT DISTINCT n, representative_c, representative_instance FROM instances)'
+        ).fetchone()[0]
+        return instances, distinct, classes
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def build_index(graph_dir='graph_instances', path=None):
+    """
+    Index every stored instance of graph_dir.
+
+    :return: The FingerprintIndex.
+    """
+    from tn_simulation import QUBOSimulation
+    simulation = QUBOSimulation(graph_dir=graph_dir)
+    index = FingerprintIndex(path or os.path.join(graph_dir, 'fingerprints.sqlite'))
+    index.build(simulation.iter_graph_instances(), lambda n, c, i: simulation.load_graph_instance(n, c, i)[2])
+    return index
+
+
+if __name__ == '__main__':
+    import sys
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    index = build_index(sys.argv[1] if len(sys.argv) > 1 else 'graph_instances')
+    instances, distinct, classes = index.summary()
+    print(f'{instances} instances, {distinct} distinct edge sets, {classes} isomorphism classes')
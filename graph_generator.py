@@ -1,54 +1,174 @@
 # -*- coding: utf-8 -*-
 # graph_generator.py
 import os
+import json
 import pickle
-import networkx as nx
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Corpus parameters written next to the generated instances
+CORPUS_FILE = 'corpus.json'
+
+
+def instance_seed(entropy, n, c, instance, share_across_c=True):
+    '''
+    Derives the SeedSequence of a single graph instance from the corpus entropy.
+    When graphs are shared across c, every c of a given (n, instance) uses the same seed.
+    '''
+    spawn_key = (n, instance) if share_across_c else (n, c, instance)
+    return np.random.SeedSequence(entropy, spawn_key=spawn_key)
+
+
+def sample_erdos_renyi_edges(n, p, seed=None):
+    '''
+    Samples G(n, p) edges with a vectorized Bernoulli mask over the upper triangle.
+    Edges are returned as an (m, 2) int32 array in lexicographic (i < j) order.
+    '''
+    rng = np.random.default_rng(seed)
+    rows, cols = np.triu_indices(n, k=1)
+    mask = rng.random(rows.size) < p
+    return np.stack([rows[mask], cols[mask]], axis=1).astype(np.int32)
+
+
+def read_corpus(main_dir):
+    '''
+    Reads the corpus parameters (root entropy, p, ranges) stored by generate_and_store_graphs,
+    or returns None if main_dir has none.
+    '''
+    path = os.path.join(main_dir, CORPUS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _generate_block(task):
+    '''
+    Generates every (c, instance) graph of one n. Runs inside a worker process.
+    '''
+    n, c_values, instances, p, entropy, share_across_c = task
+    records = []
+    shared = {}
+    for c in c_values:
+        for ii in range(instances):
+            if share_across_c and ii in shared:
+                records.append((n, c, ii, shared[ii]))
+                continue
+            edges = sample_erdos_renyi_edges(n, p, instance_seed(entropy, n, c, ii, share_across_c))
+            shared[ii] = edges
+            records.append((n, c, ii, edges))
+    return records
+
 
 class ErdosRenyiGraphGenerator:
     '''
     A class to generate, store, and load Erdos-Renyi random graphs.
     '''
-    def __init__(self, main_dir='graph_instances', n_range=None, c_range=None, instances=20, p=0.5):
+    def __init__(self, main_dir='graph_instances', n_range=None, c_range=None, instances=20, p=0.5,
+                 seed=None, workers=None, share_across_c=True, store_format='pickle'):
         '''
         Initializes the generator and creates the main directory.
+        seed fixes the corpus entropy; if None, the entropy stored in main_dir by an earlier
+        generate_and_store_graphs is reused, and fresh entropy is drawn only for a new corpus.
+        The entropy is kept in self.seed and written to main_dir/corpus.json with the corpus,
+        so it can be rebuilt bit-exactly. store_format is 'pickle', 'packed' or 'both'.
         '''
         self.main_dir = main_dir
         self.n_range = n_range
         self.c_range = c_range
         self.instances = instances
         self.p = p
+        if seed is None:
+            corpus = read_corpus(main_dir)
+            seed = corpus['entropy'] if corpus is not None else None
+        self.seed = np.random.SeedSequence(seed).entropy
+        self.workers = workers
+        self.share_across_c = share_across_c
+        self.store_format = store_format
         os.makedirs(self.main_dir, exist_ok=True)
 
-    def generate_graph(self, n):
+    def generate_graph(self, n, seed=None):
         '''
         Generates an Erdos-Renyi random graph.
         '''
-        G = nx.erdos_renyi_graph(n, self.p)
-        return list(G.edges)
+        return [tuple(edge) for edge in sample_erdos_renyi_edges(n, self.p, seed).tolist()]
+
+    def generate_instance(self, n, c, instance):
+        '''
+        Rebuilds a single stored instance bit-exactly from the corpus seed.
+        '''
+        return sample_erdos_renyi_edges(n, self.p, instance_seed(self.seed, n, c, instance, self.share_across_c))
+
+    def _c_values(self, n):
+        c_min = self.c_range[0] if self.c_range else 2
+        c_max = self.c_range[1] if self.c_range else n
+        return list(range(c_min, c_max + 1))
+
+    def _write_pickle(self, n, c, ii, edges):
+        c_dir = os.path.join(self.main_dir, f'n_{n}', f'c_{c}')
+        os.makedirs(c_dir, exist_ok=True)
+        graph_data = {'n': n, 'c': c, 'edges': [tuple(edge) for edge in edges.tolist()]}
+        file_path = os.path.join(c_dir, f'n_{n}_c_{c}_{ii}.pkl')
+
+        with open(file_path, 'wb') as f:
+            pickle.dump(graph_data, f)
+
+    def _write_corpus(self):
+        corpus = {
+            'entropy': self.seed, 'p': self.p, 'n_range': list(self.n_range),
+            'c_range': list(self.c_range) if self.c_range else None, 'instances': self.instances,
+            'share_across_c': self.share_across_c,
+        }
+        path = os.path.join(self.main_dir, CORPUS_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(corpus, f, indent=4)
+        os.replace(path + '.tmp', path)
 
     def generate_and_store_graphs(self):
         '''
         Generates and stores Erdos-Renyi random graphs for different values of n and c.
+        Each n is generated in a worker process; results are streamed to disk as blocks arrive.
+        A packed store is rewritten to contain exactly the generated range; when only pickles are
+        requested, an existing packed store is rewritten too, so it never disagrees with them.
+        The corpus parameters, including the root entropy, are written to main_dir/corpus.json.
         '''
-        for n in range(self.n_range[0], self.n_range[1] + 1):
-            n_dir = os.path.join(self.main_dir, f'n_{n}')
-            os.makedirs(n_dir, exist_ok=True)
+        from graph_store import PackedGraphStore, PackedGraphWriter, default_store_dir
 
-            c_min = self.c_range[0] if self.c_range else 2
-            c_max = self.c_range[1] if self.c_range else n
+        tasks = [
+            (n, self._c_values(n), self.instances, self.p, self.seed, self.share_across_c)
+            for n in range(self.n_range[0], self.n_range[1] + 1)
+        ]
 
-            for c in range(c_min, c_max + 1):
-                c_dir = os.path.join(n_dir, f'c_{c}')
-                os.makedirs(c_dir, exist_ok=True)
+        writer = None
+        store_dir = default_store_dir(self.main_dir)
+        if self.store_format in ('packed', 'both') or PackedGraphStore.exists(store_dir):
+            writer = PackedGraphWriter(store_dir)
 
-                for ii in range(self.instances):
-                    edges = self.generate_graph(n)
-                    graph_data = {'n': n, 'c': c, 'edges': edges}
-                    file_name = f'n_{n}_c_{c}_{ii}.pkl'
-                    file_path = os.path.join(c_dir, file_name)
+        if self.workers == 1:
+            blocks = map(_generate_block, tasks)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=self.workers)
+            blocks = pool.map(_generate_block, tasks)
 
-                    with open(file_path, 'wb') as f:
-                        pickle.dump(graph_data, f)
+        try:
+            for records in blocks:
+                written = {}
+                for n, c, ii, edges in records:
+                    if self.store_format in ('pickle', 'both'):
+                        self._write_pickle(n, c, ii, edges)
+                    if writer is not None:
+                        if id(edges) in written:
+                            writer.add_alias(n, c, ii, written[id(edges)])
+                        else:
+                            writer.add(n, c, ii, edges)
+                            written[id(edges)] = (n, c, ii)
+            if writer is not None:
+                writer.close()
+            self._write_corpus()
+        finally:
+            if pool is not None:
+                pool.shutdown()
 
     def load_graph(self, file_path):
         '''
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+# graph_store.py
+import os
+import re
+import numpy as np
+from graph_generator import ErdosRenyiGraphGenerator
+
+EDGES_FILE = 'edges.bin'
+INDEX_FILE = 'index.npy'
+INDEX_DTYPE = np.dtype([
+    ('n', np.int32), ('c', np.int32), ('instance', np.int32),
+    ('offset', np.int64), ('num_edges', np.int64),
+])
+PICKLE_NAME = re.compile(r'^n_(\d+)_c_(\d+)_(\d+)\.pkl$')
+
+
+def default_store_dir(main_dir):
+    '''
+    Location of the packed store inside a graph instance directory.
+    '''
+    return os.path.join(main_dir, 'packed')
+
+
+class PackedGraphWriter:
+    '''
+    Streams graph instances into a packed store: one flat int32 edge file plus an
+    (n, c, instance) -> (offset, num_edges) index. Files are written under temporary
+    names and moved into place on close, so readers never see a partial store.
+    '''
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._edges_tmp = os.path.join(store_dir, EDGES_FILE + '.tmp')
+        self._edges_file = open(self._edges_tmp, 'wb')
+        self._index = []
+        self._positions = {}
+        self._offset = 0
+
+    def add(self, n, c, instance, edges):
+        '''
+        Appends one graph instance to the store.
+        '''
+        edge_array = np.asarray(edges, dtype='<i4').reshape(-1, 2)
+        edge_array.tofile(self._edges_file)
+        self._index.append((n, c, instance, self._offset, len(edge_array)))
+        self._positions[(n, c, instance)] = (self._offset, len(edge_array))
+        self._offset += len(edge_array)
+
+    def add_alias(self, n, c, instance, source_key):
+        '''
+        Registers an instance whose edges are identical to an already written (n, c, instance)
+        key, without storing the edges a second time.
+        '''
+        offset, num_edges = self._positions[tuple(source_key)]
+        self._index.append((n, c, instance, offset, num_edges))
+        self._positions[(n, c, instance)] = (offset, num_edges)
+
+    def add_many(self, records):
+        '''
+        Appends an iterable of (n, c, instance, edges) records.
+        '''
+        for n, c, instance, edges in records:
+            self.add(n, c, instance, edges)
+
+    def close(self):
+        '''
+        Writes the index and atomically publishes the store.
+        '''
+        if self._edges_file is None:
+            return
+        self._edges_file.close()
+        self._edges_file = None
+
+        index = np.array(self._index, dtype=INDEX_DTYPE)
+        index.sort(order=['n', 'c', 'instance'])
+        index_tmp = os.path.join(self.store_dir, INDEX_FILE + '.tmp.npy')
+        np.save(index_tmp, index)
+
+        os.replace(self._edges_tmp, os.path.join(self.store_dir, EDGES_FILE))
+        os.replace(index_tmp, os.path.join(self.store_dir, INDEX_FILE))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._edges_file.close()
+            self._edges_file = None
+            os.remove(self._edges_tmp)
+
+
+class PackedGraphStore:
+    '''
+    Read-only access to a packed graph store. Edge arrays are returned as zero-copy
+    views into a memory-mapped file.
+    '''
+    def __init__(self, store_dir):
+        if not PackedGraphStore.exists(store_dir):
+            raise FileNotFoundError(f'No packed graph store found in {store_dir}.')
+        self.store_dir = store_dir
+        self.index = np.load(os.path.join(store_dir, INDEX_FILE))
+
+        edges_path = os.path.join(store_dir, EDGES_FILE)
+        if os.path.getsize(edges_path) == 0:
+            self.edges = np.zeros((0, 2), dtype='<i4')
+        else:
+            self.edges = np.memmap(edges_path, dtype='<i4', mode='r').reshape(-1, 2)
+
+        self._lookup = {
+            (int(n), int(c), int(instance)): row
+            for row, (n, c, instance) in enumerate(zip(self.index['n'], self.index['c'], self.index['instance']))
+        }
+
+    @staticmethod
+    def exists(store_dir):
+        '''
+        Checks whether a complete packed store is present in store_dir.
+        '''
+        return (os.path.isfile(os.path.join(store_dir, EDGES_FILE))
+                and os.path.isfile(os.path.join(store_dir, INDEX_FILE)))
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return tuple(key) in self._lookup
+
+    def keys(self):
+        '''
+        Returns the stored (n, c, instance) keys in sorted order.
+        '''
+        return [(int(n), int(c), int(i)) for n, c, i in zip(self.index['n'], self.index['c'], self.index['instance'])]
+
+    def num_edges(self, n, c, instance_index=0):
+        '''
+        Returns the edge count of one instance from the index, without touching the edge file.
+        '''
+        row = self._lookup.get((n, c, instance_index))
+        if row is None:
+            raise KeyError(f'Graph instance n_{n}_c_{c}_{instance_index} is not in the packed store.')
+        return int(self.index['num_edges'][row])
+
+    def get_edges(self, n, c, instance_index=0):
+        '''
+        Returns the edges of one instance as an (m, 2) int32 view into the store.
+        '''
+        row = self._lookup.get((n, c, instance_index))
+        if row is None:
+            raise KeyError(f'Graph instance n_{n}_c_{c}_{instance_index} is not in the packed store.')
+        offset = int(self.index['offset'][row])
+        return self.edges[offset:offset + int(self.index['num_edges'][row])]
+
+    def load_graph(self, n, c, instance_index=0):
+        '''
+        Loads one instance in the same dictionary layout as ErdosRenyiGraphGenerator.load_graph.
+        '''
+        return {'n': n, 'c': c, 'edges': self.get_edges(n, c, instance_index)}
+
+
+def pickle_tree_keys(main_dir='graph_instances'):
+    '''
+    Returns the sorted (n, c, instance) keys of an n_*/c_*/*.pkl tree without loading any graph.
+    '''
+    keys = []
+    if not os.path.isdir(main_dir):
+        return keys
+    for n_entry in os.scandir(main_dir):
+        if not (n_entry.is_dir() and n_entry.name.startswith('n_')):
+            continue
+        for c_entry in os.scandir(n_entry.path):
+            if not (c_entry.is_dir() and c_entry.name.startswith('c_')):
+                continue
+            for file_entry in os.scandir(c_entry.path):
+                match = PICKLE_NAME.match(file_entry.name)
+                if match is not None:
+                    keys.append(tuple(int(group) for group in match.groups()))
+    return sorted(keys)
+
+
+def convert_pickle_tree(main_dir='graph_instances', store_dir=None):
+    '''
+    One-shot conversion of an n_*/c_*/*.pkl tree into a packed store.
+    Returns the number of converted instances.
+    '''
+    store_dir = store_dir or default_store_dir(main_dir)
+    loader = ErdosRenyiGraphGenerator(main_dir=main_dir)
+
+    count = 0
+    with PackedGraphWriter(store_dir) as writer:
+        for root, _, files in os.walk(main_dir):
+            for file_name in sorted(files):
+                match = PICKLE_NAME.match(file_name)
+                if match is None:
+                    continue
+                graph_data = loader.load_graph(os.path.join(root, file_name))
+                writer.add(graph_data['n'], graph_data['c'], int(match.group(3)), graph_data['edges'])
+                count += 1
+    return count
+
+
+if __name__ == '__main__':
+    import sys
+    source = sys.argv[1] if len(sys.argv) > 1 else 'graph_instances'
+    target = sys.argv[2] if len(sys.argv) > 2 else None
+    converted = convert_pickle_tree(source, target)
+    print(f'Packed {converted} graph instances into {target or default_store_dir(source)}')
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# ising.py
+from collections import OrderedDict
+import numpy as np
+from scipy.sparse import coo_matrix
+from qubo_solver import get_qubo_components, edge_digest
+
+
+class IsingModel:
+    def __init__(self, h, J, offset):
+        """
+        Ising Hamiltonian H(s) = sum_i h_i s_i + sum_{i<j} J_ij s_i s_j + offset with s_i in {+1, -1}.
+        Binary and spin variables are related by x = (1 - s) / 2, i.e. s = +1 is the bit 0 state,
+        matching the sigma_z convention of the notebooks.
+        :param h: Local fields (numpy array of length N)
+        :param J: Couplings as a strictly upper triangular scipy.sparse CSR matrix
+        :param offset: Constant energy offset
+        """
+        self.h = h
+        self.J = J
+        self.offset = offset
+
+    @property
+    def num_spins(self):
+        return self.h.size
+
+    def energy(self, spins):
+        """
+        Evaluate the Ising energy.
+        :param spins: Spin vector, or a 2-D array with one configuration per row
+        :return: Energy (float), or an array of energies for a batch
+        """
+        s = np.asarray(spins, dtype=np.float64)
+        coupling = np.asarray(self.J @ s.T).T
+        return s @ self.h + np.sum(s * coupling, axis=-1) + self.offset
+
+    def to_qubo(self):
+        """
+        Reverse mapping to a QUBO.
+        :return: Tuple (symmetric Q as scipy.sparse CSR matrix, offset) with H(s) = x^T Q x + offset
+        """
+        return ising_to_qubo(self.h, self.J, self.offset)
+
+
+def spins_to_bits(spins):
+    """
+    :param spins: Spin values in {+1, -1}
+    :return: Binary values x = (1 - s) / 2
+    """
+    return ((1 - np.asarray(spins)) // 2).astype(np.int64)
+
+
+def bits_to_spins(bits):
+    """
+    :param bits: Binary values in {0, 1}
+    :return: Spin values s = 1 - 2x
+    """
+    return (1 - 2 * np.asarray(bits)).astype(np.int64)
+
+
+def _ising_from_entries(size, rows, cols, values):
+    """
+    Convert the coordinate entries of a symmetric Q (duplicates allowed) to an IsingModel
+    without forming a dense matrix.
+    """
+    diagonal = rows == cols
+    off = ~diagonal
+    Q_diag = np.bincount(rows[diagonal], weights=values[diagonal], minlength=size)
+    row_sums = np.bincount(rows[off], weights=values[off], minlength=size)
+
+    # x_i x_j = (1 - s_i - s_j + s_i s_j) / 4 and x_i = (1 - s_i) / 2
+    h = -0.5 * (Q_diag + row_sums)
+    offset = 0.5 * Q_diag.sum() + 0.25 * row_sums.sum()
+    # Q_ij and Q_ji both multiply s_i s_j / 4, so J_ij = Q_ij / 2 on the upper triangle
+    upper = rows < cols
+    J = coo_matrix((0.5 * values[upper], (rows[upper], cols[upper])), shape=(size, size)).tocsr()
+    return IsingModel(h, J, float(offset))
+
+
+def qubo_to_ising(Q):
+    """
+    Map a symmetric QUBO matrix to Ising form.
+    :param Q: Q matrix (dense or scipy.sparse)
+    :return: IsingModel with H(s) = x^T Q x for x = (1 - s) / 2
+    """
+    if hasattr(Q, 'tocoo'):
+        Q = Q.tocoo()
+        rows, cols, values = Q.row.astype(np.int64), Q.col.astype(np.int64), Q.data.astype(np.float64)
+    else:
+        Q = np.asarray(Q, dtype=np.float64)
+        rows, cols = np.nonzero(Q)
+        values = Q[rows, cols]
+    return _ising_from_entries(Q.shape[0], rows, cols, values)
+
+
+def ising_to_qubo(h, J, offset=0.0):
+    """
+    Reverse mapping from Ising form to a symmetric QUBO.
+    :param h: Local fields
+    :param J: Couplings (i < j), dense or scipy.sparse
+    :param offset: Constant energy offset of the Ising model
+    :return: Tuple (Q as scipy.sparse CSR matrix, QUBO offset) with H(s) = x^T Q x + QUBO offset
+    """
+    h = np.asarray(h, dtype=np.float64)
+    size = h.size
+    J = coo_matrix(J)
+    # Symmetrize: every coupling J_ij s_i s_j contributes Q_ij = Q_ji = 2 J_ij
+    off_rows = np.concatenate([J.row, J.col])
+    off_cols = np.concatenate([J.col, J.row])
+    off_values = np.concatenate([2.0 * J.data, 2.0 * J.data])
+    row_sums = np.bincount(off_rows, weights=off_values, minlength=size)
+    Q_diag = -2.0 * h - row_sums
+
+    rows = np.concatenate([np.arange(size), off_rows])
+    cols = np.concatenate([np.arange(size), off_cols])
+    values = np.concatenate([Q_diag, off_values])
+    Q = coo_matrix((values, (rows, cols)), shape=(size, size)).tocsr()
+
+    qubo_offset = offset - (0.5 * Q_diag.sum() + 0.25 * row_sums.sum())
+    return Q, float(qubo_offset)
+
+
+# Ising models are cached per (n, c, edge digest, lambdas)
+ISING_CACHE_SIZE = 32
+_ising_cache = OrderedDict()
+
+
+def graph_coloring_ising(n, c, edges, lambda1=4.0, lambda2=10.0, lambda3=10.0):
+    """
+    Ising form of the QUBOMatrix graph coloring formulation, built straight from the graph.
+    :param n: Number of nodes
+    :param c: Number of colors
+    :param edges: List of edges in the graph
+    :param lambda1: Penalty for cost function constraints
+    :param lambda2: Penalty for coloring constraints
+    :param lambda3: Penalty for adjacency constraints
+    :return: IsingModel (cached; do not modify in place)
+    """
+    key = (n, c, edge_digest(edges), float(lambda1), float(lambda2), float(lambda3))
+    model = _ising_cache.get(key)
+    if model is None:
+        components = get_qubo_components(n, c, edges)
+        rows, cols, values = components.entries(lambda1, lambda2, lambda3)
+        model = _ising_from_entries(components.num_variables, rows, cols, values)
+        _ising_cache[key] = model
+        if len(_ising_cache) > ISING_CACHE_SIZE:
+            _ising_cache.popitem(last=False)
+    else:
+        _ising_cache.move_to_end(key)
+    return model
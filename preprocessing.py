@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+# preprocessing.py
+import numpy as np
+from qubo_solver import QUBOMatrix, to_dense_qubo
+from dsatur import adjacency_lists
+
+
+def peel_low_degree(neighbors, k):
+    """
+    Repeatedly remove vertices with degree < k (k-core reduction).
+    Any vertex removed this way can be colored greedily with one of k colors afterwards.
+
+    :param neighbors: List of neighbour sets.
+    :param k: Degree threshold, a lower bound on the chromatic number (e.g. a clique size).
+    :return: Tuple (peel_order, core) with the removed vertices in removal order and the set of remaining vertices.
+    """
+    degree = [len(nbrs) for nbrs in neighbors]
+    removed = [False] * len(neighbors)
+    stack = [v for v in range(len(neighbors)) if degree[v] < k]
+    for v in stack:
+        removed[v] = True
+    peel_order = []
+    while stack:
+        v = stack.pop()
+        peel_order.append(v)
+        for u in neighbors[v]:
+            if not removed[u]:
+                degree[u] -= 1
+                if degree[u] < k:
+                    removed[u] = True
+                    stack.append(u)
+    core = {v for v in range(len(neighbors)) if not removed[v]}
+    return peel_order, core
+
+
+def connected_components(neighbors, vertices):
+    """
+    Split the subgraph induced by vertices into connected components.
+
+    :param neighbors: List of neighbour sets.
+    :param vertices: Set of vertices to consider.
+    :return: List of sorted vertex lists, one per component.
+    """
+    seen = set()
+    components = []
+    for start in sorted(vertices):
+        if start in seen:
+            continue
+        seen.add(start)
+        component = [start]
+        frontier = [start]
+        while frontier:
+            v = frontier.pop()
+            for u in neighbors[v]:
+                if u in vertices and u not in seen:
+                    seen.add(u)
+                    component.append(u)
+                    frontier.append(u)
+        components.append(sorted(component))
+    return components
+
+
+def greedy_clique(neighbors, vertices):
+    """
+    Grow a large clique greedily: start from the highest-degree vertex and keep adding the
+    candidate with the most neighbours among the remaining candidates.
+
+    :param neighbors: List of neighbour sets.
+    :param vertices: Set of vertices to search in.
+    :return: List of clique vertices.
+    """
+    if not vertices:
+        return []
+    start = max(sorted(vertices), key=lambda v: len(neighbors[v] & vertices))
+    clique = [start]
+    candidates = neighbors[start] & vertices
+    while candidates:
+        best = max(sorted(candidates), key=lambda v: len(neighbors[v] & candidates))
+        clique.append(best)
+        candidates = candidates & neighbors[best]
+    return clique
+
+
+def reduce_qubo(Q, fixed_indices, fixed_values):
+    """
+    Eliminate fixed binary variables from a QUBO. With F fixed and R free,
+    x^T Q x = x_R^T (Q_RR + diag(2 Q_RF x_F)) x_R + x_F^T Q_FF x_F.
+
+    :param Q: Q matrix (dense or scipy.sparse).
+    :param fixed_indices: Indices of the fixed variables.
+    :param fixed_values: Values (0 or 1) of the fixed variables.
+    :return: Tuple (reduced dense Q, constant offset, free indices).
+    """
+    size = Q.shape[0]
+    fixed_indices = np.asarray(fixed_indices, dtype=np.int64)
+    x_fixed = np.asarray(fixed_values, dtype=np.float64)
+    free = np.setdiff1d(np.arange(size), fixed_indices)
+
+    if hasattr(Q, 'tocsr'):
+        Q = Q.tocsr()
+        Q_rr = Q[free][:, free].toarray()
+        Q_rf = Q[free][:, fixed_indices]
+        Q_ff = Q[fixed_indices][:, fixed_indices]
+    else:
+        Q = np.asarray(Q)
+        Q_rr = Q[np.ix_(free, free)].copy()
+        Q_rf = Q[np.ix_(free, fixed_indices)]
+        Q_ff = Q[np.ix_(fixed_indices, fixed_indices)]
+
+    Q_rr[np.diag_indices_from(Q_rr)] += 2.0 * np.asarray(Q_rf @ x_fixed).ravel()
+    offset = float(x_fixed @ np.asarray(Q_ff @ x_fixed).ravel())
+    return Q_rr, offset, free
+
+
+def decode_coloring(n, c, solution):
+    """
+    Read a node coloring from the x block of a solution vector.
+
+    :param n: Number of nodes.
+    :param c: Number of colors.
+    :param solution: Solution vector (x and y variables).
+    :return: Array with the color of every node, -1 where a node has no color.
+    """
+    X = np.asarray(solution)[:n * c].reshape(n, c).astype(bool)
+    return np.where(X.any(axis=1), X.argmax(axis=1), -1)
+
+
+def encode_coloring(n, c, colors):
+    """
+    Build a solution vector in the QUBOMatrix variable layout from a node coloring.
+
+    :param n: Number of nodes.
+    :param c: Number of colors.
+    :param colors: Color of every node, -1 for uncolored.
+    :return: Binary solution vector of length n*c + c.
+    """
+    colors = np.asarray(colors, dtype=np.int64)
+    solution = np.zeros(n * c + c, dtype=np.int64)
+    colored = np.flatnonzero((colors >= 0) & (colors < c))
+    solution[colored * c + colors[colored]] = 1
+    solution[n * c + np.unique(colors[colored])] = 1
+    return solution
+
+
+class SubProblem:
+    def __init__(self, nodes, edges, fixed_colors):
+        """
+        Reduced coloring problem for one connected component of the core.
+
+        :param nodes: Original node ids, position = local node id.
+        :param edges: Edges in local node ids.
+        :param fixed_colors: Dictionary mapping local node ids to pre-assigned colors (the clique).
+        """
+        self.nodes = np.asarray(nodes, dtype=np.int64)
+        self.n = len(nodes)
+        self.edges = edges
+        self.fixed_colors = fixed_colors
+
+    def variable_fixings(self, c):
+        """
+        Variables whose value is implied by the clique pre-coloring: all colors of clique
+        nodes, the used y_k, and the clique color on every neighbour of a clique node.
+
+        :param c: Number of colors.
+        :return: Tuple (indices, values).
+        """
+        fixings = {}
+        for v, color in self.fixed_colors.items():
+            for k in range(c):
+                fixings[v * c + k] = 1 if k == color else 0
+            fixings[self.n * c + color] = 1
+        for i, j in self.edges:
+            for a, b in ((i, j), (j, i)):
+                if a in self.fixed_colors and b not in self.fixed_colors:
+                    fixings[b * c + self.fixed_colors[a]] = 0
+        indices = np.array(sorted(fixings), dtype=np.int64)
+        return indices, np.array([fixings[i] for i in indices.tolist()], dtype=np.int64)
+
+    def build_qubo(self, c, lambdas, sparse=True):
+        """
+        Build the QUBO of the component with the fixed variables eliminated.
+
+        :param c: Number of colors.
+        :param lambdas: Tuple (lambda1, lambda2, lambda3).
+        :param sparse: Build the intermediate full Q in sparse format.
+        :return: Tuple (reduced dense Q, constant offset, free indices).
+        """
+        Q = QUBOMatrix(self.n, c, self.edges, *lambdas, sparse=sparse).Q
+        indices, values = self.variable_fixings(c)
+        if indices.size == 0:
+            return to_dense_qubo(Q), 0.0, np.arange(Q.shape[0])
+        return reduce_qubo(Q, indices, values)
+
+    def expand(self, c, free_indices, reduced_solution):
+        """
+        Map a solution of the reduced QUBO back to the component's full variable layout.
+
+        :return: Binary solution vector of length n_local*c + c.
+        """
+        solution = np.zeros(self.n * c + c, dtype=np.int64)
+        indices, values = self.variable_fixings(c)
+        solution[indices] = values
+        solution[free_indices] = np.asarray(reduced_solution, dtype=np.int64)[:len(free_indices)]
+        return solution
+
+
+class ColoringPreprocessor:
+    def __init__(self, n, c, edges, peel=True, split_components=True, fix_clique=True):
+        """
+        Reduce a graph coloring instance before QUBO construction.
+
+        :param n: Number of nodes.
+        :param c: Number of colors.
+        :param edges: List of edges.
+        :param peel: Remove vertices of degree below the greedy clique size and re-insert them
+                     greedily afterwards.
+        :param split_components: Solve connected components independently.
+        :param fix_clique: Pre-color a greedy clique in every component to break color symmetry.
+        """
+        self.n = n
+        self.c = c
+        self.neighbors = adjacency_lists(n, edges)
+        # Chromatic lower bound. Peeling against it (not against c) keeps the optimum: a vertex of
+        # degree < lower_bound always finds a free color among the lower_bound colors any coloring uses
+        clique_size = len(greedy_clique(self.neighbors, set(range(n))))
+        self.lower_bound = min(clique_size, c)
+        # A clique larger than c leaves no proper coloring; the reductions only preserve feasible
+        # optima, so the penalized problem is solved unreduced
+        self.infeasible = clique_size > c
+        if self.infeasible:
+            peel, split_components, fix_clique = False, False, False
+
+        if peel:
+            self.peel_order, core = peel_low_degree(self.neighbors, self.lower_bound)
+        else:
+            self.peel_order, core = [], set(range(n))
+
+        if split_components:
+            groups = connected_components(self.neighbors, core)
+        else:
+            groups = [sorted(core)] if core else []
+
+        self.subproblems = []
+        for group in groups:
+            group_set = set(group)
+            local = {v: idx for idx, v in enumerate(group)}
+            local_edges = [(local[v], local[u]) for v in group for u in self.neighbors[v] if u in group_set and v < u]
+            fixed_colors = {}
+            if fix_clique:
+                clique = greedy_clique(self.neighbors, group_set)[:c]
+                fixed_colors = {local[v]: color for color, v in enumerate(clique)}
+            self.subproblems.append(SubProblem(group, local_edges, fixed_colors))
+
+    def num_variables(self):
+        """
+        :return: Tuple (original, reduced) number of binary variables.
+        """
+        reduced = 0
+        for sub in self.subproblems:
+            reduced += sub.n * self.c + self.c - len(sub.variable_fixings(self.c)[0])
+        return self.n * self.c + self.c, reduced
+
+    def reconstruct(self, sub_colorings):
+        """
+        Combine component colorings and greedily re-insert the peeled vertices.
+
+        :param sub_colorings: One local color array per subproblem (see decode_coloring).
+        :return: Array with the color of every original node (-1 where undecided).
+        """
+        colors = np.full(self.n, -1, dtype=np.int64)
+        for sub, local_colors in zip(self.subproblems, sub_colorings):
+            local_colors = np.array(local_colors, dtype=np.int64)
+            colored = local_colors >= 0
+            # Relabel every component onto colors 0..q-1 so components share one palette;
+            # the clique colors 0..|clique|-1 map to themselves
+            local_colors[colored] = np.unique(local_colors[colored], return_inverse=True)[1]
+            colors[sub.nodes] = local_colors
+
+        # Reverse peel order: each vertex sees fewer than lower_bound colored neighbours, so the
+        # smallest free color is below lower_bound and re-insertion never opens a color the
+        # core or the lower bound does not already need
+        for v in reversed(self.peel_order):
+            used = {int(colors[u]) for u in self.neighbors[v] if colors[u] >= 0}
+            color = 0
+            while color in used:
+                color += 1
+            colors[v] = color
+        return colors
+
+    def to_solution(self, colors):
+        """
+        Map a reconstructed coloring to the original QUBOMatrix variable layout.
+
+        :param colors: Color of every original node.
+        :return: Binary solution vector of length n*c + c.
+        """
+        return encode_coloring(self.n, self.c, colors)
@@ -1,14 +1,169 @@
 # -*- coding: utf-8 -*-
 
 import random
+import hashlib
+from collections import OrderedDict
 import numpy as np
 import time
 import os
+import logging
 
+logger = logging.getLogger(__name__)
+
+
+def is_sparse_qubo(Q):
+    """
+    Check whether a Q matrix is stored in a scipy.sparse format.
+    :param Q: Q matrix (numpy array or scipy.sparse matrix)
+    :return: True if Q is sparse, otherwise False
+    """
+    return hasattr(Q, 'tocsr') and hasattr(Q, 'toarray')
+
+
+def to_dense_qubo(Q):
+    """
+    Return a dense numpy view of a Q matrix, converting from scipy.sparse or a matrix-free operator if needed.
+    :param Q: Q matrix (numpy array, scipy.sparse matrix or GraphColoringQUBOOperator)
+    :return: Dense Q matrix as a numpy array
+    """
+    if is_sparse_qubo(Q):
+        return Q.toarray()
+    if isinstance(Q, GraphColoringQUBOOperator):
+        return Q.to_dense()
+    return np.asarray(Q)
+
+
+def qubo_energy(Q, solution):
+    """
+    Evaluate the QUBO objective x^T Q x for a single solution.
+    :param Q: Q matrix (numpy array, scipy.sparse matrix or GraphColoringQUBOOperator)
+    :param solution: Binary solution vector
+    :return: Energy of the solution
+    """
+    x = np.asarray(solution, dtype=np.float64)
+    return float(x @ (Q @ x))
+
+
+def edge_digest(edges):
+    """
+    Hash an edge list so that identical graphs map to the same cache entry.
+    :param edges: List of edges or an (m, 2) array
+    :return: Hex digest string
+    """
+    edge_array = np.ascontiguousarray(np.asarray(edges, dtype=np.int64).reshape(-1, 2))
+    return hashlib.blake2b(edge_array.tobytes(), digest_size=16).hexdigest()
+
+
+class QUBOComponents:
+    def __init__(self, n, c, edges):
+        """
+        Lambda-independent building blocks of Q = Q0 + lambda1*Q1 + lambda2*Q2 + lambda3*Q3.
+        Q0..Q2 depend only on (n, c) and share one set of coordinates; Q3 holds one entry per
+        edge, color and orientation with unit weight.
+        :param n: Number of nodes
+        :param c: Number of colors
+        :param edges: List of edges in the graph, where each edge is a tuple (i, j)
+        """
+        self.n = n
+        self.c = c
+        nc = n * c
+        x_idx = np.arange(nc)
+        y_idx = nc + np.arange(c)
+        y_of_x = nc + np.tile(np.arange(c), n)
+
+        # Constraint 2 cross penalties: all pairs k < k' within each node block
+        k_lo, k_hi = np.triu_indices(c, k=1)
+        node_base = (np.arange(n) * c)[:, None]
+        same_node_a = (node_base + k_lo).ravel()
+        same_node_b = (node_base + k_hi).ravel()
+
+        self.base_rows = np.concatenate([
+            y_idx,                        # Minimize chromatic number: y_k diagonal
+            x_idx,                        # Constraints 1 and 2: x_ik diagonal
+            x_idx, y_of_x,                # Constraint 1: x_ik * y_k cross terms
+            same_node_a, same_node_b,     # Constraint 2: cross penalties
+        ])
+        self.base_cols = np.concatenate([y_idx, x_idx, y_of_x, x_idx, same_node_b, same_node_a])
+        # One row of coefficients per component Q0, Q1, Q2
+        self.base_coefficients = np.zeros((3, self.base_rows.size))
+        self.base_coefficients[0, :c] = 1.0
+        self.base_coefficients[1, c:c + nc] = 1.0
+        self.base_coefficients[2, c:c + nc] = -1.0
+        self.base_coefficients[1, c + nc:c + 3 * nc] = -1.0
+        self.base_coefficients[2, c + 3 * nc:] = 1.0
+
+        self.edge_array = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        self._update_edge_entries()
+
+    def _update_edge_entries(self):
+        # Constraint 3: one copy of every edge per color, in both orientations
+        colors = np.arange(self.c)
+        edge_a = (self.edge_array[:, 0:1] * self.c + colors).ravel()
+        edge_b = (self.edge_array[:, 1:2] * self.c + colors).ravel()
+        self.edge_rows = np.concatenate([edge_a, edge_b])
+        self.edge_cols = np.concatenate([edge_b, edge_a])
+
+    @property
+    def num_variables(self):
+        return self.n * self.c + self.c
+
+    def entries(self, lambda1, lambda2, lambda3):
+        """
+        Coordinate form of Q for the given penalty weights. Duplicate coordinates must be summed.
+        :return: Tuple (rows, cols, values)
+        """
+        base_values = self.base_coefficients.T @ np.array([1.0, lambda1, lambda2], dtype=np.float64)
+        rows = np.concatenate([self.base_rows, self.edge_rows])
+        cols = np.concatenate([self.base_cols, self.edge_cols])
+        values = np.concatenate([base_values, np.full(self.edge_rows.size, float(lambda3))])
+        return rows, cols, values
+
+    def combine(self, lambda1, lambda2, lambda3, sparse=False):
+        """
+        Recombine the cached components into Q for the given penalty weights.
+        :param sparse: If True, return a scipy.sparse CSR matrix
+        :return: Q matrix
+        """
+        size = self.num_variables
+        if sparse:
+            from scipy.sparse import coo_matrix
+            rows, cols, values = self.entries(lambda1, lambda2, lambda3)
+            return coo_matrix((values, (rows, cols)), shape=(size, size)).tocsr()
+
+        Q = np.zeros((size, size))
+        # Base coordinates are unique, so plain assignment is enough
+        Q[self.base_rows, self.base_cols] = self.base_coefficients.T @ np.array([1.0, lambda1, lambda2], dtype=np.float64)
+        np.add.at(Q, (self.edge_rows, self.edge_cols), float(lambda3))
+        return Q
+
+
+# Components are cached per (n, c, edge digest) so lambda sweeps build them once per graph
+COMPONENT_CACHE_SIZE = 32
+_component_cache = OrderedDict()
+
+
+def get_qubo_components(n, c, edges):
+    """
+    Return the cached QUBOComponents of a graph, building them on a cache miss.
+    :param n: Number of nodes
+    :param c: Number of colors
+    :param edges: List of edges in the graph
+    :return: QUBOComponents instance
+    """
+    key = (n, c, edge_digest(edges))
+    components = _component_cache.get(key)
+    if components is None:
+        components = QUBOComponents(n, c, edges)
+        _component_cache[key] = components
+        if len(_component_cache) > COMPONENT_CACHE_SIZE:
+            _component_cache.popitem(last=False)
+    else:
+        _component_cache.move_to_end(key)
+    return components
 
 
 class QUBOMatrix:
-    def __init__(self, n, c, edges, lambda1=4.0, lambda2=10.0, lambda3=10.0):
+    def __init__(self, n, c, edges, lambda1=4.0, lambda2=10.0, lambda3=10.0, sparse=False):
         """
         Initialize the QUBOMatrix class with problem parameters.
         :param n: Number of nodes
@@ -17,6 +172,7 @@ class QUBOMatrix:
         :param lambda1: Penalty for cost function constraints (default: 1.0)
         :param lambda2: Penalty for coloring constraints (default: 10.0)
         :param lambda3: Penalty for adjacency constraints (default: 10.0)
+        :param sparse: If True, store Q as a scipy.sparse CSR matrix instead of a dense array
         """
         self.n = n
         self.c = c
@@ -24,50 +180,406 @@ class QUBOMatrix:
         self.lambda1 = lambda1
         self.lambda2 = lambda2
         self.lambda3 = lambda3
+        self.sparse = sparse
+        self._components = get_qubo_components(n, c, edges)
+        self._owns_edges = False
         self.Q = self.generate_qubo_matrix()
 
-    def generate_qubo_matrix(self):
+    @property
+    def components(self):
+        """
+        Cached QUBOComponents of the current edge set; rebuilt lazily after add_edge / remove_edge.
+        """
+        if self._components is None:
+            self._components = get_qubo_components(self.n, self.c, self.edges)
+        return self._components
+
+    @property
+    def num_variables(self):
+        """
+        Number of binary variables (n*c node-color variables plus c color variables).
+        """
+        return self.n * self.c + self.c
+
+    def qubo_entries(self):
+        """
+        Compute the nonzero entries of Q in coordinate form using numpy index arithmetic.
+        Duplicate coordinates are allowed and must be summed by the consumer.
+        :return: Tuple (rows, cols, values) of equal-length numpy arrays
+        """
+        return self.components.entries(self.lambda1, self.lambda2, self.lambda3)
+
+    def generate_qubo_matrix(self, sparse=None):
         """
         Create the symmetric Q matrix for the QUBO formulation of the graph coloring problem.
-        :return: Q matrix
+        :param sparse: Override the output format; defaults to the value given at construction
+        :return: Q matrix (dense numpy array, or scipy.sparse CSR matrix if sparse)
         """
-        # Initialize the Q matrix
-        Q = np.zeros((self.n * self.c + self.c, self.n * self.c + self.c))
+        if sparse is None:
+            sparse = self.sparse
+        return self.components.combine(self.lambda1, self.lambda2, self.lambda3, sparse=sparse)
 
-        # Minimize chromatic number: Add diagonal entries for y_k
-        for k in range(self.c):
-            idx_yk = self.n * self.c + k
-            Q[idx_yk, idx_yk] += 1.0  # Coefficient to minimize y_k
+    def set_lambdas(self, lambda1=None, lambda2=None, lambda3=None):
+        """
+        Change the penalty weights and recombine Q from the cached components.
+        :return: Updated Q matrix
+        """
+        if lambda1 is not None:
+            self.lambda1 = lambda1
+        if lambda2 is not None:
+            self.lambda2 = lambda2
+        if lambda3 is not None:
+            self.lambda3 = lambda3
+        self.Q = self.generate_qubo_matrix()
+        return self.Q
 
-        # Constraint 1: Ensure y_k >= x_ik
-        for i in range(self.n):
-            for k in range(self.c):
-                idx = i * self.c + k
-                idx_yk = self.n * self.c + k
-                Q[idx, idx] += self.lambda1  # x_ik^2 term
-                Q[idx, idx_yk] -= self.lambda1  # x_ik * y_k cross term
-                Q[idx_yk, idx] -= self.lambda1  # Symmetry for cross term
+    def _update_edge(self, i, j, sign):
+        colors = np.arange(self.c)
+        rows = np.concatenate([i * self.c + colors, j * self.c + colors])
+        cols = np.concatenate([j * self.c + colors, i * self.c + colors])
+        if self.sparse:
+            from scipy.sparse import coo_matrix
+            delta = coo_matrix((np.full(rows.size, sign * float(self.lambda3)), (rows, cols)), shape=self.Q.shape)
+            self.Q = (self.Q + delta).tocsr()
+        else:
+            np.add.at(self.Q, (rows, cols), sign * float(self.lambda3))
 
-        # Constraint 2: Each node must have exactly one color
-        for i in range(self.n):
-            for k in range(self.c):
-                idx = i * self.c + k
-                Q[idx, idx] -= self.lambda2  # Penalty for x_ik
-                for k_prime in range(k + 1, self.c):
-                    idx_prime = i * self.c + k_prime
-                    Q[idx, idx_prime] += self.lambda2  # Cross penalty
-                    Q[idx_prime, idx] += self.lambda2  # Symmetry for cross term
+    def _edge_list(self):
+        # Private copy of the edge list, made on the first edit so the caller's list is never mutated
+        if not self._owns_edges:
+            self.edges = [tuple(edge) for edge in np.asarray(self.edges).reshape(-1, 2).tolist()]
+            self._owns_edges = True
+        return self.edges
 
-        # Constraint 3: Adjacent nodes must have different colors
-        for (i, j) in self.edges:
-            for k in range(self.c):
-                idx_i = i * self.c + k
-                idx_j = j * self.c + k
-                Q[idx_i, idx_j] += self.lambda3  # Penalty for adjacent nodes
-                Q[idx_j, idx_i] += self.lambda3  # Symmetry for cross term
+    def add_edge(self, i, j):
+        """
+        Insert an edge and update the c entries of (i, j) in Q, O(c) for dense Q, without rebuilding it.
+        The components are rebuilt lazily, on the next recombination (e.g. set_lambdas).
+        :param i: First node
+        :param j: Second node
+        """
+        self._edge_list().append((i, j))
+        self._components = None
+        self._update_edge(i, j, 1.0)
+
+    def remove_edge(self, i, j):
+        """
+        Delete an edge and update the c entries of (i, j) in Q, O(c) for dense Q, without rebuilding it.
+        Finding the edge scans the edge list; the components are rebuilt lazily as in add_edge.
+        :param i: First node
+        :param j: Second node
+        """
+        edges = self._edge_list()
+        if (i, j) in edges:
+            edges.remove((i, j))
+        elif (j, i) in edges:
+            edges.remove((j, i))
+        else:
+            raise ValueError(f'Edge ({i}, {j}) is not in the graph.')
+        self._components = None
+        self._update_edge(i, j, -1.0)
+
+
+
+
+class KColoringComponents:
+    def __init__(self, n, edges, max_k=1):
+        """
+        k-independent building blocks of the decision QUBOs of one graph, shared by every k.
+        One-hot pairs and edge copies are laid out color by color up to max_k, so the entries
+        for any k <= max_k are prefixes of these arrays; only the variable index i*k + color
+        is computed per k.
+        :param n: Number of nodes
+        :param edges: List of edges in the graph
+        :param max_k: Largest number of colors prepared; grows on demand
+        """
+        self.n = n
+        self.edge_array = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        self.max_k = 0
+        self.reserve(max_k)
+
+    def reserve(self, max_k):
+        """
+        Extend the color-major layouts to at least max_k colors.
+        """
+        if max_k <= self.max_k:
+            return
+        # One-hot pairs (k_lo, k_hi) ordered by k_hi: the pairs of k colors are the first k(k-1)/2
+        k_hi, k_lo = np.tril_indices(max_k, k=-1)
+        self.pair_lo, self.pair_hi = k_lo, k_hi
+        # Edge copies ordered by color: the copies for k colors are the first k*|E|
+        self.edge_colors = np.repeat(np.arange(max_k), len(self.edge_array))
+        self.edge_a = np.tile(self.edge_array[:, 0], max_k)
+        self.edge_b = np.tile(self.edge_array[:, 1], max_k)
+        self.max_k = max_k
+
+    def entries(self, k, lambda2, lambda3):
+        """
+        Coordinate form of the k-coloring Q (see KColoringQUBOMatrix). Duplicate coordinates must be summed.
+        :return: Tuple (rows, cols, values)
+        """
+        self.reserve(k)
+        num_pairs = k * (k - 1) // 2
+        num_edges = k * len(self.edge_array)
+        node_base = (np.arange(self.n) * k)[:, None]
+        same_a = (node_base + self.pair_lo[:num_pairs]).ravel()
+        same_b = (node_base + self.pair_hi[:num_pairs]).ravel()
+        colors = self.edge_colors[:num_edges]
+        edge_a = self.edge_a[:num_edges] * k + colors
+        edge_b = self.edge_b[:num_edges] * k + colors
+        x_idx = np.arange(self.n * k)
+        rows = np.concatenate([x_idx, same_a, same_b, edge_a, edge_b])
+        cols = np.concatenate([x_idx, same_b, same_a, edge_b, edge_a])
+        values = np.concatenate([np.full(x_idx.size, -float(lambda2)), np.full(2 * same_a.size, float(lambda2)),
+                                 np.full(2 * edge_a.size, float(lambda3))])
+        return rows, cols, values
+
+
+# Decision-QUBO components are cached per (n, edge digest), so every k of a search shares them
+_k_coloring_cache = OrderedDict()
+
+
+def get_k_coloring_components(n, edges, max_k=1):
+    """
+    Return the cached KColoringComponents of a graph, building them on a cache miss.
+    :param n: Number of nodes
+    :param edges: List of edges in the graph
+    :param max_k: Largest number of colors to prepare for
+    :return: KColoringComponents instance
+    """
+    key = (n, edge_digest(edges))
+    components = _k_coloring_cache.get(key)
+    if components is None:
+        components = KColoringComponents(n, edges, max_k)
+        _k_coloring_cache[key] = components
+        if len(_k_coloring_cache) > COMPONENT_CACHE_SIZE:
+            _k_coloring_cache.popitem(last=False)
+    else:
+        _k_coloring_cache.move_to_end(key)
+        components.reserve(max_k)
+    return components
+
+
+class KColoringQUBOMatrix:
+    def __init__(self, n, k, edges, lambda2=1.0, lambda3=1.0, sparse=False):
+        """
+        Decision version of graph coloring: is the graph k-colorable? Only the n*k variables x_ik
+        are used, with Q = lambda2 * (one color per node) + lambda3 * (adjacent nodes differ).
+        x^T Q x + offset is zero exactly for proper k-colorings and positive otherwise.
+        The entries are derived from the per-graph KColoringComponents, so the probes of a k search
+        share one edge and one-hot layout.
+        :param n: Number of nodes
+        :param k: Number of colors
+        :param edges: List of edges in the graph
+        :param lambda2: Penalty for coloring constraints
+        :param lambda3: Penalty for adjacency constraints
+        :param sparse: If True, store Q as a scipy.sparse CSR matrix instead of a dense array
+        """
+        self.n = n
+        self.k = k
+        self.edges = edges
+        self.lambda2 = lambda2
+        self.lambda3 = lambda3
+        self.sparse = sparse
+        self.components = get_k_coloring_components(n, edges, k)
+        # (1 - sum_k x_ik)^2 = 1 - sum_k x_ik + 2 sum_{k<k'} x_ik x_ik'
+        self.offset = float(n * lambda2)
+        self.Q = self.generate_qubo_matrix()
+
+    @property
+    def num_variables(self):
+        return self.n * self.k
 
+    def generate_qubo_matrix(self, sparse=None):
+        """
+        :param sparse: Override the output format; defaults to the value given at construction
+        :return: Q matrix over the x variables
+        """
+        if sparse is None:
+            sparse = self.sparse
+        size = self.num_variables
+        rows, cols, values = self.components.entries(self.k, self.lambda2, self.lambda3)
+        if sparse:
+            from scipy.sparse import coo_matrix
+            return coo_matrix((values, (rows, cols)), shape=(size, size)).tocsr()
+        Q = np.zeros((size, size))
+        np.add.at(Q, (rows, cols), values)
         return Q
 
+    def energy(self, solution):
+        """
+        :param solution: Binary vector of the n*k x variables
+        :return: x^T Q x + offset, zero for a proper k-coloring
+        """
+        return qubo_energy(self.Q, solution) + self.offset
+
+
+class GraphColoringQUBOOperator:
+    def __init__(self, n, c, edges, lambda1=4.0, lambda2=10.0, lambda3=10.0):
+        """
+        Matrix-free representation of the graph coloring Q matrix built by QUBOMatrix.
+        Only the edge list is stored, so memory is O(n*c + |E|) instead of O((n*c + c)^2).
+        :param n: Number of nodes
+        :param c: Number of colors
+        :param edges: List of edges in the graph, where each edge is a tuple (i, j)
+        :param lambda1: Penalty for cost function constraints
+        :param lambda2: Penalty for coloring constraints
+        :param lambda3: Penalty for adjacency constraints
+        """
+        self.n = n
+        self.c = c
+        edge_array = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        self.edge_i = edge_array[:, 0].copy()
+        self.edge_j = edge_array[:, 1].copy()
+        self.lambda1 = lambda1
+        self.lambda2 = lambda2
+        self.lambda3 = lambda3
+
+        # Neighbour lists in CSR layout for O(degree) single-flip updates
+        heads = np.concatenate([self.edge_i, self.edge_j])
+        tails = np.concatenate([self.edge_j, self.edge_i])
+        order = np.argsort(heads, kind='stable')
+        self.neighbors = tails[order]
+        self.neighbor_ptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(heads, minlength=n), out=self.neighbor_ptr[1:])
+
+    @property
+    def num_variables(self):
+        """
+        Number of binary variables (n*c node-color variables plus c color variables).
+        """
+        return self.n * self.c + self.c
+
+    @property
+    def shape(self):
+        """
+        Shape of the equivalent Q matrix.
+        """
+        return (self.num_variables, self.num_variables)
+
+    @property
+    def edges(self):
+        """
+        Edge list as a list of (i, j) tuples.
+        """
+        return list(zip(self.edge_i.tolist(), self.edge_j.tolist()))
+
+    def _split(self, v):
+        """
+        Split a (batch of) vector(s) into the x block of shape (m, n, c) and the y block of shape (m, c).
+        """
+        v = np.asarray(v, dtype=np.float64)
+        batch = np.atleast_2d(v)
+        if batch.shape[-1] != self.num_variables:
+            raise ValueError(f'Expected vectors of length {self.num_variables}, got {batch.shape[-1]}.')
+        X = batch[:, :self.n * self.c].reshape(-1, self.n, self.c)
+        Y = batch[:, self.n * self.c:]
+        return X, Y, v.ndim == 1
+
+    def diagonal(self):
+        """
+        Diagonal of Q.
+        :return: numpy array of length n*c + c
+        """
+        x_diag = np.full((self.n, self.c), float(self.lambda1 - self.lambda2))
+        self_loops = self.edge_i[self.edge_i == self.edge_j]
+        if self_loops.size:
+            x_diag += 2.0 * self.lambda3 * np.bincount(self_loops, minlength=self.n)[:, None]
+        return np.concatenate([x_diag.ravel(), np.ones(self.c)])
+
+    def matvec(self, v):
+        """
+        Compute Q v without forming Q.
+        :param v: Vector of length n*c + c, or a 2-D array with one vector per row
+        :return: Q v with the same shape as v
+        """
+        X, Y, single = self._split(v)
+
+        # Constraint 2: lambda2 * (row sum - own entry) plus the diagonal
+        QX = (self.lambda1 - self.lambda2) * X + self.lambda2 * (X.sum(axis=2, keepdims=True) - X)
+        # Constraint 3: per-color copies of the adjacency matrix
+        neighbor_sum = np.zeros_like(X)
+        np.add.at(neighbor_sum, (slice(None), self.edge_i), X[:, self.edge_j])
+        np.add.at(neighbor_sum, (slice(None), self.edge_j), X[:, self.edge_i])
+        QX += self.lambda3 * neighbor_sum
+        # Constraint 1: x_ik * y_k coupling
+        QX -= self.lambda1 * Y[:, None, :]
+        QY = Y - self.lambda1 * X.sum(axis=1)
+
+        out = np.concatenate([QX.reshape(X.shape[0], -1), QY], axis=1)
+        return out[0] if single else out
+
+    def __matmul__(self, v):
+        return self.matvec(v)
+
+    def energy(self, solution):
+        """
+        Evaluate the QUBO objective x^T Q x.
+        :param solution: Binary vector of length n*c + c, or a 2-D array with one solution per row
+        :return: Energy (float), or an array of energies for a batch
+        """
+        x = np.asarray(solution, dtype=np.float64)
+        return np.sum(x * self.matvec(x), axis=-1)
+
+    def local_fields(self, solution):
+        """
+        Compute the local field of every variable, i.e. the energy change of setting it from 0 to 1
+        with all other variables held fixed.
+        :param solution: Binary vector of length n*c + c, or a 2-D array with one solution per row
+        :return: Local fields with the same shape as solution
+        """
+        x = np.asarray(solution, dtype=np.float64)
+        diag = self.diagonal()
+        return diag + 2.0 * (self.matvec(x) - diag * x)
+
+    def delta_energy(self, solution, index=None):
+        """
+        Energy change caused by flipping single variables.
+        :param solution: Binary solution vector of length n*c + c
+        :param index: Variable to flip; if None, return the deltas for all variables
+        :return: Energy change (float) or an array of energy changes
+        """
+        x = np.asarray(solution, dtype=np.float64)
+        if index is None:
+            return (1.0 - 2.0 * x) * self.local_fields(x)
+
+        nc = self.n * self.c
+        if index < nc:
+            i, k = divmod(index, self.c)
+            node_colors = x[i * self.c:(i + 1) * self.c]
+            nbrs = self.neighbors[self.neighbor_ptr[i]:self.neighbor_ptr[i + 1]]
+            # A self-loop appears twice in the neighbour list and lands on the diagonal
+            self_loop = nbrs == i
+            diag = self.lambda1 - self.lambda2 + self.lambda3 * np.count_nonzero(self_loop)
+            coupling = (self.lambda2 * (node_colors.sum() - x[index])
+                        + self.lambda3 * x[nbrs[~self_loop] * self.c + k].sum()
+                        - self.lambda1 * x[nc + k])
+        else:
+            k = index - nc
+            diag = 1.0
+            coupling = -self.lambda1 * x[k:nc:self.c].sum()
+        return float((1.0 - 2.0 * x[index]) * (diag + 2.0 * coupling))
+
+    def to_qubo_matrix(self, sparse=False):
+        """
+        Materialize the equivalent QUBOMatrix.
+        :param sparse: If True, the resulting Q is a scipy.sparse CSR matrix
+        :return: QUBOMatrix instance
+        """
+        return QUBOMatrix(self.n, self.c, self.edges, self.lambda1, self.lambda2, self.lambda3, sparse=sparse)
+
+    def to_dense(self):
+        """
+        :return: Dense Q matrix as a numpy array
+        """
+        return self.to_qubo_matrix(sparse=False).Q
+
+    def to_sparse(self):
+        """
+        :return: Q matrix as a scipy.sparse CSR matrix
+        """
+        return self.to_qubo_matrix(sparse=True).Q
+
 
 
 
@@ -102,7 +614,7 @@ class QUBOValidator:
                 #tot_cons += 1
                 idx = i * self.c + k
                 if self.x[idx] == 1 and self.y[k] == 0:
-                    print(f"Constraint 1 violated: y[{k}] < x[{i},{k}]")
+                    logger.debug("Constraint 1 violated: y[%d] < x[%d,%d]", k, i, k)
                 # else:
                 #     #tot_sat += 1
                     return False
@@ -111,7 +623,7 @@ class QUBOValidator:
         for i in range(self.n):
             color_sum = sum(self.x[i * self.c + k] for k in range(self.c))
             if color_sum != 1:
-                print(f"Constraint 2 violated: Node {i} has {color_sum} colors assigned.")
+                logger.debug("Constraint 2 violated: Node %d has %d colors assigned.", i, color_sum)
                 return False
 
         # Check Constraint 3: Adjacent nodes must have different colors
@@ -120,10 +632,10 @@ class QUBOValidator:
                 idx_i = i * self.c + k
                 idx_j = j * self.c + k
                 if self.x[idx_i] == 1 and self.x[idx_j] == 1:
-                    print(f"Constraint 3 violated: Nodes {i} and {j} share color {k}.")
+                    logger.debug("Constraint 3 violated: Nodes %d and %d share color %d.", i, j, k)
                     return False
 
-        print("All constraints satisfied.")
+        logger.debug("All constraints satisfied.")
         
         return True
 
@@ -135,18 +647,117 @@ class QUBOValidator:
         """
         if strict_validation:
             if not self.validate_constraints():
-                print("Chromatic number cannot be computed because constraints are not satisfied.")
+                logger.info("Chromatic number cannot be computed because constraints are not satisfied.")
                 return None
         else:
             # Optionally print violated constraints without enforcing them
             if not self.validate_constraints():
-                print("Warning: Constraints are violated, but chromatic number will still be computed.")
+                logger.info("Constraints are violated, but chromatic number will still be computed.")
 
         # Compute the chromatic number
         chromatic_number = sum(self.y)
         if not strict_validation:
-            print("Warning: Chromatic number computed without strict constraint validation.")
+            logger.debug("Chromatic number computed without strict constraint validation.")
 
-        print(f"Chromatic Number: {chromatic_number}")
+        logger.info("Chromatic Number: %s", chromatic_number)
         
         return chromatic_number
+
+    def compute_energy(self, Q):
+        """
+        Compute the QUBO objective x^T Q x of the solution.
+        :param Q: Q matrix (dense numpy array or scipy.sparse matrix)
+        :return: Energy of the solution
+        """
+        return qubo_energy(Q, self.solution)
+
+
+
+
+class BatchQUBOValidator:
+    def __init__(self, n, c, edges, Q=None, chunk_size=1024):
+        """
+        Vectorized validator for many candidate solutions at once. Nothing is printed.
+        :param n: Number of nodes
+        :param c: Number of colors
+        :param edges: List of edges in the graph
+        :param Q: Optional Q matrix (dense, scipy.sparse or GraphColoringQUBOOperator) used to compute energies
+        :param chunk_size: Number of samples processed per vectorized step, bounds peak memory
+        """
+        self.n = n
+        self.c = c
+        self.edges = edges
+        self.Q = Q
+        self.chunk_size = chunk_size
+        edge_array = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        self.edge_i = edge_array[:, 0]
+        self.edge_j = edge_array[:, 1]
+
+    def validate(self, solutions):
+        """
+        Validate a batch of solutions.
+        :param solutions: 2-D array of shape (samples, n*c + c), or a list of solution vectors
+        :return: Dictionary of per-sample numpy arrays with keys 'constraint1_violations',
+                 'constraint2_violations', 'constraint3_violations', 'feasible', 'chromatic_number',
+                 'colors_used' and 'energy' (NaN if no Q matrix was given)
+        """
+        S = np.atleast_2d(np.asarray(solutions))
+        num_variables = self.n * self.c + self.c
+        if S.shape[1] != num_variables:
+            raise ValueError(f'Expected solutions of length {num_variables}, got {S.shape[1]}.')
+        S = S.astype(bool)
+
+        num_samples = S.shape[0]
+        report = {
+            'constraint1_violations': np.zeros(num_samples, dtype=np.int64),
+            'constraint2_violations': np.zeros(num_samples, dtype=np.int64),
+            'constraint3_violations': np.zeros(num_samples, dtype=np.int64),
+            'chromatic_number': np.zeros(num_samples, dtype=np.int64),
+            'colors_used': np.zeros(num_samples, dtype=np.int64),
+            'energy': np.full(num_samples, np.nan),
+        }
+
+        for start in range(0, num_samples, self.chunk_size):
+            block = slice(start, start + self.chunk_size)
+            chunk = S[block]
+            X = chunk[:, :self.n * self.c].reshape(-1, self.n, self.c)
+            Y = chunk[:, self.n * self.c:]
+
+            # Constraint 1: y_k >= x_ik
+            report['constraint1_violations'][block] = np.count_nonzero(X & ~Y[:, None, :], axis=(1, 2))
+            # Constraint 2: each node must have exactly one color
+            report['constraint2_violations'][block] = np.count_nonzero(X.sum(axis=2) != 1, axis=1)
+            # Constraint 3: adjacent nodes must have different colors
+            report['constraint3_violations'][block] = np.count_nonzero(
+                X[:, self.edge_i] & X[:, self.edge_j], axis=(1, 2))
+
+            report['chromatic_number'][block] = Y.sum(axis=1)
+            report['colors_used'][block] = np.count_nonzero(X.any(axis=1), axis=1)
+
+            if self.Q is not None:
+                Xf = chunk.astype(np.float64)
+                if isinstance(self.Q, GraphColoringQUBOOperator):
+                    QX = self.Q.matvec(Xf)
+                else:
+                    QX = np.asarray(self.Q @ Xf.T).T
+                report['energy'][block] = np.sum(Xf * QX, axis=1)
+
+        report['feasible'] = ((report['constraint1_violations'] == 0)
+                              & (report['constraint2_violations'] == 0)
+                              & (report['constraint3_violations'] == 0))
+        return report
+
+    def best_feasible_index(self, report):
+        """
+        Pick the best feasible sample from a validation report: lowest energy if available,
+        otherwise lowest chromatic number.
+        :param report: Dictionary returned by validate
+        :return: Index of the best feasible sample, or None if no sample is feasible
+        """
+        feasible = np.flatnonzero(report['feasible'])
+        if feasible.size == 0:
+            return None
+        energy = report['energy'][feasible]
+        if not np.all(np.isnan(energy)):
+            return int(feasible[np.nanargmin(energy)])
+        return int(feasible[np.argmin(report['chromatic_number'][feasible])])
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# repair.py
+import numpy as np
+from dsatur import adjacency_lists
+from preprocessing import decode_coloring, encode_coloring
+
+
+def coloring_conflicts(colors, edges):
+    """
+    Find the edges whose endpoints share a color.
+
+    :param colors: Color of every node, -1 for uncolored.
+    :param edges: (m, 2) edge array.
+    :return: Boolean mask over the edges.
+    """
+    colors = np.asarray(colors)
+    if len(edges) == 0:
+        return np.zeros(0, dtype=bool)
+    first, second = colors[edges[:, 0]], colors[edges[:, 1]]
+    return (first == second) & (first >= 0) & (edges[:, 0] != edges[:, 1])
+
+
+def uncolor_conflicts(colors, edges):
+    """
+    Uncolor one endpoint of every conflicting edge, the one with more conflicts (ties: the larger
+    index), so the remaining partial coloring is proper.
+
+    :return: Copy of colors with the conflicted nodes set to -1.
+    """
+    colors = np.array(colors, dtype=np.int64)
+    conflicts = coloring_conflicts(colors, edges)
+    if not conflicts.any():
+        return colors
+    bad = edges[conflicts]
+    degree = np.bincount(bad.ravel(), minlength=colors.size)
+    u, v = bad[:, 0], bad[:, 1]
+    drop = np.where((degree[u] > degree[v]) | ((degree[u] == degree[v]) & (u > v)), u, v)
+    # Every conflicting edge loses at least one endpoint, so no conflict survives
+    colors[drop] = -1
+    return colors
+
+
+class ColoringRepair:
+    def __init__(self, n, c, edges, max_kempe_attempts=64):
+        """
+        Post-solve repair of graph colorings read from QUBO solutions. Conflicted and uncolored
+        nodes are recolored greedily from the colors already in use; when none is free, a Kempe
+        chain swap tries to free one before a new color is opened.
+
+        :param n: Number of nodes.
+        :param c: Number of colors of the QUBO.
+        :param edges: List of edges in the graph.
+        :param max_kempe_attempts: Maximum number of Kempe chain swaps tried per node.
+        """
+        self.n = n
+        self.c = c
+        self.edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        self.neighbors = [np.fromiter(sorted(adjacent), dtype=np.int64, count=len(adjacent))
+                          for adjacent in adjacency_lists(n, self.edges)]
+        self.max_kempe_attempts = max_kempe_attempts
+
+    def _kempe_chain(self, colors, start, a, b):
+        """
+        Nodes reachable from start through nodes colored a or b.
+        """
+        chain = {start}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for neighbor in self.neighbors[node]:
+                if neighbor not in chain and colors[neighbor] in (a, b):
+                    chain.add(neighbor)
+                    stack.append(neighbor)
+        return chain
+
+    def _kempe_free(self, colors, node, palette):
+        """
+        Try to free a palette color at node by swapping Kempe chains.
+
+        :return: The freed color, or None.
+        """
+        adjacent = colors[self.neighbors[node]]
+        attempts = 0
+        for a in palette:
+            a_neighbors = self.neighbors[node][adjacent == a]
+            for b in palette:
+                if b == a:
+                    continue
+                if attempts >= self.max_kempe_attempts:
+                    return None
+                attempts += 1
+                b_neighbors = set(self.neighbors[node][adjacent == b].tolist())
+                chains = set()
+                for start in a_neighbors.tolist():
+                    chains |= self._kempe_chain(colors, start, a, b)
+                if chains & b_neighbors:
+                    continue
+                # Swapping a and b on the chains removes a from the neighbourhood of node
+                chain = np.fromiter(chains, dtype=np.int64, count=len(chains))
+                colors[chain] = np.where(colors[chain] == a, b, a)
+                return a
+        return None
+
+    def repair_colors(self, colors):
+        """
+        Turn a partial or conflicting coloring into a proper one.
+
+        :param colors: Color of every node, -1 for uncolored.
+        :return: Tuple (proper coloring, number of nodes that were recolored).
+        """
+        colors = uncolor_conflicts(colors, self.edges)
+        uncolored = np.flatnonzero(colors < 0)
+        palette = sorted(set(colors[colors >= 0].tolist()))
+
+        # Most constrained nodes first: most distinct neighbour colors, then highest degree
+        saturation = np.array([np.unique(colors[self.neighbors[node]][colors[self.neighbors[node]] >= 0]).size
+                               for node in uncolored], dtype=np.int64)
+        degree = np.array([self.neighbors[node].size for node in uncolored], dtype=np.int64)
+        order = uncolored[np.lexsort((uncolored, -degree, -saturation))]
+
+        for node in order.tolist():
+            used = set(colors[self.neighbors[node]].tolist())
+            free = [color for color in palette if color not in used]
+            if free:
+                colors[node] = free[0]
+                continue
+            freed = self._kempe_free(colors, node, palette) if palette else None
+            if freed is not None:
+                colors[node] = freed
+                continue
+            # Open the smallest color that is not in use yet
+            new_color = next(color for color in range(len(palette) + 1) if color not in palette)
+            palette = sorted(palette + [new_color])
+            colors[node] = new_color
+        return colors, int(uncolored.size)
+
+    def repair(self, solution):
+        """
+        Repair a solution vector.
+
+        :param solution: Solution vector (x and y variables).
+        :return: Dictionary with the raw feasibility and chromatic number (sum of y), the repaired
+                 coloring, its solution vector with consistent y (None if it needs more than c colors),
+                 the repaired chromatic number and the number of recolored nodes.
+        """
+        solution = np.asarray(solution, dtype=np.int64)
+        X = solution[:self.n * self.c].reshape(self.n, self.c)
+        y = solution[self.n * self.c:]
+        colors = decode_coloring(self.n, self.c, solution)
+        raw_feasible = bool(np.all(X.sum(axis=1) == 1) and np.all(X <= y) and not coloring_conflicts(colors, self.edges).any())
+
+        repaired, recolored = self.repair_colors(colors)
+        num_colors = int(np.unique(repaired).size)
+        return {
+            'raw_feasible': raw_feasible,
+            'raw_chromatic_number': int(y.sum()),
+            'colors': repaired,
+            'solution': encode_coloring(self.n, self.c, repaired) if repaired.max(initial=-1) < self.c else None,
+            'chromatic_number': num_colors,
+            'recolored': recolored,
+        }
+
+
+def repair_solution(n, c, edges, solution, max_kempe_attempts=64):
+    """
+    Repair one QUBO solution, see ColoringRepair.repair.
+    """
+    return ColoringRepair(n, c, edges, max_kempe_attempts).repair(solution)
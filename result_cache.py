@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# result_cache.py
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.path.join('graph_instances', 'result_cache.sqlite')
+DEFAULT_MAX_ENTRIES = 100000
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    params TEXT NOT NULL,
+    cost REAL,
+    chromatic_number INTEGER,
+    color_count INTEGER,
+    num_variables INTEGER NOT NULL,
+    solution BLOB NOT NULL,
+    time_to_solution REAL,
+    wall_time REAL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+)
+'''
+
+
+def canonical_edges(edges):
+    """
+    Orient every edge as (min, max) and sort the list so equal graphs hash equally.
+
+    :param edges: List of edges or an (m, 2) array.
+    :return: Sorted int64 array of shape (m, 2).
+    """
+    edge_array = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    edge_array = np.sort(edge_array, axis=1)
+    order = np.lexsort((edge_array[:, 1], edge_array[:, 0]))
+    return np.ascontiguousarray(edge_array[order])
+
+
+def result_key(n, c, edges, params):
+    """
+    Content address of a solver run.
+
+    :param n: Number of nodes.
+    :param c: Number of colors passed to run_simulation.
+    :param edges: List of edges in the graph.
+    :param params: JSON-serializable dictionary with every setting that changes the result
+                   (lambdas, bond dimension, transverse field ratio, backend, ...).
+    :return: Tuple (hex key, canonical parameter string).
+    """
+    canonical = json.dumps(dict(params, n=int(n), c=int(c)), sort_keys=True, default=str)
+    digest = hashlib.sha256(canonical.encode())
+    digest.update(canonical_edges(edges).tobytes())
+    return digest.hexdigest(), canonical
+
+
+class ResultCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Persistent SQLite cache of solver results, keyed by result_key. The least recently
+        used entries are evicted once more than max_entries results are stored. The
+        database runs in WAL mode, so several sweep workers can share one file.
+
+        :param path: SQLite database file; parent directories are created.
+        :param max_entries: Maximum number of stored results (None for no limit).
+        """
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = None
+
+    @property
+    def connection(self):
+        # Opened lazily so a cache object can be passed to worker processes before use
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=60.0)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(_SCHEMA)
+            self._connection.execute('CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)')
+            self._connection.commit()
+        return self._connection
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_connection'] = None
+        return state
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def __contains__(self, key):
+        return self.connection.execute('SELECT 1 FROM results WHERE key = ?', (key,)).fetchone() is not None
+
+    def get(self, key):
+        """
+        Look up a result and mark it as recently used.
+
+        :param key: Key from result_key.
+        :return: Dictionary with cost, chromatic_number, color_count, solution, time_to_solution
+                 and wall_time, or None on a miss.
+        """
+        row = self.connection.execute(
+            'SELECT cost, chromatic_number, color_count, num_variables, solution, time_to_solution, wall_time '
+            'FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        with self.connection:
+            self.connection.execute('UPDATE results SET last_access = ? WHERE key = ?', (time.time(), key))
+        cost, chromatic_number, color_count, num_variables, solution, time_to_solution, wall_time = row
+        bits = np.unpackbits(np.frombuffer(solution, dtype=np.uint8), count=num_variables).astype(np.int64)
+        return {
+            'cost': cost,
+            'chromatic_number': chromatic_number,
+            'color_count': color_count,
+            'solution': bits,
+            'time_to_solution': time_to_solution,
+            'wall_time': wall_time,
+        }
+
+    def put(self, key, params, cost, chromatic_number, solution, time_to_solution, wall_time=None, color_count=None):
+        """
+        Store a result and evict the least recently used entries beyond max_entries.
+
+        :param key: Key from result_key.
+        :param params: Canonical parameter string from result_key (kept for inspection).
+        :param solution: Binary solution vector; stored bit-packed.
+        """
+        bits = np.asarray(solution, dtype=np.uint8).ravel()
+        now = time.time()
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, params,
+                 None if cost is None else float(cost),
+                 None if chromatic_number is None else int(chromatic_number),
+                 None if color_count is None else int(color_count),
+                 int(bits.size), np.packbits(bits).tobytes(),
+                 None if time_to_solution is None else float(time_to_solution),
+                 None if wall_time is None else float(wall_time),
+                 now, now))
+            if self.max_entries is not None:
+                self.connection.execute(
+                    'DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_access DESC '
+                    'LIMIT -1 OFFSET ?)', (int(self.max_entries),))
+
+    def clear(self):
+        with self.connection:
+            self.connection.execute('DELETE FROM results')
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
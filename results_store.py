@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+# results_store.py
+import os
+import glob
+import time
+import itertools
+import numpy as np
+
+DEFAULT_RESULTS_DIR = os.path.join('plots', 'results')
+
+# Column name, dtype and the value stored for missing entries. NaN lambdas stand for the
+# n-scaled defaults of QUBOSimulation.resolve_lambdas.
+COLUMNS = (
+    ('n', np.int32, -1),
+    ('c', np.int32, -1),
+    ('instance', np.int32, -1),
+    ('backend', 'U16', ''),
+    ('max_bond_dimension', np.int32, -1),
+    ('transverse_field_ratio', np.float64, np.nan),
+    ('lambda1', np.float64, np.nan),
+    ('lambda2', np.float64, np.nan),
+    ('lambda3', np.float64, np.nan),
+    ('cost', np.float64, np.nan),
+    ('chromatic_number', np.int32, -1),
+    ('color_count', np.int32, -1),
+    ('feasible', np.bool_, False),
+    ('cache_hit', np.bool_, False),
+    ('time_to_solution', np.float64, np.nan),
+    ('wall_time', np.float64, np.nan),
+    ('timestamp', np.float64, np.nan),
+    ('status', 'U8', ''),
+)
+COLUMN_NAMES = tuple(name for name, _, _ in COLUMNS)
+# Fill values that mean "missing"; boolean columns have no missing state
+MISSING = {name: fill for name, dtype, fill in COLUMNS if dtype is not np.bool_}
+
+STATISTICS = ('mean', 'std', 'min', 'max', 'sum', 'count')
+
+# Process-wide sequence number, part of every shard name
+_sequence = itertools.count()
+
+
+def missing_mask(name, column):
+    """
+    :param name: Column name.
+    :param column: Values of that column.
+    :return: Boolean mask of the entries holding the column's missing value (-1, NaN or '').
+    """
+    if name not in MISSING:
+        return np.zeros(column.shape, dtype=bool)
+    fill = MISSING[name]
+    if isinstance(fill, float) and np.isnan(fill):
+        return np.isnan(column)
+    return column == fill
+
+
+def have_parquet():
+    """
+    :return: True if pyarrow is installed, so shards can be written as Parquet.
+    """
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def records_to_columns(records):
+    """
+    Convert result records (dictionaries as written by sweep.ParameterSweep) to columns.
+
+    :param records: Iterable of dictionaries. 'lambdas' is split into lambda1..lambda3 and a missing
+                    backend is the default 'tn'; unknown keys are ignored, missing ones get the fill value.
+    :return: Dictionary mapping every column name to a numpy array.
+    """
+    rows = []
+    now = time.time()
+    for record in records:
+        row = dict(record)
+        lambdas = row.pop('lambdas', None)
+        if lambdas is not None:
+            row['lambda1'], row['lambda2'], row['lambda3'] = lambdas
+        if row.get('backend') is None:
+            row['backend'] = 'tn'
+        if row.get('timestamp') is None:
+            row['timestamp'] = now
+        rows.append(row)
+    columns = {}
+    for name, dtype, fill in COLUMNS:
+        values = [row.get(name) for row in rows]
+        columns[name] = np.array([fill if value is None else value for value in values], dtype=dtype)
+    return columns
+
+
+class ResultsStore:
+    def __init__(self, directory=DEFAULT_RESULTS_DIR, file_format=None):
+        """
+        Append-only columnar store with one row per solve. Every append writes a new immutable shard
+        (an .npz file, or .parquet when pyarrow is installed) under a name unique to the process, and
+        shards only become visible through an atomic rename, so any number of workers can append to
+        the same directory without locks. Reads concatenate the shards; loaded shards are cached.
+
+        :param directory: Directory holding the shards; created if needed.
+        :param file_format: 'npz' or 'parquet'; default: parquet if pyarrow is installed, npz otherwise.
+        """
+        if file_format is None:
+            file_format = 'parquet' if have_parquet() else 'npz'
+        if file_format not in ('npz', 'parquet'):
+            raise ValueError(f"Unknown file format '{file_format}', expected 'npz' or 'parquet'.")
+        self.directory = directory
+        self.file_format = file_format
+        os.makedirs(directory, exist_ok=True)
+        self._shards = {}
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_shards'] = {}
+        return state
+
+    def __len__(self):
+        return int(self.load(['n'])['n'].size)
+
+    def shard_paths(self):
+        """
+        Sorted paths of all visible shards (both formats).
+        """
+        paths = glob.glob(os.path.join(self.directory, '*.npz')) + glob.glob(os.path.join(self.directory, '*.parquet'))
+        return sorted(paths, key=os.path.basename)
+
+    def _new_path(self):
+        name = f'shard-{time.time_ns():020d}-{os.getpid()}-{next(_sequence):06d}.{self.file_format}'
+        return os.path.join(self.directory, name)
+
+    def _write(self, columns, sources=None):
+        path = self._new_path()
+        temporary = path + '.tmp'
+        if self.file_format == 'parquet':
+            import pyarrow
+            import pyarrow.parquet
+            metadata = {'sources': '\n'.join(sources)} if sources else None
+            table = pyarrow.table(columns).replace_schema_metadata(metadata)
+            pyarrow.parquet.write_table(table, temporary)
+        else:
+            arrays = dict(columns)
+            if sources:
+                arrays['_sources'] = np.array(sources)
+            with open(temporary, 'wb') as file:
+                np.savez(file, **arrays)
+        os.replace(temporary, path)
+        return path
+
+    def _read(self, path):
+        """
+        :return: Tuple (columns, names of the shards this one replaces).
+        """
+        if path not in self._shards:
+            if path.endswith('.parquet'):
+                import pyarrow.parquet
+                table = pyarrow.parquet.read_table(path)
+                columns = {name: np.asarray(table.column(name).to_numpy(zero_copy_only=False), dtype=dtype)
+                           for name, dtype, _ in COLUMNS}
+                metadata = table.schema.metadata or {}
+                sources = metadata.get(b'sources', b'').decode().split('\n') if b'sources' in metadata else []
+            else:
+                with np.load(path) as data:
+                    columns = {name: data[name] for name in COLUMN_NAMES}
+                    sources = data['_sources'].tolist() if '_sources' in data.files else []
+            self._shards[path] = (columns, sources)
+        return self._shards[path]
+
+    def append(self, records):
+        """
+        Append result records as one new shard.
+
+        :param records: Iterable of record dictionaries, see records_to_columns.
+        :return: Path of the written shard, or None if there were no records.
+        """
+        columns = records_to_columns(records)
+        if columns['n'].size == 0:
+            return None
+        return self._write(columns)
+
+    def _visible(self):
+        """
+        Visible shards minus the ones already merged into a compacted shard.
+        """
+        while True:
+            try:
+                loaded = [(path, self._read(path)) for path in self.shard_paths()]
+                break
+            except FileNotFoundError:
+                # Removed by a concurrent compaction; its merged shard is visible on the next listing
+                continue
+        replaced = {source for _, (_, sources) in loaded for source in sources}
+        return [(path, columns) for path, (columns, _) in loaded if os.path.basename(path) not in replaced]
+
+    def load(self, columns=None):
+        """
+        Read the whole store.
+
+        :param columns: Column names to return (default: all).
+        :return: Dictionary mapping column names to numpy arrays, shard by shard in write order.
+        """
+        names = COLUMN_NAMES if columns is None else tuple(columns)
+        shards = [shard for _, shard in self._visible()]
+        if not shards:
+            return {name: np.array([], dtype=dtype) for name, dtype, _ in COLUMNS if name in names}
+        return {name: np.concatenate([shard[name] for shard in shards]) for name in names}
+
+    def select(self, columns=None, **filters):
+        """
+        Read the rows matching all filters.
+
+        :param columns: Column names to return (default: all).
+        :param filters: column=value for equality, column=[values] for membership, or
+                        column=callable taking the column array and returning a boolean mask.
+        :return: Dictionary mapping column names to numpy arrays.
+        """
+        names = COLUMN_NAMES if columns is None else tuple(columns)
+        data = self.load(set(names) | set(filters))
+        mask = np.ones(len(next(iter(data.values()))), dtype=bool)
+        for name, condition in filters.items():
+            column = data[name]
+            if callable(condition):
+                mask &= np.asarray(condition(column), dtype=bool)
+            elif isinstance(condition, (list, tuple, set, np.ndarray)):
+                mask &= np.isin(column, list(condition))
+            else:
+                mask &= column == condition
+        return {name: data[name][mask] for name in names}
+
+    def aggregate(self, by, values, statistics=('mean', 'std', 'count'), **filters):
+        """
+        Group the matching rows and reduce value columns per group. Missing values (NaN, or -1 in the
+        integer columns, e.g. the chromatic number of a failed solve) are skipped; a group without
+        values gets NaN (count 0). Rows with a missing group column form no group.
+
+        :param by: Column name or list of column names to group by.
+        :param values: Column name or list of column names to reduce.
+        :param statistics: Any of 'mean', 'std', 'min', 'max', 'sum', 'count'.
+        :param filters: Row filters, see select.
+        :return: Dictionary with one array per group column (sorted groups) and one per
+                 f'{value}_{statistic}'.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        values = [values] if isinstance(values, str) else list(values)
+        unknown = set(statistics) - set(STATISTICS)
+        if unknown:
+            raise ValueError(f"Unknown statistics {sorted(unknown)}, expected any of {', '.join(STATISTICS)}.")
+        data = self.select(by + [value for value in values if value not in by], **filters)
+        keep = ~np.logical_or.reduce([missing_mask(name, data[name]) for name in by])
+        data = {name: column[keep] for name, column in data.items()}
+
+        # Dense group ids over the product of the per-column unique values
+        uniques, codes = zip(*(np.unique(data[name], return_inverse=True) for name in by))
+        shape = tuple(max(unique.size, 1) for unique in uniques)
+        flat = np.ravel_multi_index(codes, shape) if data[by[0]].size else np.array([], dtype=np.int64)
+        group_ids, group = np.unique(flat, return_inverse=True)
+        num_groups = group_ids.size
+        result = {name: unique[index] for name, unique, index in zip(by, uniques, np.unravel_index(group_ids, shape))}
+
+        for value in values:
+            column = data[value].astype(np.float64)
+            finite = np.isfinite(column) & ~missing_mask(value, data[value])
+            counts = np.bincount(group, weights=finite, minlength=num_groups)
+            sums = np.bincount(group, weights=np.where(finite, column, 0.0), minlength=num_groups)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = sums / counts
+                for statistic in statistics:
+                    if statistic == 'mean':
+                        reduced = means
+                    elif statistic == 'std':
+                        squares = np.bincount(group, weights=np.where(finite, column, 0.0) ** 2, minlength=num_groups)
+                        reduced = np.sqrt(np.maximum(squares / counts - means ** 2, 0.0))
+                    elif statistic == 'sum':
+                        reduced = sums
+                    elif statistic == 'count':
+                        reduced = counts.astype(np.int64)
+                    else:
+                        ufunc, fill = (np.minimum, np.inf) if statistic == 'min' else (np.maximum, -np.inf)
+                        reduced = np.full(num_groups, fill)
+                        ufunc.at(reduced, group[finite], column[finite])
+                        reduced[counts == 0] = np.nan
+                    result[f'{value}_{statistic}'] = reduced
+        return result
+
+    def series(self, x, y, group=None, statistic='mean', **filters):
+        """
+        Aggregated (x, y) series for plotting, e.g. mean chromatic number against n for every bond dimension.
+
+        :param x: Column on the x axis.
+        :param y: Column reduced per x value.
+        :param group: Optional column; one series per value.
+        :param statistic: Reduction of y, see aggregate.
+        :param filters: Row filters, see select.
+        :return: Dictionary mapping the group value (None without group) to a tuple (x values, y values).
+                 Rows where x or the group column is missing (e.g. the bond dimension of a
+                 non-tensor-network backend) belong to no series.
+        """
+        by = [x] if group is None else [group, x]
+        table = self.aggregate(by, y, statistics=(statistic,), **filters)
+        reduced = table[f'{y}_{statistic}']
+        if group is None:
+            return {None: (table[x], reduced)}
+        series = {}
+        for value in np.unique(table[group]):
+            mask = table[group] == value
+            series[value.item()] = (table[x][mask], reduced[mask])
+        return series
+
+    def compact(self):
+        """
+        Merge all visible shards into one. The merged shard lists the shards it replaces, so readers
+        never count a row twice, even while the old shards are being removed. Appends may continue
+        during compaction; do not run two compactions of the same directory at once.
+
+        :return: Path of the merged shard, or None if there was nothing to merge.
+        """
+        visible = self._visible()
+        if len(visible) < 2:
+            return None
+        columns = {name: np.concatenate([shard[name] for _, shard in visible]) for name in COLUMN_NAMES}
+        merged = self._write(columns, sources=[os.path.basename(path) for path, _ in visible])
+        for path, _ in visible:
+            os.remove(path)
+            self._shards.pop(path, None)
+        return merged
@@ -4,6 +4,7 @@ from qubo_solver import QUBOMatrix, QUBOValidator
 from tn_simulation import QUBOSimulation
 import math
 import os
+import logging
 
 def main():
     """Generate all graphs first, then load and run QUBO simulation."""
@@ -51,6 +52,7 @@ def main():
         print(f"Error: {e}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     main()
 
 
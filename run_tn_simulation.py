@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 import os
 import math
-import json
+import logging
 import matplotlib.pyplot as plt
 from tn_simulation import QUBOSimulation
+from sweep import ParameterSweep, build_grid
+from result_cache import DEFAULT_CACHE_PATH
+from results_store import ResultsStore, DEFAULT_RESULTS_DIR
 
 
 def save_plot(folder, filename):
@@ -18,58 +21,89 @@ def save_plot(folder, filename):
     plt.savefig(filepath)
     print(f"Plot saved to {filepath}")
 
+def plot_results(store, folder, **filters):
+    """
+    Plot the successful solves of a results store, one panel per max_bond_dimension.
+
+    :param store: ResultsStore.
+    :param folder: Folder where the plots are saved.
+    :param filters: Row filters passed to ResultsStore.select, e.g. backend='tn'.
+    """
+    filters = dict(filters, status='ok')
+    series = store.series('n', 'chromatic_number', group='max_bond_dimension', **filters)
+    if not series:
+        print("No results to plot.")
+        return
+
+    # 1. Bar charts for the mean chromatic number vs number of nodes
+    fig1, axs1 = plt.subplots(1, len(series), figsize=(7 * len(series), 5), squeeze=False)
+    fig1.suptitle("Chromatic Numbers vs Number of Nodes (Varying Max Bond Dimension)")
+    for ax, (value, (n_values, chromatic_numbers)) in zip(axs1[0], series.items()):
+        ax.bar(n_values, chromatic_numbers, label=f"Max Bond Dim: {value}")
+        ax.set_title(f"Max Bond Dimension: {value}")
+        ax.set_xlabel("Number of Nodes")
+        ax.set_ylabel("Mean Chromatic Number")
+        ax.legend()
+    save_plot(folder, "chromatic_numbers_bar_max_bond_dimension.png")
+    plt.close(fig1)
+
+    # 2. Chromatic number vs cost of every solve
+    fig2, axs2 = plt.subplots(1, len(series), figsize=(7 * len(series), 5), squeeze=False)
+    fig2.suptitle("Chromatic Numbers vs Cost (Varying Max Bond Dimension)")
+    for ax, value in zip(axs2[0], series):
+        rows = store.select(['cost', 'chromatic_number'], max_bond_dimension=value, **filters)
+        ax.scatter(rows['cost'], rows['chromatic_number'], label=f"Max Bond Dim: {value}")
+        ax.set_title(f"Max Bond Dimension: {value}")
+        ax.set_xlabel("Cost")
+        ax.set_ylabel("Chromatic Number")
+        ax.legend()
+    save_plot(folder, "chromatic_numbers_vs_cost_max_bond_dimension.png")
+    plt.close(fig2)
+
 def main():
     # Parameters
     n_range =   [8] #[4, 8, 16]  
     max_bond_dimensions =  [8] #[4, 8, 16]  
     transverse_field_ratios = [1e9] # [1e9, 1e7, 1e5]  
     probability = 0.5
+    corpus_seed = 2024  # Fixed, so checkpointed (n, c, instance) keys always name the same graphs
     output_folder = "plots"
-    output_file = "results.json"
+    checkpoint_file = "sweep_checkpoint.jsonl"
+    workers = os.cpu_count()
+    blas_threads = 1
 
     # Ensure output folder exists
     os.makedirs(output_folder, exist_ok=True)
 
-    # Initialize QUBOSimulation instance
-    simulation = QUBOSimulation(probability=probability)
-
-    # Generate graph instances
-    simulation.generate_graph_instance()
-
-    # Results container (try loading existing results if any)
-    output_path = os.path.join(output_folder, output_file)
-    if os.path.exists(output_path):
-        with open(output_path, "r") as file:
-            results = json.load(file)
-    else:
-        results = {'max_bond_dimension': {}, 'transverse_field_ratio': {}}
-
-    # Vary max_bond_dimension
-    for max_bond_dimension in max_bond_dimensions:
-        if max_bond_dimension not in results['max_bond_dimension']:
-            results['max_bond_dimension'][max_bond_dimension] = {'chromatic_numbers': [], 'costs': []}
-
-        for n in n_range:
-            c = math.ceil(0.5 * n) + 2  # Upper bound on colors
-            try:
-                # Load graph instance
-                _, _, edges = simulation.load_graph_instance(n, c, instance_index=0)
-
-                # Run QUBO simulation
-                cost, chromatic_number, _ = simulation.run_simulation(
-                    n, c, edges, max_bond_dimension, transverse_field_ratio=1e9
-                )
-                results['max_bond_dimension'][max_bond_dimension]['chromatic_numbers'].append(chromatic_number)
-                results['max_bond_dimension'][max_bond_dimension]['costs'].append(cost)
-
-                # Save results after each iteration
-                with open(output_path, "w") as file:
-                    json.dump(results, file, indent=4)
+    # Generate graph instances only if they don't exist
+    simulation = QUBOSimulation(probability=probability, corpus_seed=corpus_seed)
+    if not os.path.exists(simulation.graph_dir) or not os.listdir(simulation.graph_dir):
+        simulation.generate_graph_instance()
 
-            except FileNotFoundError:
-                print(f"Graph instance for n={n}, c={c} not found. Skipping.")
+    # Run the grid in parallel; finished jobs are checkpointed and skipped on resume, and every
+    # new result is appended to the columnar results store
+    jobs = build_grid(
+        n_values=n_range,
+        c_values=lambda n: [math.ceil(0.5 * n) + 2],  # Upper bound on colors
+        instances=[0],
+        max_bond_dimensions=max_bond_dimensions,
+        transverse_field_ratios=transverse_field_ratios,
+    )
+    store = ResultsStore(DEFAULT_RESULTS_DIR)
+    sweep = ParameterSweep(
+        os.path.join(output_folder, checkpoint_file), workers=workers, blas_threads=blas_threads,
+        simulation_kwargs={'probability': probability, 'result_cache': DEFAULT_CACHE_PATH},
+        results_store=store,
+    )
+    records = sweep.run(jobs)
+    for record in records:
+        if record['status'] != 'ok':
+            print(f"Graph instance for n={record['n']}, c={record['c']} failed: {record['error']}. Skipping.")
 
-    print(f"Results saved to {output_path}")
+    print(f"{len(store)} results in {store.directory}")
+    plot_results(store, output_folder, max_bond_dimension=max_bond_dimensions,
+                 transverse_field_ratio=transverse_field_ratios)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     main()
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+# sweep.py
+import os
+import json
+import time
+import logging
+import itertools
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+BLAS_THREAD_VARIABLES = (
+    'OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS',
+)
+
+# Per-process QUBOSimulation, created lazily inside each worker
+_worker_kwargs = {}
+_worker_simulation = None
+
+
+def build_grid(n_values, c_values, instances, max_bond_dimensions, transverse_field_ratios, lambdas=(None,),
+               backends=(None,)):
+    """
+    Build the list of sweep jobs as the cartesian product of the parameter ranges.
+
+    :param n_values: Iterable of node counts.
+    :param c_values: Iterable of color counts, or a callable mapping n to an iterable of color counts.
+    :param instances: Iterable of instance indices.
+    :param max_bond_dimensions: Iterable of maximum bond dimensions.
+    :param transverse_field_ratios: Iterable of transverse field ratios.
+    :param lambdas: Iterable of (lambda1, lambda2, lambda3) tuples; None keeps the n-scaled defaults.
+    :param backends: Iterable of solver backend names; None runs the default 'tn' backend.
+    :return: List of job dictionaries.
+    """
+    jobs = []
+    for n in n_values:
+        colors = c_values(n) if callable(c_values) else c_values
+        if isinstance(colors, int):
+            colors = [colors]
+        for c, instance, bond_dim, tfr, lam, backend in itertools.product(
+                colors, instances, max_bond_dimensions, transverse_field_ratios, lambdas, backends):
+            job = {
+                'n': n, 'c': c, 'instance': instance,
+                'max_bond_dimension': bond_dim, 'transverse_field_ratio': tfr,
+                'lambdas': list(lam) if lam is not None else None,
+            }
+            if backend is not None:
+                job['backend'] = backend
+            jobs.append(job)
+    return jobs
+
+
+def job_key(job):
+    """
+    Canonical identifier of a job, used to match checkpoint records.
+
+    :param job: Job dictionary.
+    :return: String key.
+    """
+    fields = ('n', 'c', 'instance', 'max_bond_dimension', 'transverse_field_ratio', 'lambdas')
+    key = [job.get(field) for field in fields]
+    # Jobs without a backend (the tn default) keep the keys of older checkpoints
+    if job.get('backend') is not None:
+        key.append(job['backend'])
+    return json.dumps(key, default=_to_python)
+
+
+def _to_python(value):
+    '''
+    JSON fallback for numpy scalars and arrays in grid values (e.g. from np.arange).
+    '''
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+@contextmanager
+def blas_thread_limit(threads):
+    """
+    Temporarily set the BLAS/OpenMP thread variables so that processes spawned inside
+    the block inherit them.
+
+    :param threads: Thread count per process; None leaves the environment untouched.
+    """
+    saved = {variable: os.environ.get(variable) for variable in BLAS_THREAD_VARIABLES}
+    if threads is not None:
+        for variable in BLAS_THREAD_VARIABLES:
+            os.environ[variable] = str(threads)
+    try:
+        yield
+    finally:
+        for variable, value in saved.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+
+
+def init_worker(blas_threads, simulation_kwargs):
+    """
+    Limit BLAS threads before numpy / the tensor backend is imported in the worker, and store the
+    QUBOSimulation keyword arguments for run_job. Used as a process pool initializer here and
+    by worker_pool.
+    """
+    global _worker_kwargs
+    if blas_threads is not None:
+        for variable in BLAS_THREAD_VARIABLES:
+            os.environ[variable] = str(blas_threads)
+    _worker_kwargs = simulation_kwargs
+
+
+def run_job(job):
+    """
+    Execute a single sweep job inside a worker process set up by init_worker.
+
+    :param job: Job dictionary (see build_grid).
+    :return: Result record; failures are recorded with status 'error' instead of raised.
+    """
+    global _worker_simulation
+    if _worker_simulation is None:
+        from tn_simulation import QUBOSimulation
+        _worker_simulation = QUBOSimulation(**_worker_kwargs)
+    simulation = _worker_simulation
+
+    record = dict(job)
+    start = time.perf_counter()
+    try:
+        n, c, edges = simulation.load_graph_instance(job['n'], job['c'], job['instance'])
+        lambdas = tuple(job['lambdas']) if job.get('lambdas') is not None else None
+        cost, chromatic_number, time_to_solution = simulation.run_simulation(
+            n, c, edges, job['max_bond_dimension'], job['transverse_field_ratio'], lambdas=lambdas,
+            backend=job.get('backend') or 'tn', backend_options=job.get('backend_options')
+        )
+        record.update({
+            'status': 'ok',
+            'cost': float(cost) if cost is not None else None,
+            'chromatic_number': int(chromatic_number) if chromatic_number is not None else None,
+            'time_to_solution': float(time_to_solution),
+            'color_count': simulation.last_color_count,
+            'cache_hit': simulation.last_cache_hit,
+            'accepted_bond_dimension': simulation.last_bond_dimension,
+            'raw_chromatic_number': (int(simulation.last_raw_chromatic_number)
+                                     if simulation.last_raw_chromatic_number is not None else None),
+            'repaired': simulation.last_repaired,
+            'feasible': simulation.solution_feasible(n, edges),
+        })
+        trace = simulation.tracer.last_record
+        if trace is not None:
+            record['phase_seconds'] = {name: phase['seconds'] for name, phase in trace['phases'].items()}
+    except Exception as exc:
+        record.update({'status': 'error', 'error': f'{type(exc).__name__}: {exc}'})
+    record['wall_time'] = time.perf_counter() - start
+    record['pid'] = os.getpid()
+    return record
+
+
+class ParameterSweep:
+    def __init__(self, checkpoint_path, workers=None, blas_threads=1, simulation_kwargs=None, results_store=None,
+                 store_batch_size=64):
+        """
+        Parallel, resumable sweep over QUBOSimulation.run_simulation.
+
+        :param checkpoint_path: JSONL file with one record per finished job; completed jobs are skipped on resume.
+        :param workers: Number of worker processes (default: os.cpu_count()).
+        :param blas_threads: BLAS/OpenMP threads per worker; None leaves the environment untouched.
+        :param simulation_kwargs: Keyword arguments for the QUBOSimulation built in every worker.
+        :param results_store: Optional ResultsStore (or its directory) that receives the record of every
+                              job run by this sweep, in shards of store_batch_size records.
+        :param store_batch_size: Records buffered per results store shard.
+        """
+        self.checkpoint_path = checkpoint_path
+        self.workers = workers or os.cpu_count()
+        self.blas_threads = blas_threads
+        self.simulation_kwargs = simulation_kwargs or {}
+        if isinstance(results_store, str):
+            from results_store import ResultsStore
+            results_store = ResultsStore(results_store)
+        self.results_store = results_store
+        self.store_batch_size = store_batch_size
+
+    def load_checkpoint(self):
+        """
+        Read all records from the checkpoint file.
+
+        :return: Dictionary mapping job keys to their latest record.
+        """
+        records = {}
+        if not os.path.exists(self.checkpoint_path):
+            return records
+        with open(self.checkpoint_path, 'r') as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A truncated last line from an interrupted run
+                    continue
+                records[job_key(record)] = record
+        return records
+
+    def pending_jobs(self, jobs):
+        """
+        Filter out the jobs that already completed successfully.
+
+        :param jobs: List of job dictionaries.
+        :return: List of jobs still to run.
+        """
+        done = {key for key, record in self.load_checkpoint().items() if record.get('status') == 'ok'}
+        return [job for job in jobs if job_key(job) not in done]
+
+    def _append(self, file, record):
+        file.write(json.dumps(record, default=_to_python) + '\n')
+        file.flush()
+        os.fsync(file.fileno())
+
+    def run(self, jobs):
+        """
+        Run all pending jobs and checkpoint each result as soon as it finishes.
+
+        :param jobs: List of job dictionaries (see build_grid).
+        :return: List of records for every job in the grid, including ones restored from the checkpoint.
+        """
+        pending = self.pending_jobs(jobs)
+        logger.info('%d of %d jobs already completed, running %d.', len(jobs) - len(pending), len(jobs), len(pending))
+
+        checkpoint_dir = os.path.dirname(self.checkpoint_path)
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+
+        if pending:
+            # Spawned workers start without numpy loaded, so the BLAS limits take effect
+            context = multiprocessing.get_context('spawn')
+            with blas_thread_limit(self.blas_threads), open(self.checkpoint_path, 'a') as file, ProcessPoolExecutor(
+                    max_workers=min(self.workers, len(pending)), mp_context=context,
+                    initializer=init_worker, initargs=(self.blas_threads, self.simulation_kwargs)) as pool:
+                futures = [pool.submit(run_job, job) for job in pending]
+                batch = []
+                try:
+                    for future in as_completed(futures):
+                        record = future.result()
+                        self._append(file, record)
+                        if record['status'] != 'ok':
+                            logger.warning('Job %s failed: %s', job_key(record), record['error'])
+                        if self.results_store is not None:
+                            batch.append(record)
+                            if len(batch) >= self.store_batch_size:
+                                self.results_store.append(batch)
+                                batch = []
+                finally:
+                    # Checkpointed jobs are not rerun, so their records must reach the store
+                    if self.results_store is not None:
+                        self.results_store.append(batch)
+
+        records = self.load_checkpoint()
+        return [records[job_key(job)] for job in jobs if job_key(job) in records]
@@ -1,36 +1,112 @@
 # -*- coding: utf-8 -*-
 # qubo_simulation.py
 import os
+import time
+import queue
+import logging
+import threading
 import numpy as np
-from qtealeaves.optimization import QUBOSolver, QUBOConvergenceParameter
-from qtealeaves.tensors import TensorBackend
-from qubo_solver import QUBOMatrix, QUBOValidator
+from qubo_solver import (QUBOMatrix, KColoringQUBOMatrix, QUBOValidator, BatchQUBOValidator, GraphColoringQUBOOperator,
+                         qubo_energy, get_k_coloring_components)
+from ising import graph_coloring_ising
 from graph_generator import ErdosRenyiGraphGenerator
+from graph_store import PackedGraphStore, default_store_dir, pickle_tree_keys
+from dsatur import dsatur_coloring, adjacency_lists
+from preprocessing import ColoringPreprocessor, decode_coloring, encode_coloring, greedy_clique
+from repair import ColoringRepair, coloring_conflicts
+from tracing import PhaseTracer
+from result_cache import ResultCache, result_key
+from fingerprint import FingerprintIndex, relabel_solution
+from backends import get_backend, TN_MAX_ITER
+
+logger = logging.getLogger(__name__)
 
 class QUBOSimulation:
-    def __init__(self, lambda1=2, lambda2=2, lambda3=2, probability=0.5, graph_dir='graph_instances'):
+    def __init__(self, lambda1=2, lambda2=2, lambda3=2, probability=0.5, graph_dir='graph_instances', packed_dir=None,
+                 color_budget='given', dsatur_margin=0, preprocess=False, tracer=None, result_cache=None,
+                 adaptive_bond_dimension=False, bond_dimension_ladder=(2, 4, 8, 16), repair=False,
+                 fingerprint_index=None, corpus_seed=None):
+        '''
+        color_budget selects how many colors the QUBO is built with: 'given' uses the c passed to
+        run_simulation, 'dsatur' shrinks it to the DSatur color count minus dsatur_margin.
+        preprocess enables the reduction stage (k-core peeling, components, clique fixing).
+        tracer records per-phase timings and solver metadata of every run_simulation call; by default
+        it is configured from the QGC_TRACE_FILE and QGC_TRACE_MEMORY environment variables.
+        result_cache (a ResultCache or a database path) makes run_simulation return stored results
+        for problems it has solved before. With a fingerprint_index (a FingerprintIndex or a database
+        path) the cache is keyed on the representative of the graph's isomorphism class, so a result
+        is reused, relabeled, for every equivalent instance.
+        adaptive_bond_dimension makes run_simulation climb bond_dimension_ladder (capped at the
+        max_bond_dimension it is called with) and stop at the first rung with a feasible coloring;
+        it cannot be combined with preprocess.
+        repair turns infeasible solver results into proper colorings before the chromatic number is
+        computed; the solver's own value (sum of y) is kept in last_raw_chromatic_number.
+        corpus_seed fixes the entropy of generate_graph_instance (see ErdosRenyiGraphGenerator).
+        '''
         self.lambda1 = lambda1
         self.lambda2 = lambda2
         self.lambda3 = lambda3
         self.probability = probability
         self.graph_dir = graph_dir
+        self.color_budget = color_budget
+        self.dsatur_margin = dsatur_margin
+        self.last_color_count = None
+        self.last_solution = None
+        self.last_cache_hit = False
+        self.adaptive_bond_dimension = adaptive_bond_dimension
+        self.bond_dimension_ladder = tuple(bond_dimension_ladder)
+        self.last_bond_dimension = None
+        self.last_ladder = []
+        self.last_missing_instances = []
+        self.repair = repair
+        self.last_raw_chromatic_number = None
+        self.last_repaired = False
+        self.last_coloring = None
+        self.last_k_probes = []
+        if isinstance(result_cache, str):
+            result_cache = ResultCache(result_cache)
+        self.result_cache = result_cache
+        if isinstance(fingerprint_index, str):
+            fingerprint_index = FingerprintIndex(fingerprint_index)
+        self.fingerprint_index = fingerprint_index
+        if adaptive_bond_dimension and preprocess:
+            raise ValueError('adaptive_bond_dimension cannot be combined with preprocess: the reduced '
+                             'components are solved at a single bond dimension.')
+        self.preprocess = preprocess
+        self.tracer = tracer if tracer is not None else PhaseTracer.from_environment()
+        self.packed_dir = packed_dir or default_store_dir(graph_dir)
+        self._packed_store = None
         self.graph_generator = ErdosRenyiGraphGenerator(
-            main_dir=graph_dir, n_range=(4, 50), c_range=None, instances=20, p=probability
+            main_dir=graph_dir, n_range=(4, 50), c_range=None, instances=20, p=probability, seed=corpus_seed
         )
 
+    @property
+    def packed_store(self):
+        '''
+        The packed graph store, opened on first use, or None if it has not been built.
+        '''
+        if self._packed_store is None and PackedGraphStore.exists(self.packed_dir):
+            self._packed_store = PackedGraphStore(self.packed_dir)
+        return self._packed_store
+
     def generate_graph_instance(self):
         '''
         Generates and stores graph instances.
         '''
-        print("Generating graph instances...")
+        logger.info("Generating graph instances...")
         self.graph_generator.generate_and_store_graphs()
-        print("All graph instances generated successfully!")
+        logger.info("All graph instances generated successfully!")
 
     def load_graph_instance(self, n, c, instance_index=0):
         '''
-        Loads a single graph instance.
+        Loads a single graph instance. Reads a zero-copy view from the packed store when
+        available and falls back to the pickle layout otherwise.
         '''
-        file_path = os.path.join(self.graph_dir, f'n_{n}', f'c_{c}', f'n_{n}_c_{c}_{instance_index}.pkl')
+        store = self.packed_store
+        if store is not None and (n, c, instance_index) in store:
+            return n, c, store.get_edges(n, c, instance_index)
+
+        file_path = self._pickle_path(n, c, instance_index)
 
         if not os.path.exists(file_path):
             raise FileNotFoundError(f'Graph instance {file_path} does not exist.')
@@ -38,89 +114,647 @@ class QUBOSimulation:
         graph_data = self.graph_generator.load_graph(file_path)
         return graph_data['n'], graph_data['c'], graph_data['edges']
 
+    def _pickle_path(self, n, c, instance_index):
+        return os.path.join(self.graph_dir, f'n_{n}', f'c_{c}', f'n_{n}_c_{c}_{instance_index}.pkl')
+
+    def has_instance(self, n, c, instance_index):
+        '''
+        True if the instance is stored, checked against the packed index or the single pickle path.
+        '''
+        key = (n, c, instance_index)
+        if self.packed_store is not None and key in self.packed_store:
+            return True
+        return os.path.exists(self._pickle_path(*key))
+
+    def _instance_edges(self, n, c, instance_index):
+        return self.load_graph_instance(n, c, instance_index)[2]
+
     def load_multiple_graphs(self, n_values, c_values, instance_indices=0):
         '''
-        Loads multiple stored graph instances.
+        Loads multiple stored graph instances as a list of (n, c, edges) tuples.
+        Prefer iter_graph_instances for large selections.
         '''
-        if isinstance(n_values, int):
-            n_values = [n_values]
-        if isinstance(c_values, int):
-            c_values = [c_values]
-        if isinstance(instance_indices, int):
-            instance_indices = [instance_indices]
+        return [(n, c, edges) for n, c, _, edges in self.iter_graph_instances(n_values, c_values, instance_indices)]
 
-        loaded_graphs = []
-        for n in n_values:
-            for c in c_values:
-                for instance_index in instance_indices:
-                    try:
-                        graph_data = self.load_graph_instance(n, c, instance_index)
-                        loaded_graphs.append(graph_data)
-                    except FileNotFoundError:
-                        print(f'Skipping missing file: n_{n}_c_{c}_{instance_index}.pkl')
+    def available_instances(self):
+        '''
+        Sorted (n, c, instance) keys present in the packed store or the pickle tree.
+        '''
+        keys = set(pickle_tree_keys(self.graph_dir))
+        if self.packed_store is not None:
+            keys.update(self.packed_store.keys())
+        return sorted(keys)
+
+    def _select_instances(self, n_values, c_values, instances):
+        '''
+        Keys matching the filters in iteration order, and the explicitly requested keys that are missing.
+        '''
+        def as_list(values):
+            return [values] if isinstance(values, int) else values
+
+        n_values, instances = as_list(n_values), as_list(instances)
+        if not callable(c_values):
+            c_list = as_list(c_values)
+            c_values = None if c_list is None else (lambda n: c_list)
+        if n_values is not None and c_values is not None and instances is not None:
+            # Fully specified: keep the requested order and report what is not stored. Every key is
+            # checked on its own, so no directory of the pickle tree is listed
+            requested = [(n, c, i) for n in n_values for c in as_list(c_values(n)) for i in instances]
+            stored = [self.has_instance(*key) for key in requested]
+            return ([key for key, present in zip(requested, stored) if present],
+                    [key for key, present in zip(requested, stored) if not present])
+
+        available = self.available_instances()
+        n_set = None if n_values is None else set(n_values)
+        instance_set = None if instances is None else set(instances)
+        c_sets = {}
+        keys = []
+        for n, c, i in available:
+            if n_set is not None and n not in n_set:
+                continue
+            if instance_set is not None and i not in instance_set:
+                continue
+            if c_values is not None:
+                if n not in c_sets:
+                    c_sets[n] = set(as_list(c_values(n)))
+                if c not in c_sets[n]:
+                    continue
+            keys.append((n, c, i))
+        return keys, []
+
+    def _load_for_iteration(self, key, min_density, max_density):
+        '''
+        Load one instance for iter_graph_instances, or None if it fails the density filter.
+        The packed store answers the density check from its index before any edge is read.
+        '''
+        n, c, instance_index = key
+        pairs = n * (n - 1) / 2
+        store = self.packed_store
+        if store is not None and key in store and (min_density is not None or max_density is not None):
+            density = store.num_edges(*key) / pairs if pairs else 0.0
+            if (min_density is not None and density < min_density) or (max_density is not None and density > max_density):
+                return None
+
+        n, c, edges = self.load_graph_instance(n, c, instance_index)
+        # Copy packed views so the read happens here, on the prefetch thread
+        edges = np.array(edges) if isinstance(edges, np.ndarray) else edges
+        density = len(edges) / pairs if pairs else 0.0
+        if (min_density is not None and density < min_density) or (max_density is not None and density > max_density):
+            return None
+        return n, c, instance_index, edges
+
+    def iter_graph_instances(self, n_values=None, c_values=None, instances=None, min_density=None, max_density=None,
+                             prefetch=8):
+        '''
+        Stream stored graph instances as (n, c, instance_index, edges) tuples.
+
+        :param n_values: Node counts (int or iterable); None selects every stored n.
+        :param c_values: Color counts (int, iterable, or a callable mapping n to either); None selects every stored c.
+        :param instances: Instance indices (int or iterable); None selects every stored instance.
+        :param min_density: Skip graphs with edge density 2m / (n(n-1)) below this value.
+        :param max_density: Skip graphs with edge density above this value.
+        :param prefetch: Number of instances loaded ahead on a background thread; 0 loads inline.
+        '''
+        keys, missing = self._select_instances(n_values, c_values, instances)
+        self.last_missing_instances = missing
+        if missing:
+            shown = ', '.join(f'n_{n}_c_{c}_{i}' for n, c, i in missing[:10])
+            logger.warning('Skipping %d missing graph instance(s): %s%s', len(missing), shown,
+                           ' ...' if len(missing) > 10 else '')
 
-        return loaded_graphs
+        if prefetch <= 0:
+            for key in keys:
+                graph = self._load_for_iteration(key, min_density, max_density)
+                if graph is not None:
+                    yield graph
+            return
 
-    def run_simulation(self, n, c, edges, max_bond_dimension, transverse_field_ratio):
+        buffer = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        end = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def produce():
+            try:
+                for key in keys:
+                    if stop.is_set():
+                        return
+                    graph = self._load_for_iteration(key, min_density, max_density)
+                    if graph is not None:
+                        put(graph)
+            except Exception as exc:
+                put(exc)
+            finally:
+                put(end)
+
+        thread = threading.Thread(target=produce, name='graph-prefetch', daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is end:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+
+    def color_count(self, n, c, edges):
+        '''
+        Number of colors to build the QUBO with, according to the color_budget mode.
+        '''
+        if self.color_budget == 'given':
+            return c
+        if self.color_budget == 'dsatur':
+            _, num_colors = dsatur_coloring(n, edges)
+            return max(1, min(c, num_colors - self.dsatur_margin))
+        raise ValueError(f"Unknown color_budget '{self.color_budget}', expected 'given' or 'dsatur'.")
+
+    def run_simulation(self, n, c, edges, max_bond_dimension, transverse_field_ratio, sparse=False, lambdas=None,
+                       backend='tn', backend_options=None, use_cache=True):
         """
         Run the QUBO simulation for the given parameters.
 
         :param n: Number of nodes in the graph.
-        :param c: Number of colors (upper bound).
+        :param c: Number of colors (upper bound; may be reduced by the color_budget mode).
         :param edges: List of edges in the graph.
         :param max_bond_dimension: Maximum bond dimension for the solver.
         :param transverse_field_ratio: Transverse field ratio for the solver.
+        :param sparse: If True, build the QUBO matrix in scipy.sparse format.
+        :param lambdas: Optional (lambda1, lambda2, lambda3); defaults to values scaled with n.
+        :param backend: Registered solver backend: 'tn' (qtealeaves), 'annealing' or 'tabu' (numpy), 'exact' (enumeration).
+        :param backend_options: Extra keyword arguments for the numpy and exact backends.
+        :param use_cache: If False, bypass the result cache: always solve and do not store the result.
         :return: Tuple (cost, chromatic_number, time_to_solution).
         """
-        # Set lambda values dynamically based on the number of nodes
-        self.lambda1 = 0.5 * n
-        self.lambda2 = n
-        self.lambda3 = 0.5 * n
+        self.tracer.start_run('run_simulation', n=n, c=c, num_edges=len(edges), max_bond_dimension=max_bond_dimension,
+                              transverse_field_ratio=transverse_field_ratio, backend=backend, sparse=sparse,
+                              preprocess=self.preprocess)
+        try:
+            self.last_cache_hit = False
+            cache_key = None
+            mapping = None
+            if use_cache and self.result_cache is not None:
+                with self.tracer.phase('cache_lookup'):
+                    key_edges = edges
+                    if self.fingerprint_index is not None:
+                        found = self.fingerprint_index.lookup(n, edges, loader=self._instance_edges)
+                        if found is not None:
+                            # Key on the representative's labeling; mapping sends its nodes to ours
+                            mapping = found[1]
+                            key_edges = np.argsort(mapping)[np.asarray(edges, dtype=np.int64).reshape(-1, 2)]
+                    cache_key, params = self.cache_key(n, c, key_edges, max_bond_dimension, transverse_field_ratio,
+                                                       lambdas, backend, backend_options)
+                    cached = self.result_cache.get(cache_key)
+                if cached is not None:
+                    logger.info('Result cache hit for n=%d, c=%d', n, c)
+                    self.last_cache_hit = True
+                    self.last_bond_dimension = None
+                    self.last_raw_chromatic_number = None
+                    self.last_repaired = False
+                    self.last_color_count = cached['color_count']
+                    self.last_solution = cached['solution']
+                    if mapping is not None and self.last_color_count is not None:
+                        self.last_solution = relabel_solution(self.last_solution, n, self.last_color_count, mapping)
+                    self.tracer.annotate(cache_hit=True, cost=cached['cost'],
+                                         chromatic_number=cached['chromatic_number'],
+                                         time_to_solution=cached['time_to_solution'])
+                    return cached['cost'], cached['chromatic_number'], cached['time_to_solution']
+
+            start = time.perf_counter()
+            cost, chromatic_number, time_to_solution = self._run_simulation(
+                n, c, edges, max_bond_dimension, transverse_field_ratio, sparse, lambdas, backend, backend_options)
+            if cache_key is not None:
+                solution = self.last_solution
+                if mapping is not None and self.last_color_count is not None:
+                    solution = relabel_solution(solution, n, self.last_color_count, np.argsort(mapping))
+                self.result_cache.put(cache_key, params, cost, chromatic_number, solution, time_to_solution,
+                                      wall_time=time.perf_counter() - start, color_count=self.last_color_count)
+            self.tracer.annotate(cost=cost, chromatic_number=chromatic_number, time_to_solution=time_to_solution)
+            return cost, chromatic_number, time_to_solution
+        except Exception as exc:
+            self.tracer.annotate(error=f'{type(exc).__name__}: {exc}')
+            raise
+        finally:
+            self.tracer.finish_run()
+
+    def solution_feasible(self, n, edges, solution=None):
+        '''
+        Whether a solution vector (default: last_solution, with last_color_count colors) is a proper
+        coloring with consistent y variables.
+        '''
+        solution = self.last_solution if solution is None else solution
+        if solution is None:
+            return False
+        c = len(solution) // (n + 1)
+        return bool(BatchQUBOValidator(n, c, edges).validate(solution)['feasible'][0])
+
+    @staticmethod
+    def resolve_lambdas(n, lambdas=None):
+        '''
+        Penalty weights used by run_simulation: the given (lambda1, lambda2, lambda3), or values scaled with n.
+        '''
+        if lambdas is None:
+            # Set lambda values dynamically based on the number of nodes
+            return 0.5 * n, n, 0.5 * n
+        return tuple(lambdas)
+
+    def cache_key(self, n, c, edges, max_bond_dimension, transverse_field_ratio, lambdas=None, backend='tn',
+                  backend_options=None):
+        '''
+        Result cache key of a run_simulation call.
+
+        :return: Tuple (hex key, canonical parameter string).
+        '''
+        params = {
+            'lambdas': [float(value) for value in self.resolve_lambdas(n, lambdas)],
+            'max_bond_dimension': max_bond_dimension,
+            'transverse_field_ratio': float(transverse_field_ratio),
+            'backend': backend,
+            'backend_options': backend_options or {},
+            'color_budget': self.color_budget,
+            'dsatur_margin': self.dsatur_margin,
+            'preprocess': self.preprocess,
+        }
+        if self.repair:
+            params['repair'] = True
+        if self.adaptive_bond_dimension:
+            params['bond_dimension_ladder'] = self.bond_dimension_rungs(max_bond_dimension)
+        if backend == 'tn':
+            params['max_iter'] = TN_MAX_ITER
+        return result_key(n, c, edges, params)
+
+    def _run_simulation(self, n, c, edges, max_bond_dimension, transverse_field_ratio, sparse, lambdas, backend,
+                        backend_options):
+        self.lambda1, self.lambda2, self.lambda3 = self.resolve_lambdas(n, lambdas)
+
+        # Shrink the color budget before building Q (n*c + c variables)
+        with self.tracer.phase('color_budget'):
+            c = self.color_count(n, c, edges)
+        self.last_color_count = c
+        self.tracer.annotate(color_count=c, lambdas=[self.lambda1, self.lambda2, self.lambda3])
+
+        if self.preprocess:
+            return self.run_preprocessed_simulation(n, c, edges, max_bond_dimension, transverse_field_ratio, sparse,
+                                                    backend, backend_options)
 
         # Generate QUBO matrix
-        qubo_matrix_obj = QUBOMatrix(n, c, edges, self.lambda1, self.lambda2, self.lambda3)
-        qubo_matrix = qubo_matrix_obj.Q
-
-        
-
-        # Initialize solver
-        my_solver = QUBOSolver(qubo_matrix)
-        
-        
-        print('Solving the QUBO problem . . . ')
-
-        # Define convergence parameters
-        conv_params = QUBOConvergenceParameter(
-            max_bond_dimension=max_bond_dimension,
-            max_iter=30,
-            enable_spacelink_expansion=True,
-            transverse_field_ratio=transverse_field_ratio,
-            data_type="D",
-            optimization_level=3,
-            device="cpu",
-        )
+        with self.tracer.phase('qubo_build'):
+            if get_backend(backend).accepts_ising:
+                # Ising-native backends get the cached sparse Ising model; energies for validation
+                # come from the matrix-free operator, so no Q matrix is built at all
+                solver_input = graph_coloring_ising(n, c, edges, self.lambda1, self.lambda2, self.lambda3)
+                qubo_matrix = GraphColoringQUBOOperator(n, c, edges, self.lambda1, self.lambda2, self.lambda3)
+            else:
+                qubo_matrix_obj = QUBOMatrix(n, c, edges, self.lambda1, self.lambda2, self.lambda3, sparse=sparse)
+                qubo_matrix = solver_input = qubo_matrix_obj.Q
+
+        if self.adaptive_bond_dimension:
+            my_solver, min_cost_idx, report, time_to_solution = self.solve_adaptive(
+                n, c, edges, qubo_matrix, self.bond_dimension_rungs(max_bond_dimension), transverse_field_ratio,
+                backend, backend_options, solver_input=solver_input)
+        else:
+            my_solver = self.solve_qubo(solver_input, max_bond_dimension, transverse_field_ratio, backend,
+                                        backend_options)
+            time_to_solution = my_solver.time_to_solution
+            with self.tracer.phase('validation'):
+                min_cost_idx, report = self._select_sample(n, c, edges, qubo_matrix, my_solver)
 
-        # Define tensor backend
-        tn_backend = TensorBackend(device="cpu", dtype=np.float64)
+        with self.tracer.phase('validation'):
+            tnn_config = my_solver.solution[min_cost_idx]
+            self.last_solution = tnn_config
+            tnn_cost = my_solver.cost[min_cost_idx]
+            logger.debug('Best cost %s for configuration %s', tnn_cost, tnn_config)
+            logger.info('%s solution found in %s s', backend, time_to_solution)
 
-        # Solve the QUBO
-        my_solver.solve(tn_convergence_parameters=conv_params, tensor_backend=tn_backend)
+            # Validate and compute chromatic number
+            validator = QUBOValidator(n, c, edges, tnn_config)
 
-        # Extract results
-        min_cost_idx = my_solver.cost.index(min(my_solver.cost))
-        tnn_config = my_solver.solution[min_cost_idx]
-        tnn_cost = my_solver.cost[min_cost_idx]
-        print(tnn_cost)
-        print(tnn_config)
-        
-        time_to_solution = my_solver.time_to_solution
-        print(f' tn solution found in {my_solver.time_to_solution} s')
+            chromatic_number = validator.compute_chromatic_number(strict_validation = False)
+        self.tracer.annotate(num_feasible=int(np.count_nonzero(report['feasible'])))
 
-        # Validate and compute chromatic number
-        validator = QUBOValidator(n, c, edges, tnn_config)
-        
-        chromatic_number = validator.compute_chromatic_number(strict_validation = False)
+        if self.repair:
+            tnn_cost, chromatic_number = self.repair_solution(n, c, edges, tnn_config, tnn_cost, chromatic_number,
+                                                              lambda solution: qubo_energy(qubo_matrix, solution))
+        else:
+            self.last_raw_chromatic_number = chromatic_number
+            self.last_repaired = False
 
         return tnn_cost if tnn_cost else None, chromatic_number, time_to_solution
 
+    def repair_solution(self, n, c, edges, tnn_config, tnn_cost, chromatic_number, energy):
+        '''
+        Repair an infeasible solution (see repair.ColoringRepair) and update last_solution.
+
+        :param energy: Callable returning the QUBO energy of a solution vector.
+        :return: Tuple (cost, chromatic number) of the repaired solution; unchanged for feasible solutions.
+                 If the repair needs more than c colors, the solution is kept and only the chromatic
+                 number of the repaired coloring is returned.
+        '''
+        with self.tracer.phase('repair'):
+            outcome = ColoringRepair(n, c, edges).repair(tnn_config)
+        self.last_raw_chromatic_number = outcome['raw_chromatic_number']
+        self.last_repaired = not outcome['raw_feasible']
+        self.tracer.annotate(raw_feasible=outcome['raw_feasible'], raw_chromatic_number=outcome['raw_chromatic_number'],
+                             repaired_chromatic_number=outcome['chromatic_number'], recolored=outcome['recolored'])
+        if outcome['raw_feasible']:
+            return tnn_cost, chromatic_number
 
+        logger.info('Repaired %d node(s): chromatic number %s -> %s', outcome['recolored'],
+                    outcome['raw_chromatic_number'], outcome['chromatic_number'])
+        if outcome['solution'] is None:
+            return tnn_cost, outcome['chromatic_number']
+        self.last_solution = outcome['solution']
+        return float(energy(outcome['solution'])), outcome['chromatic_number']
+
+    @staticmethod
+    def _select_sample(n, c, edges, qubo_matrix, my_solver):
+        '''
+        Index of the best feasible sample (the minimum cost sample if none is feasible) and the validation report.
+        '''
+        batch_validator = BatchQUBOValidator(n, c, edges, Q=qubo_matrix)
+        report = batch_validator.validate(my_solver.solution)
+        min_cost_idx = batch_validator.best_feasible_index(report)
+        if min_cost_idx is None:
+            min_cost_idx = my_solver.cost.index(min(my_solver.cost))
+        return min_cost_idx, report
+
+    def bond_dimension_rungs(self, max_bond_dimension):
+        '''
+        Rungs of the bond dimension ladder below max_bond_dimension, ending at max_bond_dimension itself.
+        '''
+        if max_bond_dimension is None:
+            return list(self.bond_dimension_ladder)
+        return [rung for rung in self.bond_dimension_ladder if rung < max_bond_dimension] + [max_bond_dimension]
+
+    def solve_adaptive(self, n, c, edges, qubo_matrix, bond_dimensions, transverse_field_ratio, backend='tn',
+                       backend_options=None, solver_input=None):
+        """
+        Solve with increasing bond dimension until the best sample is a feasible coloring.
+        Every rung after the first starts from the best configuration found so far when the backend
+        accepts initial states ('annealing' and 'tabu'); exact backends need a single rung.
+        A rung whose cost does not improve on the best so far has stalled: the next rung is
+        skipped, so the search jumps to a larger bond dimension (the last rung is never skipped).
+
+        :param n: Number of nodes in the graph.
+        :param c: Number of colors.
+        :param edges: List of edges in the graph.
+        :param qubo_matrix: Q matrix (dense or scipy.sparse).
+        :param bond_dimensions: Ladder of maximum bond dimensions, e.g. [2, 4, 8, 16].
+        :param transverse_field_ratio: Transverse field ratio for the tensor network solver.
+        :param backend: Solver backend, see solve_qubo.
+        :param backend_options: Extra keyword arguments for the numpy and exact backends.
+        :param solver_input: What the backend solves if not qubo_matrix (the IsingModel for Ising-native backends).
+        :return: Tuple (solver of the accepted rung, index of its best sample, its validation report,
+                 total time_to_solution over all rungs).
+        """
+        solver_backend = get_backend(backend)
+        if solver_backend.exact:
+            bond_dimensions = bond_dimensions[:1]
+        best_config, best_cost = None, None
+        time_to_solution = 0.0
+        history = []
+
+        rung = 0
+        while rung < len(bond_dimensions):
+            bond_dimension = bond_dimensions[rung]
+            options = dict(backend_options or {})
+            if best_config is not None and solver_backend.accepts_initial_states:
+                options['initial_states'] = best_config
+            my_solver = self.solve_qubo(qubo_matrix if solver_input is None else solver_input, bond_dimension,
+                                        transverse_field_ratio, backend, options)
+            time_to_solution += my_solver.time_to_solution
+
+            with self.tracer.phase('validation'):
+                min_cost_idx, report = self._select_sample(n, c, edges, qubo_matrix, my_solver)
+            feasible = bool(report['feasible'][min_cost_idx])
+            cost = float(my_solver.cost[min_cost_idx])
+            stalled = best_cost is not None and cost >= best_cost - 1e-9
+            history.append({'max_bond_dimension': bond_dimension, 'cost': cost, 'feasible': feasible,
+                            'stalled': stalled, 'time_to_solution': my_solver.time_to_solution})
+            logger.info('Bond dimension %s: cost %s, %s', bond_dimension, cost, 'feasible' if feasible else 'infeasible')
+
+            if best_cost is None or cost < best_cost:
+                best_config, best_cost = my_solver.solution[min_cost_idx], cost
+            if feasible:
+                break
+            if stalled and rung + 2 < len(bond_dimensions):
+                logger.info('Cost stalled at bond dimension %s, skipping bond dimension %s',
+                            bond_dimension, bond_dimensions[rung + 1])
+                history.append({'max_bond_dimension': bond_dimensions[rung + 1], 'skipped': True})
+                rung += 1
+            rung += 1
+
+        self.last_bond_dimension = bond_dimension
+        self.last_ladder = history
+        self.tracer.annotate(bond_dimension_ladder=history, accepted_bond_dimension=bond_dimension)
+        return my_solver, min_cost_idx, report, time_to_solution
+
+    def solve_qubo(self, qubo_matrix, max_bond_dimension, transverse_field_ratio, backend='tn', backend_options=None):
+        """
+        Solve a QUBO with a backend from the backends registry.
+
+        :param qubo_matrix: Q matrix (dense or scipy.sparse), or an ising.IsingModel for backends that accepts_ising.
+        :param max_bond_dimension: Maximum bond dimension for the tensor network solver.
+        :param transverse_field_ratio: Transverse field ratio for the tensor network solver.
+        :param backend: Registered backend name: 'tn' (qtealeaves), 'annealing' or 'tabu' (numpy), 'exact' (enumeration).
+        :param backend_options: Extra keyword arguments for the numpy and exact backends.
+        :return: The solved solver object (cost, solution and time_to_solution attributes).
+        """
+        solver_backend = get_backend(backend)
+        options = dict(backend_options or {})
+        logger.info('Solving the QUBO problem with %s . . . ', backend)
+
+        with self.tracer.phase('solver_setup'):
+            my_solver = solver_backend.setup(qubo_matrix, max_bond_dimension, transverse_field_ratio, options)
+        with self.tracer.phase('solve'):
+            solver_backend.run(my_solver, max_bond_dimension, transverse_field_ratio, options)
+        self._trace_solver(my_solver, backend,
+                           **solver_backend.settings(max_bond_dimension, transverse_field_ratio, options))
+        return my_solver
+
+    def _trace_solver(self, my_solver, backend, **settings):
+        '''
+        Attach the solver settings, iteration count and cost trajectory to the current trace.
+        Repeated solves in one run (preprocessed components) are appended to the same list.
+        '''
+        if self.tracer.record is None:
+            return
+        costs = [float(value) for value in my_solver.cost]
+        entry = dict(settings, backend=backend, num_samples=len(costs),
+                     best_cost=min(costs) if costs else None,
+                     time_to_solution=my_solver.time_to_solution,
+                     iterations=getattr(my_solver, 'iterations', None),
+                     cost_trajectory=getattr(my_solver, 'trajectory', None) or costs)
+        self.tracer.record['metadata'].setdefault('solvers', []).append(entry)
+
+    def run_k_search(self, n, edges, max_bond_dimension, transverse_field_ratio, strategy='bisect', lambdas=None,
+                     sparse=False, backend='tn', backend_options=None):
+        """
+        Find the smallest k for which the solver returns a proper k-coloring, probing the
+        decision QUBO (KColoringQUBOMatrix, n*k variables) between a greedy clique lower bound
+        and the DSatur upper bound. Every coloring found is cached by its color count; a probe
+        at k is answered without solving when a cached coloring already uses at most k colors.
+        Backends that accept initial states start from the best cached coloring cut down to k colors.
+
+        :param n: Number of nodes in the graph.
+        :param edges: List of edges in the graph.
+        :param max_bond_dimension: Maximum bond dimension for the solver.
+        :param transverse_field_ratio: Transverse field ratio for the solver.
+        :param strategy: 'bisect' (binary search) or 'descend' (k = upper - 1, upper - 2, ... until a probe fails).
+        :param lambdas: Optional (lambda2, lambda3); defaults to the n-scaled run_simulation values.
+        :param sparse: If True, build the probe QUBO matrices in scipy.sparse format.
+        :param backend: Solver backend, see solve_qubo.
+        :param backend_options: Extra keyword arguments for the numpy and exact backends.
+        :return: Tuple (number of colors, coloring, total time_to_solution).
+        """
+        if strategy not in ('bisect', 'descend'):
+            raise ValueError(f"Unknown strategy '{strategy}', expected 'bisect' or 'descend'.")
+        lambda2, lambda3 = lambdas if lambdas is not None else self.resolve_lambdas(n)[1:]
+        self.tracer.start_run('k_search', n=n, num_edges=len(edges), max_bond_dimension=max_bond_dimension,
+                              transverse_field_ratio=transverse_field_ratio, backend=backend, strategy=strategy)
+        try:
+            with self.tracer.phase('bounds'):
+                colors, upper = dsatur_coloring(n, edges)
+                lower = max(1, len(greedy_clique(adjacency_lists(n, edges), set(range(n))))) if n else 0
+                # Shared edge and one-hot layout for every probe k <= upper
+                get_k_coloring_components(n, edges, upper)
+            best = np.asarray(colors, dtype=np.int64)
+            # Color count -> proper coloring found with that many colors
+            colorings = {upper: best}
+            probes = []
+            time_to_solution = 0.0
+            solver_backend = get_backend(backend)
+            repairer = ColoringRepair(n, n, edges) if self.repair else None
+
+            def probe(k):
+                nonlocal time_to_solution
+                known = min(colorings)
+                if known <= k:
+                    return True
+                with self.tracer.phase('qubo_build'):
+                    problem = KColoringQUBOMatrix(n, k, edges, lambda2, lambda3, sparse=sparse)
+                options = dict(backend_options or {})
+                if solver_backend.accepts_initial_states:
+                    seed_colors = np.where(colorings[known] < k, colorings[known], -1)
+                    options['initial_states'] = encode_coloring(n, k, seed_colors)[:n * k]
+                my_solver = self.solve_qubo(problem.Q, max_bond_dimension, transverse_field_ratio, backend, options)
+                time_to_solution += my_solver.time_to_solution
+
+                with self.tracer.phase('validation'):
+                    found = None
+                    for index in np.argsort(my_solver.cost):
+                        candidate = decode_coloring(n, k, my_solver.solution[index])
+                        if repairer is not None:
+                            candidate, _ = repairer.repair_colors(candidate)
+                        if (candidate >= 0).all() and candidate.max(initial=-1) < k \
+                                and not coloring_conflicts(candidate, problem.components.edge_array).any():
+                            found = candidate
+                            break
+                feasible = found is not None
+                probes.append({'k': k, 'feasible': feasible, 'time_to_solution': my_solver.time_to_solution,
+                               'best_energy': float(min(my_solver.cost)) + problem.offset})
+                logger.info('k=%d: %s', k, 'colorable' if feasible else 'no coloring found')
+                if feasible:
+                    used = int(np.unique(found).size)
+                    colorings[used] = found
+                return feasible
+
+            if strategy == 'bisect':
+                low, high = lower, upper
+                while low < high:
+                    middle = (low + high) // 2
+                    if probe(middle):
+                        high = min(colorings)
+                    else:
+                        low = middle + 1
+            else:
+                k = upper - 1
+                while k >= lower and probe(k):
+                    k = min(colorings) - 1
+
+            num_colors = min(colorings)
+            coloring = colorings[num_colors]
+            self.last_coloring = coloring
+            self.last_k_probes = probes
+            self.tracer.annotate(lower_bound=lower, upper_bound=upper, probes=probes, num_colors=num_colors,
+                                 time_to_solution=time_to_solution)
+            return num_colors, coloring, time_to_solution
+        finally:
+            self.tracer.finish_run()
+
+    def run_preprocessed_simulation(self, n, c, edges, max_bond_dimension, transverse_field_ratio, sparse=True,
+                                    backend='tn', backend_options=None):
+        """
+        Reduce the instance, solve every reduced component separately and map the result back.
+
+        :param n: Number of nodes in the graph.
+        :param c: Number of colors.
+        :param edges: List of edges in the graph.
+        :param max_bond_dimension: Maximum bond dimension for the solver.
+        :param transverse_field_ratio: Transverse field ratio for the solver.
+        :param sparse: If True, build the component QUBO matrices in scipy.sparse format.
+        :param backend: Solver backend, see solve_qubo.
+        :param backend_options: Extra keyword arguments for the numpy and exact backends.
+        :return: Tuple (cost, chromatic_number, time_to_solution); a zero cost is returned as None, as in run_simulation.
+        """
+        lambdas = (self.lambda1, self.lambda2, self.lambda3)
+        with self.tracer.phase('preprocessing'):
+            preprocessor = ColoringPreprocessor(n, c, edges)
+        original, reduced = preprocessor.num_variables()
+        logger.info('Preprocessing reduced the QUBO from %d to %d variables in %d component(s).',
+                    original, reduced, len(preprocessor.subproblems))
+        self.tracer.annotate(original_variables=original, reduced_variables=reduced,
+                             components=len(preprocessor.subproblems))
+
+        time_to_solution = 0.0
+        sub_colorings = []
+        for sub in preprocessor.subproblems:
+            with self.tracer.phase('qubo_build'):
+                reduced_q, _, free_indices = sub.build_qubo(c, lambdas, sparse=sparse)
+            if free_indices.size == 0:
+                sub_colorings.append(decode_coloring(sub.n, c, sub.expand(c, free_indices, [])))
+                continue
+
+            my_solver = self.solve_qubo(reduced_q, max_bond_dimension, transverse_field_ratio, backend, backend_options)
+            time_to_solution += my_solver.time_to_solution
+
+            with self.tracer.phase('validation'):
+                samples = np.array([sub.expand(c, free_indices, sample) for sample in my_solver.solution])
+                batch_validator = BatchQUBOValidator(sub.n, c, sub.edges)
+                report = batch_validator.validate(samples)
+                report['energy'] = np.asarray(my_solver.cost, dtype=np.float64)
+                best_idx = batch_validator.best_feasible_index(report)
+                if best_idx is None:
+                    best_idx = int(np.argmin(report['energy']))
+                sub_colorings.append(decode_coloring(sub.n, c, samples[best_idx]))
+
+        with self.tracer.phase('validation'):
+            colors = preprocessor.reconstruct(sub_colorings)
+            tnn_config = preprocessor.to_solution(colors)
+            self.last_solution = tnn_config
+            tnn_cost = float(GraphColoringQUBOOperator(n, c, edges, *lambdas).energy(tnn_config))
+            logger.debug('Best cost %s for configuration %s', tnn_cost, tnn_config)
+            logger.info('%s solution found in %s s', backend, time_to_solution)
+
+            validator = QUBOValidator(n, c, edges, tnn_config)
+            chromatic_number = validator.compute_chromatic_number(strict_validation = False)
+
+        if self.repair:
+            operator = GraphColoringQUBOOperator(n, c, edges, *lambdas)
+            tnn_cost, chromatic_number = self.repair_solution(n, c, edges, tnn_config, tnn_cost, chromatic_number,
+                                                              lambda solution: float(operator.energy(solution)))
+        else:
+            self.last_raw_chromatic_number = chromatic_number
+            self.last_repaired = False
+
+        return tnn_cost if tnn_cost else None, chromatic_number, time_to_solution
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+# tracing.py
+import os
+import sys
+import json
+import time
+import logging
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Environment variables that switch tracing on without code changes
+TRACE_FILE_VARIABLE = 'QGC_TRACE_FILE'
+TRACE_MEMORY_VARIABLE = 'QGC_TRACE_MEMORY'
+
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of this process so far (None where unsupported).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _to_json(value):
+    """
+    Convert numpy scalars and arrays into plain Python values for JSON output.
+    """
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {str(key): _to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    return value
+
+
+class JSONLTraceHook:
+    def __init__(self, path):
+        """
+        Append every trace record as one JSON line.
+
+        :param path: Output file; parent directories are created.
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, record):
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(_to_json(record)) + '\n')
+
+
+class LoggingTraceHook:
+    def __init__(self, level=logging.INFO):
+        """
+        Log a one-line phase summary of every trace record.
+
+        :param level: Logging level of the summary.
+        """
+        self.level = level
+
+    def __call__(self, record):
+        phases = ', '.join(f"{name}={phase['seconds']:.3f}s" for name, phase in record['phases'].items())
+        logger.log(self.level, '%s: %s', record['event'], phases)
+
+
+class PhaseTracer:
+    def __init__(self, hooks=None, trace_memory=False):
+        """
+        Collect per-phase timings, traced memory peaks and solver metadata of a run and pass the
+        finished record to every hook. The process peak RSS is recorded once per run.
+
+        :param hooks: List of callables taking a record dictionary.
+        :param trace_memory: Record tracemalloc peaks per phase (adds overhead to allocations).
+        """
+        self.hooks = list(hooks or [])
+        self.trace_memory = trace_memory
+        self.record = None
+        self.last_record = None
+        self._started_tracemalloc = False
+
+    @classmethod
+    def from_environment(cls):
+        """
+        Build a tracer configured by QGC_TRACE_FILE (JSONL output) and QGC_TRACE_MEMORY.
+        """
+        hooks = []
+        trace_file = os.environ.get(TRACE_FILE_VARIABLE)
+        if trace_file:
+            hooks.append(JSONLTraceHook(trace_file))
+        trace_memory = os.environ.get(TRACE_MEMORY_VARIABLE, '').lower() in ('1', 'true', 'yes')
+        return cls(hooks=hooks, trace_memory=trace_memory)
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def start_run(self, event, **context):
+        """
+        Begin a new record.
+
+        :param event: Name of the traced operation.
+        :param context: Parameters describing the run (n, c, backend, ...).
+        """
+        self.record = {'event': event, 'timestamp': time.time(), 'context': context, 'phases': {}, 'metadata': {}}
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._run_start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time a phase of the current run. Repeated phases accumulate their time and count.
+
+        :param name: Phase name, e.g. 'qubo_build' or 'solve'.
+        """
+        if self.record is None:
+            yield
+            return
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            phase = self.record['phases'].setdefault(name, {'seconds': 0.0, 'count': 0})
+            phase['seconds'] += seconds
+            phase['count'] += 1
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                phase['peak_traced_bytes'] = max(peak, phase.get('peak_traced_bytes', 0))
+
+    def annotate(self, **metadata):
+        """
+        Attach metadata (bond dimension, iterations, cost trajectory, ...) to the current run.
+        """
+        if self.record is not None:
+            self.record['metadata'].update(metadata)
+
+    def finish_run(self, **metadata):
+        """
+        Close the current record and hand it to the hooks.
+
+        :return: The finished record.
+        """
+        if self.record is None:
+            return None
+        self.annotate(**metadata)
+        self.record['seconds'] = time.perf_counter() - self._run_start
+        # ru_maxrss is a process-lifetime high-water mark, so it is meaningful once per run, not per phase
+        self.record['process_peak_rss_bytes'] = peak_rss_bytes()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+        record, self.record = self.record, None
+        self.last_record = record
+        for hook in self.hooks:
+            try:
+                hook(record)
+            except Exception:
+                logger.exception('Trace hook %r failed', hook)
+        return record
@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+# worker_pool.py
+import os
+import json
+import time
+import socket
+import getpass
+import logging
+import sqlite3
+import threading
+import multiprocessing
+
+import sweep
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_PATH = os.path.join('graph_instances', 'job_queue.sqlite')
+
+QUEUED, RUNNING, DONE, ERROR, CANCELLED = 'queued', 'running', 'done', 'error', 'cancelled'
+FINISHED = (DONE, ERROR, CANCELLED)
+
+_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        owner TEXT NOT NULL,
+        job TEXT NOT NULL,
+        status TEXT NOT NULL,
+        worker TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        record TEXT,
+        submitted REAL NOT NULL,
+        started REAL,
+        finished REAL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, owner)',
+    '''
+    CREATE TABLE IF NOT EXISTS workers (
+        name TEXT PRIMARY KEY,
+        pid INTEGER NOT NULL,
+        threads INTEGER,
+        heartbeat REAL NOT NULL
+    )
+    ''',
+)
+
+
+class JobQueue:
+    def __init__(self, path=DEFAULT_QUEUE_PATH):
+        """
+        Persistent SQLite job queue shared by the local workers and every client on the machine.
+        A job is a dictionary in the format of sweep.build_grid (n, c, instance, max_bond_dimension,
+        transverse_field_ratio, lambdas and optional backend / backend_options). Queued jobs are
+        handed out fairly: the next job belongs to the owner with the fewest running jobs, oldest first.
+
+        :param path: SQLite database file; parent directories are created.
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = None
+
+    @property
+    def connection(self):
+        # Autocommit mode; claim() opens its own write transaction
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=60.0, isolation_level=None)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            for statement in _SCHEMA:
+                self._connection.execute(statement)
+        return self._connection
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_connection'] = None
+        return state
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+
+    def submit(self, jobs, owner=None):
+        """
+        Queue jobs.
+
+        :param jobs: Iterable of job dictionaries.
+        :param owner: Name the jobs are shared out by (default: the current user).
+        :return: List of job ids.
+        """
+        owner = owner or getpass.getuser()
+        now = time.time()
+        ids = []
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            for job in jobs:
+                cursor = self.connection.execute(
+                    'INSERT INTO jobs (owner, job, status, submitted) VALUES (?, ?, ?, ?)',
+                    (owner, json.dumps(job), QUEUED, now))
+                ids.append(cursor.lastrowid)
+            self.connection.execute('COMMIT')
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        return ids
+
+    def claim(self, worker):
+        """
+        Take the next job for a worker.
+
+        :param worker: Worker name.
+        :return: Tuple (job id, job dictionary), or None if the queue is empty.
+        """
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.connection.execute(
+                'SELECT id, job FROM jobs AS queued WHERE status = ? ORDER BY '
+                '(SELECT COUNT(*) FROM jobs WHERE status = ? AND owner = queued.owner), id LIMIT 1',
+                (QUEUED, RUNNING)).fetchone()
+            if row is not None:
+                self.connection.execute(
+                    'UPDATE jobs SET status = ?, worker = ?, started = ?, attempts = attempts + 1 WHERE id = ?',
+                    (RUNNING, worker, time.time(), row[0]))
+            self.connection.execute('COMMIT')
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        return None if row is None else (row[0], json.loads(row[1]))
+
+    def complete(self, job_id, record):
+        """
+        Store the record of a finished job; its status becomes 'done' or 'error'.
+        """
+        status = DONE if record.get('status') == 'ok' else ERROR
+        self.connection.execute('UPDATE jobs SET status = ?, record = ?, finished = ? WHERE id = ? AND status = ?',
+                                (status, json.dumps(record), time.time(), job_id, RUNNING))
+
+    def cancel(self, ids):
+        """
+        Cancel jobs that have not started yet.
+
+        :return: Number of cancelled jobs.
+        """
+        cursor = self.connection.executemany('UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?',
+                                             [(CANCELLED, time.time(), job_id, QUEUED) for job_id in ids])
+        return cursor.rowcount
+
+    def status(self, ids=None, owner=None):
+        """
+        :param ids: Job ids; None for all jobs (of owner, if given).
+        :return: Dictionary mapping each status to its number of jobs.
+        """
+        counts = dict.fromkeys((QUEUED, RUNNING) + FINISHED, 0)
+        for status in self.statuses(ids, owner).values():
+            counts[status] += 1
+        return counts
+
+    def statuses(self, ids=None, owner=None):
+        """
+        :return: Dictionary mapping job ids to their status.
+        """
+        if ids is not None:
+            ids = list(ids)
+            rows = []
+            # Stay below SQLite's limit on bound parameters
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows += self.connection.execute(
+                    f"SELECT id, status FROM jobs WHERE id IN ({', '.join('?' * len(chunk))})", chunk).fetchall()
+        elif owner is not None:
+            rows = self.connection.execute('SELECT id, status FROM jobs WHERE owner = ?', (owner,)).fetchall()
+        else:
+            rows = self.connection.execute('SELECT id, status FROM jobs').fetchall()
+        return dict(rows)
+
+    def records(self, ids):
+        """
+        :return: Dictionary mapping the ids of finished jobs to their sweep records.
+        """
+        found = {}
+        ids = list(ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT id, record FROM jobs WHERE record IS NOT NULL AND id IN ({', '.join('?' * len(chunk))})",
+                chunk).fetchall()
+            found.update((job_id, json.loads(record)) for job_id, record in rows)
+        return found
+
+    def heartbeat(self, worker, pid=None, threads=None):
+        self.connection.execute('INSERT OR REPLACE INTO workers VALUES (?, ?, ?, ?)',
+                                (worker, pid or os.getpid(), threads, time.time()))
+
+    def workers(self, max_age=None):
+        """
+        :param max_age: Only workers seen within this many seconds.
+        :return: List of (name, pid, threads, heartbeat) rows.
+        """
+        rows = self.connection.execute('SELECT name, pid, threads, heartbeat FROM workers ORDER BY name').fetchall()
+        if max_age is None:
+            return rows
+        return [row for row in rows if time.time() - row[3] <= max_age]
+
+    def requeue_stale(self, max_age=60.0, max_attempts=3):
+        """
+        Put running jobs back in the queue when their worker stopped sending heartbeats. Jobs that
+        already took down max_attempts workers are marked as errors instead.
+
+        :return: Number of requeued jobs.
+        """
+        stale = ('status = ? AND (worker IS NULL OR worker NOT IN '
+                 '(SELECT name FROM workers WHERE heartbeat >= ?))')
+        cutoff = time.time() - max_age
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            self.connection.execute(
+                f'UPDATE jobs SET status = ?, record = ?, finished = ? WHERE {stale} AND attempts >= ?',
+                (ERROR, json.dumps({'status': 'error', 'error': f'Worker stopped during {max_attempts} attempts'}),
+                 time.time(), RUNNING, cutoff, max_attempts))
+            cursor = self.connection.execute(
+                f'UPDATE jobs SET status = ?, worker = NULL, started = NULL WHERE {stale}',
+                (QUEUED, RUNNING, cutoff))
+            self.connection.execute('COMMIT')
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        return cursor.rowcount
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def _worker_main(queue_path, name, threads, cores, simulation_kwargs, warm_backends, poll_interval, stop_event,
+                 heartbeat_interval):
+    """
+    Worker process: pin threads (and cores), import the solver stack once, then run jobs until stopped.
+    """
+    # Before numpy is imported, as in sweep workers
+    sweep.init_worker(threads, simulation_kwargs)
+    if cores and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+
+    from backends import get_backend
+    for backend in warm_backends:
+        try:
+            get_backend(backend).warm_up()
+        except ImportError as exc:
+            logger.warning('Worker %s could not warm up backend %s: %s', name, backend, exc)
+
+    queue = JobQueue(queue_path)
+    queue.heartbeat(name, threads=threads)
+
+    # Heartbeats continue during long solves so the job is not requeued
+    def beat():
+        beat_queue = JobQueue(queue_path)
+        while not stop_event.wait(heartbeat_interval):
+            beat_queue.heartbeat(name, threads=threads)
+
+    threading.Thread(target=beat, daemon=True).start()
+
+    while not stop_event.is_set():
+        claimed = queue.claim(name)
+        if claimed is None:
+            stop_event.wait(poll_interval)
+            continue
+        job_id, job = claimed
+        logger.info('Worker %s running job %d', name, job_id)
+        record = sweep.run_job(job)
+        record['worker'] = name
+        queue.complete(job_id, record)
+
+
+class WorkerPool:
+    def __init__(self, queue_path=DEFAULT_QUEUE_PATH, workers=None, threads_per_worker=1, simulation_kwargs=None,
+                 warm_backends=('tn',), pin_cores=False, poll_interval=0.5, heartbeat_interval=10.0):
+        """
+        Long-lived local pool of warm solver workers serving a JobQueue. Every worker keeps one
+        QUBOSimulation (built from simulation_kwargs) and the solver modules imported between jobs,
+        and runs with a fixed BLAS/OpenMP thread count, so the pool never uses more than
+        workers * threads_per_worker cores however many clients submit work.
+
+        :param queue_path: Job queue database.
+        :param workers: Number of worker processes (default: os.cpu_count() // threads_per_worker).
+        :param threads_per_worker: BLAS/OpenMP threads per worker.
+        :param simulation_kwargs: Keyword arguments for the QUBOSimulation of every worker.
+        :param warm_backends: Backends imported when a worker starts.
+        :param pin_cores: Also bind every worker to its own threads_per_worker cores (Linux only).
+        :param poll_interval: Seconds an idle worker waits before polling the queue again.
+        :param heartbeat_interval: Seconds between worker heartbeats; jobs of a worker silent for
+                                   six intervals are requeued.
+        """
+        self.queue = JobQueue(queue_path)
+        self.threads_per_worker = threads_per_worker
+        self.workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+        self.simulation_kwargs = simulation_kwargs or {}
+        self.warm_backends = tuple(warm_backends)
+        self.pin_cores = pin_cores
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._context = multiprocessing.get_context('spawn')
+        self._stop_event = None
+        self._processes = {}
+
+    def _cores(self, index):
+        if not self.pin_cores or not hasattr(os, 'sched_getaffinity'):
+            return None
+        available = sorted(os.sched_getaffinity(0))
+        start = index * self.threads_per_worker
+        return {available[(start + offset) % len(available)] for offset in range(self.threads_per_worker)}
+
+    def _spawn(self, index):
+        name = f'{socket.gethostname()}-{os.getpid()}-{index}'
+        process = self._context.Process(
+            target=_worker_main, name=name, daemon=True,
+            args=(self.queue.path, name, self.threads_per_worker, self._cores(index), self.simulation_kwargs,
+                  self.warm_backends, self.poll_interval, self._stop_event, self.heartbeat_interval))
+        process.start()
+        self._processes[index] = process
+
+    def start(self):
+        """
+        Requeue jobs left running by a previous pool and start the workers.
+        """
+        requeued = self.queue.requeue_stale(6 * self.heartbeat_interval)
+        if requeued:
+            logger.info('Requeued %d job(s) of stopped workers', requeued)
+        self._stop_event = self._context.Event()
+        with sweep.blas_thread_limit(self.threads_per_worker):
+            for index in range(self.workers):
+                self._spawn(index)
+        logger.info('Started %d worker(s) with %d thread(s) each', self.workers, self.threads_per_worker)
+
+    def supervise(self):
+        """
+        Restart workers that died and requeue their jobs.
+        """
+        for index, process in list(self._processes.items()):
+            if not process.is_alive():
+                logger.warning('Worker %s exited with code %s, restarting', process.name, process.exitcode)
+                self.queue.connection.execute('DELETE FROM workers WHERE name = ?', (process.name,))
+                self.queue.requeue_stale(6 * self.heartbeat_interval)
+                with sweep.blas_thread_limit(self.threads_per_worker):
+                    self._spawn(index)
+
+    def serve(self, until_empty=False):
+        """
+        Run until interrupted (or, with until_empty, until no job is queued or running).
+        """
+        if self._stop_event is None:
+            self.start()
+        try:
+            while True:
+                time.sleep(self.poll_interval)
+                self.supervise()
+                if until_empty:
+                    counts = self.queue.status()
+                    if counts[QUEUED] == 0 and counts[RUNNING] == 0:
+                        break
+        except KeyboardInterrupt:
+            logger.info('Stopping workers')
+        finally:
+            self.stop()
+
+    def stop(self, timeout=None):
+        """
+        Let the workers finish their current job and stop.
+        """
+        if self._stop_event is None:
+            return
+        self._stop_event.set()
+        for process in self._processes.values():
+            process.join(timeout)
+        self.queue.connection.executemany('DELETE FROM workers WHERE name = ?',
+                                          [(process.name,) for process in self._processes.values()])
+        self._processes = {}
+        self._stop_event = None
+
+
+class SolverClient:
+    def __init__(self, queue_path=DEFAULT_QUEUE_PATH, owner=None):
+        """
+        Client of a WorkerPool: submit QUBOSimulation.run_simulation jobs, poll them, collect records.
+
+        :param queue_path: Job queue database of the pool.
+        :param owner: Name used for fair sharing (default: the current user).
+        """
+        self.queue = JobQueue(queue_path)
+        self.owner = owner or getpass.getuser()
+
+    def submit(self, n, c, instance=0, max_bond_dimension=8, transverse_field_ratio=1e9, lambdas=None,
+               backend=None, backend_options=None):
+        """
+        Queue one stored instance (see QUBOSimulation.load_graph_instance and run_simulation).
+
+        :return: Job id.
+        """
+        job = {
+            'n': n, 'c': c, 'instance': instance,
+            'max_bond_dimension': max_bond_dimension, 'transverse_field_ratio': transverse_field_ratio,
+            'lambdas': list(lambdas) if lambdas is not None else None,
+        }
+        if backend is not None:
+            job['backend'] = backend
+        if backend_options:
+            job['backend_options'] = backend_options
+        return self.queue.submit([job], self.owner)[0]
+
+    def submit_many(self, jobs):
+        """
+        Queue job dictionaries, e.g. from sweep.build_grid.
+
+        :return: List of job ids.
+        """
+        return self.queue.submit(jobs, self.owner)
+
+    def status(self, ids=None):
+        """
+        :param ids: Job ids (default: all jobs of this owner).
+        :return: Dictionary mapping each status to its number of jobs.
+        """
+        return self.queue.status(ids, None if ids is not None else self.owner)
+
+    def cancel(self, ids):
+        return self.queue.cancel(ids)
+
+    def collect(self, ids, timeout=None, poll_interval=0.5):
+        """
+        Wait for jobs to finish.
+
+        :param ids: Job ids.
+        :param timeout: Seconds to wait; None waits until every job has finished.
+        :return: List of records (as written by sweep workers) in the order of ids; None for jobs
+                 that did not finish in time or were cancelled.
+        """
+        ids = list(ids)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            statuses = self.queue.statuses(ids)
+            # Unknown ids count as finished
+            if all(statuses.get(job_id, DONE) in FINISHED for job_id in ids):
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            time.sleep(poll_interval)
+        records = self.queue.records(ids)
+        return [records.get(job_id) for job_id in ids]